@@ -1,13 +1,24 @@
 # -----------------------------------------------------------------------------
 # Arquivo: app.py (Versão Final Limpa)
 # -----------------------------------------------------------------------------
-from dash import Dash, html
-import dash_bootstrap_components as dbc
 import os
 
+# Mede o custo de cada importação e etapa (STARTUP_REPORT=1 para o relatório)
+import startup
+startup.install()
+
+with startup.phase("import dash"):
+    from dash import Dash, html
+    import dash_bootstrap_components as dbc
+
 try:
-    from layout import create_layout
-    from callbacks import register_callbacks
+    with startup.phase("import layout"):
+        from layout import create_layout
+    with startup.phase("import callbacks"):
+        from callbacks import register_callbacks, handle_callback_error
+    import metrics
+    import http_compression
+    import table_export
     print("Importações de 'layout.py' e 'callbacks.py' concluídas com sucesso.")
 except ImportError as e:
     print("\n--- ERRO CRÍTICO na importação ---")
@@ -18,6 +29,7 @@ except ImportError as e:
 # 1. Inicializa a aplicação Dash
 app = Dash(__name__,
            suppress_callback_exceptions=True,
+           on_error=handle_callback_error,
            external_stylesheets=[dbc.themes.FLATLY, dbc.icons.FONT_AWESOME])
 
 # 2. Define o título do aplicativo
@@ -27,8 +39,10 @@ app.title = 'Dashboard de Obras Interativo'
 server = app.server
 
 # 4. Define o layout da aplicação a partir do arquivo layout.py
+#    (montado uma única vez: com "gunicorn --preload", antes da criação dos workers)
 try:
-    app.layout = create_layout(app)
+    with startup.phase("create_layout"):
+        app.layout = create_layout(app)
 except Exception as e:
     print(f"\n--- ERRO CRÍTICO no layout.py: {e} ---")
     app.layout = html.Div([
@@ -37,11 +51,21 @@ except Exception as e:
     ])
 
 # 5. Registra todos os callbacks a partir do arquivo callbacks.py
+#    (com METRICS_ENABLED=1, cada callback é cronometrado e /metrics é exposto),
+#    a rota de exportação da tabela (table_export.py) e a compressão/ETag das
+#    respostas (http_compression.py)
 try:
-    register_callbacks(app)
+    with startup.phase("register_callbacks"):
+        register_callbacks(metrics.instrument(app))
+        metrics.init_app(app)
+        table_export.init_app(app)
+        # Registrada depois das métricas: elas medem os bytes já comprimidos
+        http_compression.init_app(app)
 except Exception as e:
     print(f"\n--- ERRO CRÍTICO no callbacks.py: {e} ---")
 
+startup.report()
+
 # 6. Bloco para execução em modo de desenvolvimento local
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 8050))
@@ -0,0 +1,77 @@
+// -----------------------------------------------------------------------------
+// Arquivo: assets/clientside.js (Callbacks de Estado da Interface no Navegador)
+// -----------------------------------------------------------------------------
+// Funções dos callbacks que só mexem em estado da interface: abrir e fechar
+// modais, escala de tempo, filtros, seleção de linha, as alterações das
+// grades semanais e o endereço da exportação. Rodam no navegador,
+// sem ida e volta ao servidor e sem ocupar um worker do Gunicorn. O Dash
+// carrega este arquivo da pasta assets/ automaticamente; o registro fica em
+// register_clientside_callbacks (callbacks.py), com ClientsideFunction('ui', ...).
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    ui: {
+        toggle_modal: function (n_open, n_close, is_open) {
+            return (n_open || n_close) ? !is_open : is_open;
+        },
+
+        close_modal: function (n_clicks) {
+            return n_clicks ? false : window.dash_clientside.no_update;
+        },
+
+        update_active_timescale: function () {
+            const triggered = window.dash_clientside.callback_context.triggered;
+            return triggered[0].prop_id.split('.')[0].replace('btn-', '');
+        },
+
+        copy_value: function (value) {
+            return value;
+        },
+
+        handle_row_selection: function (selected_rows, table_data) {
+            const oculto = {display: 'none'}, visivel = {display: 'inline-block'};
+            if (selected_rows && selected_rows.length && table_data && selected_rows[0] < table_data.length) {
+                const linha = table_data[selected_rows[0]];
+                const identificador = {Obra: linha.Obra ?? null, Frente: linha.Frente ?? null};
+                return [visivel, visivel, visivel, identificador];
+            }
+            return [oculto, oculto, oculto, null];
+        },
+
+        // {semana: valor} das células da grade semanal que diferem do valor lido
+        // (null apaga a semana). Texto que não é número segue como texto, para o
+        // servidor recusar.
+        weekly_grid_changes: function (data) {
+            const alteracoes = {};
+            (data || []).forEach(function (linha) {
+                if (!linha.Semana) {
+                    return;  // Linhas extras criadas ao colar além do fim da grade
+                }
+                let valor = linha.Valor;
+                if (typeof valor === 'string') {
+                    // Formato do Excel em português: '1.234,5' -> 1234.5
+                    let texto = valor.trim().replace(/\s/g, '');
+                    if (texto.includes(',')) {
+                        texto = texto.replace(/\./g, '').replace(',', '.');
+                    }
+                    valor = texto === '' ? null : (isNaN(Number(texto)) ? valor : Number(texto));
+                }
+                valor = valor === undefined ? null : valor;
+                if (valor !== (linha.Original ?? null)) {
+                    alteracoes[linha.Semana] = valor;
+                }
+            });
+            return alteracoes;
+        },
+
+        // Endereço da planilha da tabela de detalhes (table_export.py) com os filtros
+        // e a ordem atuais; a rota vem do href inicial do layout
+        export_url: function (token, obra, frente, sort_by, filter_query, href) {
+            const params = new URLSearchParams();
+            params.set('token', JSON.stringify(token || null));
+            params.set('obra', obra || '');
+            params.set('frente', frente || '');
+            params.set('sort', JSON.stringify(sort_by || []));
+            params.set('filtro', filter_query || '');
+            return (href || '').split('?')[0] + '?' + params.toString();
+        }
+    }
+});
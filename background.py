@@ -0,0 +1,169 @@
+# -----------------------------------------------------------------------------
+# Arquivo: background.py (Callbacks em Segundo Plano)
+# -----------------------------------------------------------------------------
+# A carga inicial e a gravação falam com o armazenamento (Google Sheets) e
+# podem levar segundos. Como callbacks comuns, elas prendem um worker síncrono
+# do Gunicorn durante toda a ida e volta, e os cliques dos outros usuários
+# ficam na fila. Como callbacks em segundo plano do Dash, o worker só dispara
+# o job e responde às consultas periódicas do navegador, que recebe o
+# progresso e pode cancelar a operação.
+#
+# Os jobs rodam num pool de threads do próprio worker (ThreadPoolManager), e
+# não num processo novo por job como no DiskcacheManager do Dash: assim eles
+# usam a conexão do Google Sheets já autorizada pelo worker (sheets_client.py),
+# o cache da carga com stale-while-revalidate (load_cache.py) e as métricas
+# expostas em /metrics, que num processo descartável seriam perdidos.
+#
+# Resultado, progresso e estado de cada job ficam num diskcache em CACHE_DIR,
+# compartilhado entre os workers: a consulta do navegador pode chegar a
+# qualquer um deles. O Dash identifica o job pelos argumentos do callback: a
+# carga inicial não tem argumentos, então dois usuários abrindo a página ao
+# mesmo tempo dividiriam o mesmo job, e o primeiro a buscar o resultado o
+# apagaria, deixando o outro com o painel vazio. Por isso cada disparo recebe
+# uma chave própria (cache_by).
+#
+# Uma thread não pode ser interrompida: cancelar encerra a espera do navegador
+# e o job para na próxima atualização de progresso; uma etapa já iniciada
+# (ex.: a escrita na planilha) termina. Sem os pacotes opcionais
+# (pip install "dash[diskcache]") ou com BACKGROUND_CALLBACKS=0, os mesmos
+# callbacks rodam de forma síncrona, sem progresso nem cancelamento.
+import functools
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from data_store import CACHE_DIR
+
+BACKGROUND_CALLBACKS = os.environ.get('BACKGROUND_CALLBACKS', '1').lower() not in ('0', 'false', 'no')
+BACKGROUND_CACHE_DIR = os.environ.get('BACKGROUND_CACHE_DIR', os.path.join(CACHE_DIR, 'background'))
+
+# Jobs simultâneos por worker; os demais esperam na fila do pool
+BACKGROUND_THREADS = int(os.environ.get('BACKGROUND_THREADS', 4))
+
+# Com chaves próprias por disparo (cache_by), os resultados ficam no diskcache
+# até esse prazo; são pequenos (token do dataset e opções dos filtros)
+BACKGROUND_RESULT_EXPIRE_SECONDS = 60 * 60
+
+_manager = None
+
+
+def _job_id():
+    return uuid.uuid4().hex
+
+
+class JobCancelled(Exception):
+    """O navegador cancelou o job: interrompe a função na próxima atualização de progresso"""
+
+
+def _manager_class():
+    from dash import DiskcacheManager
+
+    class ThreadPoolManager(DiskcacheManager):
+        """DiskcacheManager que executa os jobs num pool de threads do worker em vez de um processo por job"""
+
+        def __init__(self, cache, cache_by=None, expire=None):
+            super().__init__(cache, cache_by=cache_by, expire=expire)
+            self._pool, self._pool_pid = None, None
+            self._pool_lock = threading.Lock()
+            self._atual = threading.local()
+
+        def _executor(self):
+            # Criado no próprio worker: um pool herdado do processo pai ("gunicorn --preload") não tem threads
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=BACKGROUND_THREADS, thread_name_prefix='background')
+                    self._pool_pid = os.getpid()
+                return self._pool
+
+        @staticmethod
+        def _job_key(job):
+            return f'background-job-{job}'
+
+        def call_job_fn(self, key, job_fn, args, context):
+            job = _job_id()
+            self.handle.set(self._job_key(job), os.getpid(), expire=self.expire)
+            self._executor().submit(self._run, job, job_fn, key, args, context)
+            return job
+
+        def _run(self, job, job_fn, key, args, context):
+            self._atual.job = job
+            try:
+                job_fn(key, self._make_progress_key(key), args, context)
+            finally:
+                self._atual.job = None
+                self.handle.delete(self._job_key(job))
+
+        def make_job_fn(self, fn, progress, key=None):
+            if not progress:
+                return super().make_job_fn(fn, progress, key)
+
+            @functools.wraps(fn)
+            def cancelavel(set_progress, *args, **kwargs):
+                job = self._atual.job
+
+                def progresso(valor):
+                    if not self.job_running(job):
+                        raise JobCancelled()
+                    set_progress(valor)
+                return fn(progresso, *args, **kwargs)
+            return super().make_job_fn(cancelavel, progress, key)
+
+        def job_running(self, job):
+            import psutil
+            # O job some da lista ao terminar ou ser cancelado; a checagem do pid cobre um worker que morreu no meio
+            pid = self.handle.get(self._job_key(job)) if job else None
+            return pid is not None and psutil.pid_exists(pid)
+
+        def terminate_job(self, job):
+            if job:
+                self.handle.delete(self._job_key(job))
+
+        def terminate_unhealthy_job(self, job):
+            if job and not self.job_running(job):
+                self.terminate_job(job)
+                return True
+            return False
+
+    return ThreadPoolManager
+
+
+def get_manager():
+    """Gerenciador dos jobs compartilhado, ou None quando os callbacks devem rodar de forma síncrona"""
+    global _manager
+    if _manager is None and BACKGROUND_CALLBACKS:
+        try:
+            import diskcache
+            _manager = _manager_class()(diskcache.Cache(BACKGROUND_CACHE_DIR), cache_by=[_job_id],
+                                        expire=BACKGROUND_RESULT_EXPIRE_SECONDS)
+        except ImportError as e:
+            print(f"Aviso: callbacks em segundo plano desativados, faltam dependências ({e}). "
+                  "Instale com: pip install \"dash[diskcache]\"")
+            return None
+    return _manager
+
+
+def is_enabled():
+    return get_manager() is not None
+
+
+def callback(app, *args, running=None, progress=None, cancel=None, **kwargs):
+    """Como app.callback, mas em segundo plano quando o gerenciador está disponível.
+
+    Em segundo plano, a função recebe set_progress como primeiro argumento
+    (valores para as saídas de 'progress'); depois de um cancelamento, a
+    chamada seguinte a set_progress levanta JobCancelled. No modo síncrono ela
+    recebe uma função que não faz nada, e 'progress'/'cancel' são ignorados.
+    """
+    manager = get_manager()
+
+    def decorator(func):
+        if manager is not None:
+            return app.callback(*args, background=True, manager=manager, running=running, progress=progress,
+                                cancel=cancel, **kwargs)(func)
+
+        @functools.wraps(func)
+        def sincrono(*valores):
+            return func(lambda *_: None, *valores)
+        return app.callback(*args, running=running, **kwargs)(sincrono)
+    return decorator
@@ -0,0 +1,24 @@
+# -----------------------------------------------------------------------------
+# Pacote: benchmarks (Medição de Desempenho dos Callbacks)
+# -----------------------------------------------------------------------------
+# Gera portfólios sintéticos (N obras x M frentes x W semanas) e executa os
+# callbacks registrados por register_callbacks diretamente, medindo tempo,
+# pico de memória e tamanho do payload JSON. Uso:
+#
+#   python -m benchmarks                      # roda e compara com o baseline
+#   python -m benchmarks --save-baseline      # grava o baseline atual
+#   python -m benchmarks --tiers small,medium --repeat 5
+#
+# O baseline de referência (benchmarks/baseline.json) fica no repositório.
+# A comparação termina com código de saída 1 quando o pico de memória ou o
+# tamanho do payload de algum caso piora além da tolerância (ou quando não há
+# baseline), para poder barrar uma mudança no CI. Esses valores não dependem
+# da máquina; o tempo depende, e uma piora de tempo só gera aviso: para
+# compará-lo, grave um baseline próprio (--save-baseline --baseline arquivo)
+# na máquina que vai medir. Depois de uma mudança que altera memória ou
+# payload de propósito, grave o novo baseline e inclua o arquivo no commit.
+#
+# Verificações de correção das otimizações (código de saída 1 se falharem):
+#
+#   python -m benchmarks.concurrency_check    # gravação simultânea (concurrency.py)
+#   python -m benchmarks.rollups_check        # agregados incrementais (rollups.py)
@@ -0,0 +1,320 @@
+# -----------------------------------------------------------------------------
+# Arquivo: benchmarks/concurrency_check.py (Verificação da Gravação Simultânea)
+# -----------------------------------------------------------------------------
+# Reproduz, sem o navegador, usuários que carregam o portfólio, editam e
+# salvam na ordem escolhida, pelo mesmo caminho de persist_data_to_file:
+# save_lock() -> merge_for_save() sobre a releitura -> save_delta(). Cada
+# cenário roda nos backends SQLite (arquivo temporário) e Google Sheets (com a
+# FakeWorksheet em memória de sheets_client) e confere o que ficou gravado:
+#   - a mesma frente editada por dois usuários é um conflito, e a segunda
+#     versão só é gravada ao salvar de novo
+#   - edições em frentes diferentes são mescladas
+#   - renomear e excluir uma frente que ninguém mexeu é aplicado; se outro
+#     usuário a alterou nesse meio tempo, é conflito
+#   - duas inclusões da mesma frente: a segunda é conflito
+# E o bloqueio de arquivo de save_lock(): exclusivo entre conexões, espera a
+# outra gravação terminar, desiste após SAVE_LOCK_TIMEOUT_SECONDS e não
+# bloqueia armazenamentos diferentes. Uso (código de saída 1 se algo falhar):
+#   python -m benchmarks.concurrency_check
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+import pandas as pd
+
+import concurrency
+import data_store
+import schema
+import sheets_client
+from benchmarks.synthetic import generate_dataset
+from storage import GoogleSheetsBackend, SQLiteBackend
+from utils import get_weekly_values, set_weekly_values
+
+OBRA = 'Obra 000'
+X, Y, Z = ((OBRA, f"Frente {i:03d}") for i in range(3))
+
+
+class CheckError(Exception):
+    """Resultado diferente do esperado em uma verificação"""
+
+
+def _check(condicao, mensagem):
+    if not condicao:
+        raise CheckError(mensagem)
+
+
+# --- Edições, como feitas pelos callbacks de callbacks.py ---
+def _semana(dataset, chave):
+    """Primeira semana com fatos da frente"""
+    return sorted(get_weekly_values(dataset.semanas, *chave, 'Planejado') | get_weekly_values(dataset.semanas, *chave, 'Realizado'))[0]
+
+
+def lancar(dataset, chave, valor):
+    """Lança 'valor' como realizado da primeira semana da frente (save_realizado_values)"""
+    semanas = set_weekly_values(dataset.semanas, *chave, 'Realizado', {_semana(dataset, chave): valor}, apagar_nulos=True)
+    novo = dataset.derive(semanas=semanas).recalculate([chave])
+    novo.mark_changed(chave)
+    return novo
+
+
+def renomear(dataset, chave, frente):
+    """Renomeia a frente levando os fatos semanais (save_frente_data em modo de edição)"""
+    nova = (chave[0], frente)
+    frentes = schema.set_key(dataset.frentes, (dataset.frentes['Obra'] == chave[0]) & (dataset.frentes['Frente'] == chave[1]), 'Frente', frente)
+    semanas = schema.set_key(dataset.semanas, (dataset.semanas['Obra'] == chave[0]) & (dataset.semanas['Frente'] == chave[1]), 'Frente', frente)
+    novo = dataset.derive(frentes.reset_index(drop=True), semanas).recalculate({chave, nova})
+    novo.mark_changed(nova, chave)
+    return novo
+
+
+def excluir(dataset, chave):
+    """Exclui a frente e os seus fatos semanais (execute_delete)"""
+    frentes, semanas = dataset.frentes, dataset.semanas
+    novo = dataset.derive(frentes[~((frentes['Obra'] == chave[0]) & (frentes['Frente'] == chave[1]))].reset_index(drop=True),
+                          semanas[~((semanas['Obra'] == chave[0]) & (semanas['Frente'] == chave[1]))])
+    novo.mark_deleted(chave)
+    return novo
+
+
+def inserir(dataset, chave, total):
+    """Inclui uma frente sem fatos semanais (save_frente_data em modo de inclusão)"""
+    linha = pd.DataFrame([{'Obra': chave[0], 'Frente': chave[1], 'Total': float(total),
+                           'Data Início': pd.Timestamp('2024-01-01'), 'Data Fim': pd.Timestamp('2024-03-01')}])
+    novo = dataset.derive(pd.concat([dataset.frentes, linha], ignore_index=True)).recalculate([chave])
+    novo.mark_inserted(chave)
+    return novo
+
+
+# --- Sessões e armazenamento ---
+def abrir(backend):
+    """Sessão recém-carregada, com a versão de cada frente (load_initial_data)"""
+    return concurrency.stamp(backend.load())
+
+
+def salvar(backend, sessao):
+    """Grava a sessão como persist_data_to_file; retorna (sessão depois da gravação, conflitos)"""
+    with concurrency.save_lock(backend.descricao):
+        gravar, resultado, conflitos = concurrency.merge_for_save(sessao, backend.load())
+        if gravar.has_changes():
+            backend.save_delta(gravar)
+    return resultado, conflitos
+
+
+def realizado(dataset, chave, semana):
+    return get_weekly_values(dataset.semanas, *chave, 'Realizado').get(semana)
+
+
+def chaves(dataset):
+    return set(zip(dataset.frentes['Obra'], dataset.frentes['Frente']))
+
+
+def sqlite_backend(diretorio):
+    return SQLiteBackend(os.path.join(diretorio, 'obras.db'))
+
+
+def sheets_backend(diretorio):
+    sheets_client.set_fake_worksheet(sheets_client.FakeWorksheet())
+    return GoogleSheetsBackend()
+
+
+BACKENDS = {'sqlite': sqlite_backend, 'sheets': sheets_backend}
+
+
+def new_storage(fabrica, diretorio):
+    """Backend com um portfólio pequeno já gravado"""
+    backend = fabrica(diretorio)
+    backend.save_delta(generate_dataset(2, 4, 8, seed=1))
+    return backend
+
+
+# --- Cenários de merge_for_save ---
+def check_same_frente_conflict(backend):
+    a, b = abrir(backend), abrir(backend)
+    semana, sy = _semana(a, X), _semana(a, Y)
+    _, conflitos = salvar(backend, lancar(a, X, 11.0))
+    _check(conflitos == [], f"primeira gravação sem conflito, veio {conflitos}")
+    b, conflitos = salvar(backend, lancar(lancar(b, X, 22.0), Y, 33.0))
+    _check(conflitos == [X], f"conflito esperado em {X}, veio {conflitos}")
+    gravado = backend.load()
+    _check(realizado(gravado, X, semana) == 11.0, "a frente em conflito não pode ser sobrescrita")
+    _check(realizado(gravado, Y, sy) == 33.0, "a frente sem conflito deve ser gravada")
+    _check(realizado(b, X, semana) == 22.0 and X in b.alteradas, "a sessão mantém a sua versão pendente")
+    _, conflitos = salvar(backend, b)
+    _check(conflitos == [], f"salvar de novo sobrescreve, veio conflito {conflitos}")
+    _check(realizado(backend.load(), X, semana) == 22.0, "a segunda gravação deve sobrescrever a frente")
+
+
+def check_different_frentes_merge(backend):
+    a, b = abrir(backend), abrir(backend)
+    sx, sy = _semana(a, X), _semana(a, Y)
+    _, conflitos = salvar(backend, lancar(a, X, 11.0))
+    _check(conflitos == [], f"sem conflito esperado, veio {conflitos}")
+    b, conflitos = salvar(backend, lancar(b, Y, 22.0))
+    _check(conflitos == [], f"frentes diferentes não conflitam, veio {conflitos}")
+    gravado = backend.load()
+    _check((realizado(gravado, X, sx), realizado(gravado, Y, sy)) == (11.0, 22.0), "as duas edições devem ficar gravadas")
+    _check(realizado(b, X, sx) == 11.0 and not b.has_changes(), "a sessão passa a ver a edição do outro usuário")
+    _, conflitos = salvar(backend, lancar(b, Y, 44.0))
+    _check(conflitos == [], f"a base da sessão deve ser a versão gravada, veio conflito {conflitos}")
+
+
+def check_rename(backend):
+    a, b = abrir(backend), abrir(backend)
+    nova = (OBRA, 'Frente renomeada')
+    valores = get_weekly_values(a.semanas, *X, 'Realizado')
+    salvar(backend, lancar(b, Y, 22.0))
+    _, conflitos = salvar(backend, renomear(a, X, nova[1]))
+    _check(conflitos == [], f"renomear frente não alterada não conflita, veio {conflitos}")
+    gravado = backend.load()
+    _check(X not in chaves(gravado) and nova in chaves(gravado), "a frente deve ser gravada com o novo nome")
+    _check(get_weekly_values(gravado.semanas, *nova, 'Realizado') == valores, "o realizado acompanha a frente renomeada")
+    _check(realizado(gravado, Y, _semana(gravado, Y)) == 22.0, "a edição do outro usuário deve ser mantida")
+
+    a, b = abrir(backend), abrir(backend)
+    salvar(backend, lancar(b, Z, 33.0))
+    _, conflitos = salvar(backend, renomear(a, Z, 'Outro nome'))
+    # O conflito é informado com o nome que a sessão deu à frente
+    _check(conflitos == [(OBRA, 'Outro nome')], f"renomear frente alterada por outro usuário é conflito, veio {conflitos}")
+    gravado = backend.load()
+    _check(Z in chaves(gravado) and (OBRA, 'Outro nome') not in chaves(gravado), "a frente em conflito não pode ser renomeada")
+
+
+def check_delete(backend):
+    a, b = abrir(backend), abrir(backend)
+    salvar(backend, lancar(b, Y, 22.0))
+    _, conflitos = salvar(backend, excluir(a, X))
+    _check(conflitos == [], f"excluir frente não alterada não conflita, veio {conflitos}")
+    gravado = backend.load()
+    _check(X not in chaves(gravado) and gravado.semanas[(gravado.semanas['Obra'] == X[0]) & (gravado.semanas['Frente'] == X[1])].empty,
+           "a frente e os seus fatos semanais devem ser excluídos")
+    _check(realizado(gravado, Y, _semana(gravado, Y)) == 22.0, "a edição do outro usuário deve ser mantida")
+
+    a, b = abrir(backend), abrir(backend)
+    salvar(backend, lancar(b, Z, 33.0))
+    _, conflitos = salvar(backend, excluir(a, Z))
+    _check(conflitos == [Z], f"excluir frente alterada por outro usuário é conflito, veio {conflitos}")
+    _check(Z in chaves(backend.load()), "a frente em conflito não pode ser excluída")
+
+    a, b = abrir(backend), abrir(backend)
+    salvar(backend, excluir(b, Y))
+    a, conflitos = salvar(backend, excluir(a, Y))
+    _check(conflitos == [] and not a.has_changes(), f"excluir frente já excluída não conflita, veio {conflitos}")
+    _check(Y not in chaves(backend.load()), "a frente continua excluída")
+
+
+def check_insert_conflict(backend):
+    a, b = abrir(backend), abrir(backend)
+    nova = (OBRA, 'Frente nova')
+    _, conflitos = salvar(backend, inserir(a, nova, 100))
+    _check(conflitos == [], f"inclusão sem conflito esperada, veio {conflitos}")
+    _, conflitos = salvar(backend, inserir(b, nova, 200))
+    _check(conflitos == [nova], f"inclusão da mesma frente por outro usuário é conflito, veio {conflitos}")
+    total = backend.load().frentes.set_index(['Obra', 'Frente']).loc[nova, 'Total']
+    _check(float(total) == 100.0, f"a primeira inclusão deve ser mantida, Total {total}")
+
+
+MERGE_CHECKS = [check_same_frente_conflict, check_different_frentes_merge, check_rename, check_delete, check_insert_conflict]
+
+
+# --- Bloqueio de save_lock() ---
+def _hold(nome, segundos, dentro):
+    """Thread que mantém o bloqueio de 'nome' por 'segundos'; 'dentro' é sinalizado ao obtê-lo"""
+    def segurar():
+        with concurrency.save_lock(nome):
+            dentro.set()
+            time.sleep(segundos)
+    thread = threading.Thread(target=segurar, daemon=True)
+    thread.start()
+    _check(dentro.wait(5), "o bloqueio livre deve ser obtido")
+    return thread
+
+
+def check_lock_timeout():
+    avisos = []
+    thread = _hold('armazenamento', 1.5, threading.Event())
+    concurrency.SAVE_LOCK_TIMEOUT_SECONDS = 0.5
+    inicio = time.monotonic()
+    try:
+        with concurrency.save_lock('armazenamento', lambda: avisos.append(1)):
+            raise CheckError("o bloqueio não pode ser obtido enquanto outra gravação está em andamento")
+    except concurrency.SaveInProgressError:
+        pass
+    espera = time.monotonic() - inicio
+    _check(0.4 <= espera < 1.4, f"deve desistir após SAVE_LOCK_TIMEOUT_SECONDS, desistiu em {espera:.2f} s")
+    _check(avisos == [1], f"aguardando() deve ser chamada uma vez, foi {len(avisos)}")
+    thread.join()
+
+
+def check_lock_waits():
+    avisos = []
+    thread = _hold('armazenamento', 0.5, threading.Event())
+    concurrency.SAVE_LOCK_TIMEOUT_SECONDS = 5
+    inicio = time.monotonic()
+    with concurrency.save_lock('armazenamento', lambda: avisos.append(1)):
+        espera = time.monotonic() - inicio
+    _check(0.2 <= espera < 4, f"deve esperar a outra gravação terminar, esperou {espera:.2f} s")
+    _check(avisos == [1], f"aguardando() deve ser chamada uma vez, foi {len(avisos)}")
+    thread.join()
+
+
+def check_lock_per_storage():
+    if concurrency.fcntl is None:
+        return  # Sem fcntl (Windows) há um único bloqueio no processo
+    dentro = threading.Event()
+    thread = _hold('armazenamento', 0.5, dentro)
+    concurrency.SAVE_LOCK_TIMEOUT_SECONDS = 0.1
+    with concurrency.save_lock('outro armazenamento'):
+        pass
+    thread.join()
+
+
+LOCK_CHECKS = [check_lock_timeout, check_lock_waits, check_lock_per_storage]
+
+
+def _run(nome, verificacao, *args):
+    try:
+        verificacao(*args)
+    except Exception as e:
+        print(f"  FALHOU {nome}: {e}")
+        if not isinstance(e, CheckError):
+            traceback.print_exc()
+        return False
+    print(f"  ok     {nome}")
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.concurrency_check', description='Verificação da gravação simultânea')
+    parser.add_argument('--backend', action='append', choices=sorted(BACKENDS), help='roda apenas neste backend (pode repetir)')
+    args = parser.parse_args(argv)
+
+    # Bloqueios e caches em um diretório próprio, fora do CACHE_DIR real do dashboard
+    diretorio = tempfile.mkdtemp(prefix='dashboard-obras-check-')
+    originais = (data_store.CACHE_DIR, concurrency.CACHE_DIR, concurrency.SAVE_LOCK_TIMEOUT_SECONDS)
+    data_store.CACHE_DIR = concurrency.CACHE_DIR = os.path.join(diretorio, 'cache')
+    falhas = 0
+    try:
+        for nome_backend in args.backend or sorted(BACKENDS):
+            print(f"\nmerge_for_save ({nome_backend})")
+            for verificacao in MERGE_CHECKS:
+                armazenamento = tempfile.mkdtemp(dir=diretorio)
+                falhas += not _run(verificacao.__name__, verificacao, new_storage(BACKENDS[nome_backend], armazenamento))
+        print("\nsave_lock")
+        for verificacao in LOCK_CHECKS:
+            falhas += not _run(verificacao.__name__, verificacao)
+    finally:
+        data_store.CACHE_DIR, concurrency.CACHE_DIR, concurrency.SAVE_LOCK_TIMEOUT_SECONDS = originais
+        sheets_client.set_fake_worksheet(None)
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    print(f"\n{falhas} verificação(ões) falharam." if falhas else "\nTodas as verificações passaram.")
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,429 @@
+# -----------------------------------------------------------------------------
+# Arquivo: benchmarks/load_test.py (Teste de Carga com Usuários Simultâneos)
+# -----------------------------------------------------------------------------
+# Simula vários usuários usando o dashboard ao mesmo tempo. Cada usuário é uma
+# thread que abre a página e repete a sequência de cliques abaixo, enviando os
+# mesmos POSTs a /_dash-update-component que o navegador enviaria:
+#   1. selecionar uma obra
+#   2. trocar a escala de tempo do gráfico de evolução
+#   3. abrir os detalhes: mudar de página na tabela, selecionar uma frente e
+#      abrir o lançamento de andamento
+#   4. salvar o andamento de algumas semanas (e, com --persist, gravar no
+#      armazenamento)
+#
+# Como no navegador, cada resposta dispara os callbacks que dependem das
+# propriedades alteradas (ex.: um novo 'data-store' atualiza todos os
+# gráficos). Os callbacks do navegador (assets/clientside.js) que a
+# sequência usa são reproduzidos em CLIENTSIDE_RULES; os callbacks em segundo
+# plano (background.py) são consultados até terminar, no intervalo que o
+# próprio Dash informa.
+#
+# O armazenamento é um banco SQLite local com um portfólio sintético
+# (benchmarks/synthetic.py), no lugar do Google Sheets. Os alvos:
+#   - padrão: o app de app.py no próprio processo, pelo cliente de testes do
+#     Flask (um único processo, como um worker do Gunicorn com várias threads)
+#   - --gunicorn: sobe "gunicorn app:server --preload" com --workers/--threads
+#   - --url: um servidor já em execução (configurado com o mesmo banco)
+#
+# Para cada quantidade de usuários em --users, o teste roda por --duration
+# segundos e informa a vazão, a latência (p50/p95/p99) de cada callback e o
+# ponto de saturação: a partir de quantos usuários a vazão para de crescer e
+# a latência só aumenta. Use para dimensionar workers e threads do Procfile:
+#   python -m benchmarks.load_test --gunicorn --workers 2 --threads 4 --users 1,2,4,8,16
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+# Vazão que cresce menos que isso ao dobrar os usuários indica saturação
+SATURATION_MIN_GAIN = 0.10
+
+# Tempo máximo de espera por um callback em segundo plano
+BACKGROUND_TIMEOUT_SECONDS = 120
+
+# Propriedades calculadas pelos callbacks do navegador (assets/clientside.js)
+# que a sequência usa: saída -> (entrada, função dos valores atuais)
+CLIENTSIDE_RULES = {
+    'selected-obra-store.data': ('obra-filter.value', lambda props: props.get('obra-filter.value')),
+    'category-filter-store.data': ('category-filter.value', lambda props: props.get('category-filter.value')),
+    'grade-realizado-alteracoes.data': ('grade-realizado.data', lambda props: weekly_grid_changes(props.get('grade-realizado.data'))),
+    'selected-row-index-store.data': ('tabela-detalhes-frentes.selected_rows', lambda props: selected_row(props)),
+}
+
+
+def weekly_grid_changes(linhas):
+    """Como weekly_grid_changes do clientside.js, para valores numéricos"""
+    return {linha['Semana']: linha.get('Valor') for linha in linhas or []
+            if linha.get('Semana') and linha.get('Valor') != linha.get('Original')}
+
+
+def selected_row(props):
+    selecionadas, linhas = props.get('tabela-detalhes-frentes.selected_rows'), props.get('tabela-detalhes-frentes.data')
+    if selecionadas and linhas and selecionadas[0] < len(linhas):
+        linha = linhas[selecionadas[0]]
+        return {'Obra': linha.get('Obra'), 'Frente': linha.get('Frente')}
+    return None
+
+
+def _outputs(output):
+    """Lista de {'id', 'property'} de uma chave de saída do Dash ('a.b' ou '..a.b...c.d..')"""
+    partes = output.strip('.').split('...') if output.startswith('..') else [output]
+    saidas = []
+    for parte in partes:
+        cid, prop = parte.split('.', 1)
+        saidas.append({'id': cid, 'property': prop.split('@')[0]})
+    return saidas
+
+
+def _layout_props(no, props):
+    """Valores iniciais {id.propriedade} de todos os componentes com id do layout"""
+    if isinstance(no, list):
+        for filho in no:
+            _layout_props(filho, props)
+    elif isinstance(no, dict) and 'props' in no:
+        cid = no['props'].get('id')
+        for nome, valor in no['props'].items():
+            if cid is not None and isinstance(cid, str) and nome != 'children':
+                props[f'{cid}.{nome}'] = valor
+            _layout_props(valor, props)
+        if isinstance(cid, str) and 'children' in no['props']:
+            props[f'{cid}.children'] = no['props']['children']
+
+
+# --- Transporte: cliente de testes do Flask ou HTTP ---
+class FlaskTransport:
+    def __init__(self, server):
+        self.server = server
+
+    def session(self):
+        cliente = self.server.test_client()
+
+        def enviar(metodo, caminho, corpo=None):
+            resposta = cliente.open(caminho, method=metodo, json=corpo)
+            return resposta.status_code, resposta.get_json(silent=True)
+        return enviar
+
+
+class HttpTransport:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def session(self):
+        import requests
+        sessao = requests.Session()
+
+        def enviar(metodo, caminho, corpo=None):
+            resposta = sessao.request(metodo, self.url + caminho, json=corpo, timeout=BACKGROUND_TIMEOUT_SECONDS)
+            try:
+                return resposta.status_code, resposta.json()
+            except ValueError:
+                return resposta.status_code, None
+        return enviar
+
+
+# --- Usuário simulado ---
+class SimulatedUser:
+    """Um navegador: guarda as propriedades dos componentes e dispara os callbacks em cadeia"""
+
+    def __init__(self, transporte, dependencias, nomes, props_iniciais, registro, semente, persistir=False, pausa=0.0):
+        self.enviar = transporte.session()
+        self.dependencias = dependencias
+        self.nomes = nomes
+        self.props = dict(props_iniciais)
+        self.registro = registro
+        self.rng = random.Random(semente)
+        self.persistir = persistir
+        self.pausa = pausa
+
+    # Envio de um callback (e consulta até o fim, se em segundo plano)
+    def _call(self, dep, alteradas):
+        entradas = [{**i, 'value': self.props.get(f"{i['id']}.{i['property']}")} for i in dep['inputs']]
+        estados = [{**s, 'value': self.props.get(f"{s['id']}.{s['property']}")} for s in dep['state']]
+        saidas = _outputs(dep['output'])
+        corpo = {'output': dep['output'], 'outputs': saidas if dep['output'].startswith('..') else saidas[0],
+                 'inputs': entradas, 'state': estados,
+                 'changedPropIds': [f"{i['id']}.{i['property']}" for i in dep['inputs'] if f"{i['id']}.{i['property']}" in alteradas]}
+        nome = self.nomes.get(dep['output'], saidas[0]['id'])
+        inicio = time.perf_counter()
+        status, resposta = self.enviar('POST', '/_dash-update-component', corpo)
+        self.registro.request()
+        if status == 200 and resposta and 'job' in resposta and 'response' not in resposta:
+            intervalo = (dep.get('background') or {}).get('interval', 1000) / 1000
+            caminho = f"/_dash-update-component?cacheKey={resposta['cacheKey']}&job={resposta['job']}"
+            while time.perf_counter() - inicio < BACKGROUND_TIMEOUT_SECONDS:
+                time.sleep(intervalo)
+                status, resposta = self.enviar('POST', caminho, corpo)
+                self.registro.request()
+                if status != 200 or (resposta and 'response' in resposta):
+                    break
+        self.registro.observe(nome, time.perf_counter() - inicio, ok=status in (200, 204))
+        if status != 200 or not resposta:
+            return {}
+        return {f'{cid}.{prop}': valor for cid, valores in resposta.get('response', {}).items() for prop, valor in valores.items()}
+
+    def _apply(self, novos):
+        alteradas = set()
+        for chave, valor in novos.items():
+            if self.props.get(chave) != valor:
+                self.props[chave] = valor
+                alteradas.add(chave)
+        # Callbacks do navegador
+        for saida, (entrada, funcao) in CLIENTSIDE_RULES.items():
+            if entrada in alteradas:
+                valor = funcao(self.props)
+                if self.props.get(saida) != valor:
+                    self.props[saida] = valor
+                    alteradas.add(saida)
+        return alteradas
+
+    def set(self, novos):
+        """Altera propriedades como um clique ou digitação, e dispara os callbacks dependentes em cadeia"""
+        self._propagate(self._apply(novos))
+
+    def _propagate(self, alteradas):
+        while alteradas:
+            proximas = set()
+            for dep in self.dependencias:
+                entradas = {f"{i['id']}.{i['property']}" for i in dep['inputs']}
+                if entradas & alteradas:
+                    proximas |= self._apply(self._call(dep, alteradas)) - entradas
+            alteradas = proximas
+
+    def click(self, botao):
+        self.set({f'{botao}.n_clicks': (self.props.get(f'{botao}.n_clicks') or 0) + 1})
+
+    def _think(self):
+        if self.pausa:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.pausa)
+
+    # Sequência de cliques
+    def open_page(self):
+        # A carga inicial é disparada pelo próprio carregamento do layout
+        self._propagate({'app-layout-hidden-trigger.children'})
+
+    def run_sequence(self):
+        obras = [o['value'] for o in self.props.get('obra-filter.options') or []]
+        if obras:
+            self.set({'obra-filter.value': self.rng.choice(obras)})
+        self._think()
+        self.set({'active-timescale-store.data': self.rng.choice(['semanal', 'mensal', 'geral'])})
+        self._think()
+        paginas = self.props.get('tabela-detalhes-frentes.page_count') or 1
+        self.set({'tabela-detalhes-frentes.page_current': self.rng.randrange(paginas)})
+        linhas = self.props.get('tabela-detalhes-frentes.data') or []
+        candidatas = [i for i, linha in enumerate(linhas) if linha.get('Frente') != '---']
+        if candidatas:
+            self.set({'tabela-detalhes-frentes.selected_rows': [self.rng.choice(candidatas)]})
+            self.click('btn-abrir-realizado-modal')
+            self._think()
+            grade = [dict(linha) for linha in self.props.get('grade-realizado.data') or []]
+            for linha in self.rng.sample(grade, min(3, len(grade))):
+                linha['Valor'] = round(self.rng.uniform(0, 100), 2)
+            self.set({'grade-realizado.data': grade})
+            self.click('btn-salvar-realizado')
+        if self.persistir:
+            self._think()
+            self.click('btn-persistir-dados')
+        self.registro.sequence()
+
+
+# --- Registro das medições ---
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+        self.requisicoes = 0
+        self.sequencias = 0
+
+    def request(self):
+        with self._lock:
+            self.requisicoes += 1
+
+    def sequence(self):
+        with self._lock:
+            self.sequencias += 1
+
+    def observe(self, nome, segundos, ok=True):
+        with self._lock:
+            self.latencias[nome].append(segundos)
+            if not ok:
+                self.erros[nome] += 1
+
+    def summary(self, duracao):
+        callbacks = {}
+        for nome, valores in sorted(self.latencias.items()):
+            ms = np.asarray(valores) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            callbacks[nome] = {'n': len(ms), 'errors': self.erros[nome], 'p50_ms': round(float(p50), 1),
+                               'p95_ms': round(float(p95), 1), 'p99_ms': round(float(p99), 1)}
+        todas = np.concatenate([np.asarray(v) for v in self.latencias.values()]) * 1000 if self.latencias else np.zeros(1)
+        return {'requests': self.requisicoes, 'requests_per_s': round(self.requisicoes / duracao, 2),
+                'sequences_per_s': round(self.sequencias / duracao, 3), 'errors': sum(self.erros.values()),
+                'p50_ms': round(float(np.percentile(todas, 50)), 1), 'p95_ms': round(float(np.percentile(todas, 95)), 1),
+                'callbacks': callbacks}
+
+
+def run_level(transporte, dependencias, nomes, props, n_usuarios, duracao, persistir, pausa):
+    """Roda n_usuarios simultâneos por 'duracao' segundos (após abrirem a página) e devolve o resumo"""
+    # A abertura da página fica num registro à parte: a medição começa quando
+    # todos os usuários terminaram de abri-la
+    carga, registro = Recorder(), Recorder()
+    inicio = [None]
+    prontos = threading.Barrier(n_usuarios, action=lambda: inicio.__setitem__(0, time.perf_counter()))
+
+    def usuario(i):
+        u = SimulatedUser(transporte, dependencias, nomes, props, carga, semente=i, persistir=persistir, pausa=pausa)
+        u.open_page()
+        prontos.wait()
+        u.registro = registro
+        while time.perf_counter() < inicio[0] + duracao:
+            u.run_sequence()
+
+    threads = [threading.Thread(target=usuario, args=(i,), daemon=True) for i in range(n_usuarios)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    resumo = registro.summary(time.perf_counter() - inicio[0])
+    resumo['users'] = n_usuarios
+    resumo['page_load'] = carga.summary(1)['callbacks']
+    return resumo
+
+
+def find_saturation(niveis):
+    """Primeiro nível em que a vazão cresceu menos que SATURATION_MIN_GAIN em relação ao anterior"""
+    for anterior, atual in zip(niveis, niveis[1:]):
+        if atual['requests_per_s'] < anterior['requests_per_s'] * (1 + SATURATION_MIN_GAIN):
+            return anterior, atual
+    return None
+
+
+# --- Preparação do ambiente ---
+def prepare_storage(tier, caminho):
+    """Grava em 'caminho' um banco SQLite com o portfólio sintético do tier (o armazenamento local do teste)"""
+    from benchmarks.synthetic import generate_tier
+    from storage import SQLiteBackend
+    SQLiteBackend(caminho).save_delta(generate_tier(tier))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(workers, threads, env):
+    porta = _free_port()
+    comando = [sys.executable, '-m', 'gunicorn', 'app:server', '--preload', '--workers', str(workers),
+               '--threads', str(threads), '--bind', f'127.0.0.1:{porta}', '--log-level', 'warning']
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processo = subprocess.Popen(comando, cwd=raiz, env=env, stdout=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{porta}'
+    import requests
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        try:
+            requests.get(url + '/_dash-layout', timeout=1)
+            return processo, url
+        except requests.ConnectionError:
+            if processo.poll() is not None:
+                break
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError("o Gunicorn não iniciou (veja a saída acima)")
+
+
+def print_level(resumo):
+    print(f"\n== {resumo['users']} usuário(s): {resumo['requests_per_s']:.1f} req/s, "
+          f"{resumo['sequences_per_s']:.2f} sequências/s, p50 {resumo['p50_ms']:.0f} ms, p95 {resumo['p95_ms']:.0f} ms, "
+          f"{resumo['errors']} erro(s)")
+    for nome, r in resumo['callbacks'].items():
+        print(f"  {nome:<35} {r['n']:>6}  p50 {r['p50_ms']:>8.1f} ms  p95 {r['p95_ms']:>8.1f} ms  p99 {r['p99_ms']:>8.1f} ms"
+              + (f"  {r['errors']} erro(s)" if r['errors'] else ''))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do dashboard com usuários simultâneos")
+    parser.add_argument('--users', default='1,2,4,8', help="quantidades de usuários simultâneos, separadas por vírgula")
+    parser.add_argument('--duration', type=float, default=20, help="segundos de medição em cada quantidade de usuários")
+    parser.add_argument('--tier', default='small', help="portfólio sintético do armazenamento (small, medium, large)")
+    parser.add_argument('--think-ms', type=float, default=0, help="pausa média entre os passos da sequência (0 = carga máxima)")
+    parser.add_argument('--persist', action='store_true', help="grava no armazenamento ao fim de cada sequência")
+    alvo = parser.add_mutually_exclusive_group()
+    alvo.add_argument('--gunicorn', action='store_true', help="sobe o Gunicorn em vez de usar o cliente de testes do Flask")
+    alvo.add_argument('--url', help="servidor já em execução (ex.: http://127.0.0.1:8050)")
+    parser.add_argument('--workers', type=int, default=2, help="workers do Gunicorn (com --gunicorn)")
+    parser.add_argument('--threads', type=int, default=1, help="threads por worker do Gunicorn (com --gunicorn)")
+    parser.add_argument('--output', help="grava os resultados em JSON neste arquivo")
+    args = parser.parse_args(argv)
+    niveis_usuarios = sorted({int(u) for u in args.users.split(',') if u.strip()})
+
+    # O ambiente vale também para este processo, antes de importar o app e o
+    # armazenamento (que leem a configuração na importação): o app é o alvo no
+    # modo padrão e, nos outros, fornece o nome de cada callback
+    diretorio = tempfile.mkdtemp(prefix='dashboard-load-test-')
+    env = dict(os.environ, STORAGE_BACKEND='sqlite', STORAGE_PATH=os.path.join(diretorio, 'load_test.sqlite'),
+               DATASET_CACHE_DIR=os.path.join(diretorio, 'cache'))
+    os.environ.update(env)
+    if not args.url:
+        prepare_storage(args.tier, env['STORAGE_PATH'])
+    import app
+
+    processo = None
+    if args.gunicorn:
+        processo, url = start_gunicorn(args.workers, args.threads, env)
+        transporte, descricao = HttpTransport(url), f"Gunicorn ({args.workers} worker(s) x {args.threads} thread(s))"
+    elif args.url:
+        transporte, descricao = HttpTransport(args.url), args.url
+    else:
+        transporte, descricao = FlaskTransport(app.server), "cliente de testes do Flask (1 processo)"
+
+    try:
+        enviar = transporte.session()
+        _, dependencias = enviar('GET', '/_dash-dependencies')
+        _, layout = enviar('GET', '/_dash-layout')
+        dependencias = [d for d in dependencias if not d.get('clientside_function')]
+        nomes = {chave: getattr(valor.get('callback'), '__name__', chave) for chave, valor in app.app.callback_map.items()}
+        props = {}
+        _layout_props(layout, props)
+
+        print(f"Alvo: {descricao}; portfólio '{args.tier}'; {args.duration:g} s por nível")
+        niveis = []
+        for n in niveis_usuarios:
+            resumo = run_level(transporte, dependencias, nomes, props, n, args.duration, args.persist, args.think_ms / 1000)
+            niveis.append(resumo)
+            print_level(resumo)
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+
+    saturacao = find_saturation(niveis)
+    print("\n== Saturação")
+    if saturacao:
+        anterior, atual = saturacao
+        print(f"  De {anterior['users']} para {atual['users']} usuários a vazão foi de {anterior['requests_per_s']:.1f} "
+              f"para {atual['requests_per_s']:.1f} req/s e o p95 de {anterior['p95_ms']:.0f} para {atual['p95_ms']:.0f} ms: "
+              f"o alvo satura com cerca de {anterior['users']} usuário(s) simultâneo(s).")
+    else:
+        print(f"  A vazão ainda cresce com {niveis_usuarios[-1]} usuários; aumente --users para encontrar o limite.")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'target': descricao, 'tier': args.tier, 'duration_s': args.duration, 'levels': niveis,
+                       'saturation_users': saturacao[0]['users'] if saturacao else None}, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# -----------------------------------------------------------------------------
+# Arquivo: benchmarks/rollups_check.py (Verificação dos Agregados Incrementais)
+# -----------------------------------------------------------------------------
+# Aplica a um portfólio sintético uma sequência de edições, cada uma como o
+# callback correspondente de callbacks.py a faz, com os agregados derivados
+# do passo anterior por Dataset.update_rollups (ROLLUP_DELTA_MIN_ROWS = 0, para
+# que o caminho incremental rode mesmo em portfólios pequenos). Depois de cada
+# passo os agregados acumulados são comparados com Rollups.build do dataset
+# resultante: um erro de sinal, uma frente esquecida ou resíduo acumulado
+# aparece no passo que o causou. As edições: realizado, planejamento (de e
+# para a distribuição linear), Total e datas, inclusão de obra e de frentes,
+# renomeação, exclusão e exclusão seguida de nova inclusão com o mesmo nome.
+# Uso (código de saída 1 se algo falhar):
+#   python -m benchmarks.rollups_check --tiers small,medium
+import argparse
+import sys
+import traceback
+
+import pandas as pd
+
+import dataset as dataset_module
+import schema
+from benchmarks.synthetic import TIERS, generate_tier
+from rollups import ROLLUP_FREQS, Rollups
+from utils import get_weekly_values, set_weekly_values
+from week_calendar import weeks_in_range
+
+# Diferença aceita entre os agregados incrementais e os remontados
+TOLERANCIA = 1e-6
+
+
+class CheckError(Exception):
+    """Agregados incrementais diferentes dos remontados"""
+
+
+def _mascara(df, chave):
+    return (df['Obra'] == chave[0]) & (df['Frente'] == chave[1])
+
+
+def editar(anterior, chaves, frentes=None, semanas=None):
+    """Novo dataset com os agregados derivados de 'anterior', como nos callbacks de edição"""
+    novo = anterior.derive(frentes, semanas)
+    if chaves:
+        novo.recalculate(chaves)
+    return novo.update_rollups(anterior, chaves)
+
+
+# --- Edições ---
+def lancar_realizado(ds, chave):
+    semanas = weeks_in_range(*ds.frentes.loc[_mascara(ds.frentes, chave), ['Data Início', 'Data Fim']].iloc[0])
+    valores = {w: round(10.0 + i, 2) for i, w in enumerate(semanas[:3])}
+    valores[semanas[-1]] = None  # Apaga um lançamento
+    return editar(ds, [chave], semanas=set_weekly_values(ds.semanas, *chave, 'Realizado', valores, apagar_nulos=True))
+
+
+def planejar(ds, chave, valor):
+    """Troca o planejamento semanal (valor None volta a frente para a distribuição linear)"""
+    semanas = weeks_in_range(*ds.frentes.loc[_mascara(ds.frentes, chave), ['Data Início', 'Data Fim']].iloc[0])
+    valores = {} if valor is None else {w: valor for w in semanas}
+    return editar(ds, [chave], semanas=set_weekly_values(ds.semanas, *chave, 'Planejado', valores, substituir=True))
+
+
+def alterar_total_e_datas(ds, chave):
+    frentes = ds.frentes.copy()
+    linha = _mascara(frentes, chave)
+    frentes.loc[linha, 'Total'] = frentes.loc[linha, 'Total'] * 2
+    frentes.loc[linha, 'Data Fim'] = frentes.loc[linha, 'Data Fim'] + pd.Timedelta(weeks=6)
+    return editar(ds, [chave], frentes=frentes)
+
+
+def incluir_obra(ds, obra):
+    linha = pd.DataFrame([{'Obra': obra, 'Frente': '---', 'Total': 0.0, 'Data Início': pd.NaT, 'Data Fim': pd.NaT}])
+    return editar(ds, [], frentes=pd.concat([ds.frentes, linha], ignore_index=True))
+
+
+def incluir_frente(ds, chave, total, plano=None):
+    linha = pd.DataFrame([{'Obra': chave[0], 'Frente': chave[1], 'Total': float(total),
+                           'Data Início': pd.Timestamp('2024-02-05'), 'Data Fim': pd.Timestamp('2024-05-27')}])
+    frentes = pd.concat([ds.frentes, linha], ignore_index=True)
+    valores = {w: plano for w in weeks_in_range(linha['Data Início'].iloc[0], linha['Data Fim'].iloc[0])} if plano else {}
+    return editar(ds, [chave], frentes, set_weekly_values(ds.semanas, *chave, 'Planejado', valores, substituir=True))
+
+
+def renomear(ds, chave, frente):
+    nova = (chave[0], frente)
+    frentes = schema.set_key(ds.frentes, _mascara(ds.frentes, chave), 'Frente', frente)
+    semanas = schema.set_key(ds.semanas, _mascara(ds.semanas, chave), 'Frente', frente)
+    return editar(ds, {chave, nova}, frentes, semanas)
+
+
+def excluir(ds, chave):
+    return editar(ds, [chave], ds.frentes[~_mascara(ds.frentes, chave)], ds.semanas[~_mascara(ds.semanas, chave)])
+
+
+def sequence(ds):
+    """[(descrição, edição)] aplicadas em ordem sobre o portfólio 'ds'"""
+    frentes = [c for c in zip(ds.frentes['Obra'], ds.frentes['Frente']) if c[1] != '---']
+    com_plano = [c for c in frentes if get_weekly_values(ds.semanas, *c, 'Planejado')]
+    linear = [c for c in frentes if c not in com_plano]
+    outra_obra = next(c for c in frentes if c[0] != frentes[0][0])
+    nova_obra = 'Obra nova'
+    renomeada = (com_plano[1][0], 'Frente renomeada')
+    return [
+        ('realizado', lambda d: lancar_realizado(d, frentes[0])),
+        ('planejamento de frente linear', lambda d: planejar(d, linear[0], 5.0)),
+        ('planejamento removido (volta a linear)', lambda d: planejar(d, com_plano[0], None)),
+        ('Total e datas', lambda d: alterar_total_e_datas(d, linear[1])),
+        ('inclusão de obra', lambda d: incluir_obra(d, nova_obra)),
+        ('inclusão de frente linear', lambda d: incluir_frente(d, (nova_obra, 'Frente 1'), 1200)),
+        ('inclusão de frente planejada', lambda d: incluir_frente(d, (frentes[0][0], 'Frente planejada'), 900, plano=50.0)),
+        ('renomeação', lambda d: renomear(d, com_plano[1], renomeada[1])),
+        ('realizado da frente renomeada', lambda d: lancar_realizado(d, renomeada)),
+        ('exclusão', lambda d: excluir(d, outra_obra)),
+        ('exclusão da frente renomeada', lambda d: excluir(d, renomeada)),
+        ('nova inclusão com o nome excluído', lambda d: incluir_frente(d, renomeada, 700, plano=20.0)),
+        ('exclusão da frente incluída', lambda d: excluir(d, (nova_obra, 'Frente 1'))),
+    ]
+
+
+def compare(incremental, remontado):
+    """Lista das diferenças entre dois Rollups (vazia se iguais dentro de TOLERANCIA)"""
+    diferencas = []
+    for escala in ROLLUP_FREQS:
+        for nome, a, b in (('por_obra', incremental.por_obra[escala], remontado.por_obra[escala]),
+                           ('totais', incremental.totais[escala], remontado.totais[escala])):
+            try:
+                pd.testing.assert_frame_equal(a, b, check_exact=False, atol=TOLERANCIA, rtol=0)
+            except AssertionError as e:
+                diferencas.append(f"{nome}[{escala}]: {str(e).splitlines()[0]}")
+    return diferencas
+
+
+def check_sequence(ds):
+    """Aplica sequence(ds) e compara os agregados a cada passo; retorna a quantidade de falhas"""
+    ds.rollups  # Ponto de partida: agregados montados, como depois do primeiro gráfico
+    falhas = 0
+    for descricao, edicao in sequence(ds):
+        novo = ds
+        try:
+            novo = edicao(ds)
+            if novo._rollups is None:
+                raise CheckError("os agregados não foram derivados do passo anterior")
+            diferencas = compare(novo._rollups, Rollups.build(novo.frentes, novo.semanas))
+            if diferencas:
+                raise CheckError('; '.join(diferencas))
+        except Exception as e:
+            print(f"  FALHOU {descricao}: {e}")
+            if not isinstance(e, CheckError):
+                traceback.print_exc()
+            falhas += 1
+            # Continua a partir dos agregados corretos, para não repetir a mesma falha nos passos seguintes
+            novo._rollups = Rollups.build(novo.frentes, novo.semanas)
+        else:
+            print(f"  ok     {descricao}")
+        ds = novo
+    return falhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.rollups_check', description='Verificação dos agregados incrementais')
+    parser.add_argument('--tiers', default='small,medium', help=f"escalas separadas por vírgula ({', '.join(TIERS)})")
+    args = parser.parse_args(argv)
+    tiers = [t.strip() for t in args.tiers.split(',') if t.strip()]
+    desconhecidos = [t for t in tiers if t not in TIERS]
+    if desconhecidos:
+        parser.error(f"tier(s) desconhecido(s): {', '.join(desconhecidos)}")
+
+    original = dataset_module.ROLLUP_DELTA_MIN_ROWS
+    dataset_module.ROLLUP_DELTA_MIN_ROWS = 0
+    falhas = 0
+    try:
+        for tier in tiers:
+            print(f"\nRollups.update x Rollups.build ({tier})")
+            falhas += check_sequence(generate_tier(tier))
+    finally:
+        dataset_module.ROLLUP_DELTA_MIN_ROWS = original
+
+    print(f"\n{falhas} verificação(ões) falharam." if falhas else "\nTodas as verificações passaram.")
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
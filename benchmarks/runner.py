@@ -0,0 +1,244 @@
+# -----------------------------------------------------------------------------
+# Arquivo: benchmarks/runner.py (Execução e Comparação com o Baseline)
+# -----------------------------------------------------------------------------
+# Os callbacks são capturados com um app "gravador" no lugar do Dash: o
+# decorator apenas guarda a função original, que é chamada diretamente com os
+# mesmos argumentos que o Dash enviaria.
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from dash import no_update
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from plotly.io.json import to_json_plotly
+
+import data_store
+import figure_cache
+from benchmarks.synthetic import TIERS, generate_tier
+from callbacks import register_callbacks
+from utils import recalculate_dataframe
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Diferenças de tempo abaixo disso são ruído de medição, qualquer que seja o percentual
+MIN_TIME_DELTA_MS = 2.0
+# Idem para o pico de memória: casos quase sem alocação (ex.: cache de gráficos) oscilam alguns KiB
+MIN_PEAK_DELTA_KIB = 16.0
+
+# Métricas que reprovam a execução: memória e payload não dependem da carga da
+# máquina. O tempo varia ~30% entre execuções (e entre máquinas), então uma
+# piora de wall_ms é só um aviso.
+GATED_METRICS = ('peak_kib', 'payload_bytes')
+
+
+class RecorderApp:
+    """Substituto do Dash que apenas registra as funções decoradas"""
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def callback(self, *args, **kwargs):
+        def decorator(func):
+            self.callbacks[func.__name__] = func
+            return func
+        return decorator
+
+    def clientside_callback(self, *args, **kwargs):
+        pass
+
+    @staticmethod
+    def activate_context():
+        # Callbacks que consultam callback_context precisam de um contexto ativo
+        # (aqui sem entradas disparadas, como numa chamada inicial)
+        context_value.set(AttributeDict(triggered_inputs=[]))
+
+
+def payload_size(resultado):
+    """Tamanho em bytes do JSON que o Dash enviaria ao navegador (None fora dos callbacks)"""
+    if isinstance(resultado, pd.DataFrame):
+        return None
+    valores = resultado if isinstance(resultado, tuple) else (resultado,)
+    return len(to_json_plotly([v for v in valores if v is not no_update]).encode('utf-8'))
+
+
+def measure(func, repeat):
+    func()  # Aquecimento: imports tardios, caches do pandas/plotly
+    tempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tracemalloc.start()
+    try:
+        func()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'wall_ms': round(statistics.median(tempos), 3), 'wall_ms_min': round(min(tempos), 3),
+            'peak_kib': round(pico / 1024, 1), 'payload_bytes': payload_size(resultado)}
+
+
+def build_cases(callbacks, dataset):
+    """Casos de um tier: {nome: função sem argumentos}"""
+    dataset.rollups  # Como após a primeira renderização: as gravações atualizam os agregados
+    token = data_store.put_dataset(dataset)
+    frentes = dataset.frentes[dataset.frentes['Frente'] != '---']
+    alvo = frentes.iloc[1 % len(frentes)]
+    obra, frente = alvo['Obra'], alvo['Frente']
+    identificador = {'Obra': obra, 'Frente': frente}
+    semanas_alvo = dataset.semanas[(dataset.semanas['Obra'] == obra) & (dataset.semanas['Frente'] == frente)]['Semana'].tolist()
+    plano = round(alvo['Total'] / max(len(semanas_alvo), 1) * 0.9, 2)
+    # Alterações como as grades semanais enviam: {semana: valor} das células editadas
+    alteracoes_plano = {w: plano for w in semanas_alvo}
+    alteracoes_realizado = {w: 1.0 for w in semanas_alvo}
+    data_inicio, data_fim = alvo['Data Início'].strftime('%Y-%m-%d'), alvo['Data Fim'].strftime('%Y-%m-%d')
+    cb = callbacks
+
+    def visuals(nome, *args):
+        # Mede a montagem completa: sem o cache de gráficos, toda chamada seria um hit
+        figure_cache.clear()
+        return cb[nome](token, *args)
+
+    def dashboard(*args):
+        # Todos os visuais de uma troca de dados ou de filtro
+        figure_cache.clear()
+        return (cb['update_progress_summary'](token, *args[:2]) + (cb['update_performance_chart'](token, *args[:2]),
+                cb['update_evolution_chart'](token, *args)) + cb['update_details_table'](token, *args[:2], 0, 10, [], ''))
+
+    return {
+        'dashboard[obra]': lambda: dashboard(obra, 'Todos', 'semanal'),
+        'dashboard[frente]': lambda: dashboard(obra, frente, 'semanal'),
+        'dashboard[portfolio,mensal]': lambda: dashboard(None, 'Todos', 'mensal'),
+        'update_progress_summary[obra]': lambda: visuals('update_progress_summary', obra, 'Todos'),
+        'update_performance_chart[frente]': lambda: visuals('update_performance_chart', obra, frente),
+        'update_performance_chart[obra]': lambda: visuals('update_performance_chart', obra, 'Todos'),
+        'update_evolution_chart[obra,mensal]': lambda: visuals('update_evolution_chart', obra, 'Todos', 'mensal'),
+        'update_evolution_chart[obra,cached]': lambda: cb['update_evolution_chart'](token, obra, 'Todos', 'semanal'),
+        'update_details_table[obra]': lambda: visuals('update_details_table', obra, 'Todos', 0, 10, [], ''),
+        'update_details_table[portfolio,sort,filter]': lambda: visuals(
+            'update_details_table', None, 'Todos', 2, 10, [{'column_id': 'Total', 'direction': 'desc'}], '{Total (%)} >= 10 && {Obra} contains "0"'),
+        'update_frente_options': lambda: cb['update_frente_options'](obra, token),
+        'save_frente_data[edit]': lambda: cb['save_frente_data'](
+            1, token, {'mode': 'edit', 'identifier': identificador}, obra, frente, alvo['Total'], data_inicio, data_fim,
+            alteracoes_plano),
+        'save_realizado_values': lambda: cb['save_realizado_values'](1, alteracoes_realizado, identificador, token),
+        'execute_delete': lambda: cb['execute_delete'](1, identificador, token),
+        'recalculate_dataframe[semanas]': lambda: recalculate_dataframe(dataset.frentes, dataset.semanas),
+        'recalculate_dataframe[planilha]': (lambda wide: lambda: recalculate_dataframe(wide))(dataset.to_wide()),
+    }
+
+
+def run(tiers, repeat, casos=None):
+    app = RecorderApp()
+    register_callbacks(app)
+    app.activate_context()
+    resultados = {}
+    for tier in tiers:
+        dataset = generate_tier(tier)
+        print(f"\n== {tier}: {TIERS[tier][0]} obras x {TIERS[tier][1]} frentes x {TIERS[tier][2]} semanas "
+              f"({len(dataset.frentes)} frentes, {len(dataset.semanas)} fatos semanais, "
+              f"{dataset.memory_usage()['total'] / 2 ** 20:.1f} MiB em memória)")
+        resultados[tier] = {}
+        for nome, func in build_cases(app.callbacks, dataset).items():
+            if casos and not any(c in nome for c in casos):
+                continue
+            resultados[tier][nome] = measure(func, repeat)
+            r = resultados[tier][nome]
+            payload = '-' if r['payload_bytes'] is None else f"{r['payload_bytes'] / 1024:.1f}"
+            print(f"  {nome:<45} {r['wall_ms']:>10.2f} ms  {r['peak_kib'] / 1024:>8.2f} MiB  {payload:>9} KiB")
+    return resultados
+
+
+def compare(resultados, baseline, tolerancia):
+    """(regressões, avisos) em relação ao baseline: pioras das GATED_METRICS e de tempo, em texto"""
+    regressoes, avisos = [], []
+    print(f"\n== Comparação com o baseline (tolerância {tolerancia:.0%})")
+    for tier, casos in resultados.items():
+        for nome, atual in casos.items():
+            anterior = baseline.get('results', {}).get(tier, {}).get(nome)
+            if anterior is None:
+                print(f"  {tier}/{nome}: sem baseline")
+                continue
+            linha = []
+            for metrica, unidade in (('wall_ms', 'ms'), ('peak_kib', 'KiB'), ('payload_bytes', 'B')):
+                base, valor = anterior.get(metrica), atual[metrica]
+                if base is None or valor is None:
+                    continue
+                variacao = (valor - base) / base if base else 0.0
+                linha.append(f"{metrica} {variacao:+.1%}")
+                piorou = valor > base * (1 + tolerancia)
+                if metrica == 'wall_ms':
+                    piorou = piorou and valor - base > MIN_TIME_DELTA_MS
+                elif metrica == 'peak_kib':
+                    piorou = piorou and valor - base > MIN_PEAK_DELTA_KIB
+                if piorou:
+                    texto = f"{tier}/{nome}: {metrica} {base:g} -> {valor:g} {unidade} ({variacao:+.1%})"
+                    (regressoes if metrica in GATED_METRICS else avisos).append(texto)
+            print(f"  {tier}/{nome}: " + ', '.join(linha))
+    return regressoes, avisos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmark dos callbacks do dashboard')
+    parser.add_argument('--tiers', default='small,medium,large', help=f"escalas separadas por vírgula ({', '.join(TIERS)})")
+    parser.add_argument('--repeat', type=int, default=5, help='execuções cronometradas por caso (usa a mediana)')
+    parser.add_argument('--case', action='append', help='roda apenas casos cujo nome contenha este texto (pode repetir)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='arquivo JSON do baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='grava os resultados como novo baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='piora relativa aceita antes de acusar regressão')
+    args = parser.parse_args(argv)
+
+    tiers = [t.strip() for t in args.tiers.split(',') if t.strip()]
+    desconhecidos = [t for t in tiers if t not in TIERS]
+    if desconhecidos:
+        parser.error(f"tier(s) desconhecido(s): {', '.join(desconhecidos)}")
+
+    # Os datasets gerados não devem se misturar com o cache real do dashboard
+    data_store.CACHE_DIR = tempfile.mkdtemp(prefix='dashboard-obras-bench-')
+    resultados = run(tiers, args.repeat, args.case)
+
+    if args.save_baseline:
+        conteudo = {'python': platform.python_version(), 'pandas': pd.__version__, 'machine': platform.machine(),
+                    'repeat': args.repeat, 'results': resultados}
+        if os.path.exists(args.baseline):
+            # Mantém os tiers que não foram executados agora
+            with open(args.baseline, encoding='utf-8') as f:
+                anteriores = json.load(f).get('results', {})
+            for tier, casos in resultados.items():
+                anteriores.setdefault(tier, {}).update(casos)
+            conteudo['results'] = anteriores
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(conteudo, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline gravado em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nSem baseline em {args.baseline}; rode com --save-baseline para criar um.")
+        return 1
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    ambiente = {'python': platform.python_version(), 'pandas': pd.__version__, 'machine': platform.machine()}
+    diferentes = [f"{k} {baseline.get(k)} -> {v}" for k, v in ambiente.items() if baseline.get(k) != v]
+    if diferentes:
+        print(f"\nAviso: baseline gravado em outro ambiente ({', '.join(diferentes)}); os tempos podem não ser comparáveis.")
+    regressoes, avisos = compare(resultados, baseline, args.tolerance)
+    if avisos:
+        print("\nAviso: tempos acima da tolerância (não reprovam a execução; confira na mesma máquina do baseline):",
+              *avisos, sep='\n  ')
+    if regressoes:
+        print("\nREGRESSÕES:", *regressoes, sep='\n  ')
+        return 1
+    print("\nNenhuma regressão.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# -----------------------------------------------------------------------------
+# Arquivo: benchmarks/synthetic.py (Gerador de Portfólio Sintético)
+# -----------------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+from dataset import Dataset
+from utils import WEEKLY_COLUMNS, recalculate_dataframe
+from week_calendar import weeks_in_range
+
+# Escalas usadas pelo runner: (obras, frentes por obra, semanas por frente)
+TIERS = {
+    'small': (5, 10, 26),
+    'medium': (20, 25, 52),
+    'large': (50, 40, 104),
+}
+
+
+def generate_dataset(n_obras, n_frentes, n_weeks, seed=0, plan_ratio=0.5, realized_ratio=0.5):
+    """Portfólio com n_obras x n_frentes frentes de ~n_weeks semanas cada.
+
+    Uma fração 'plan_ratio' das frentes recebe planejamento semanal próprio
+    (as demais usam a distribuição linear); o realizado é lançado nas primeiras
+    'realized_ratio' semanas de cada frente. Cada obra tem também a linha '---'
+    criada pelo cadastro de obras.
+    """
+    rng = np.random.default_rng(seed)
+    inicio_base = pd.Timestamp('2024-01-01')
+    frentes, semanas = [], []
+    for o in range(n_obras):
+        obra = f"Obra {o:03d}"
+        frentes.append((obra, '---', 0.0, pd.NaT, pd.NaT))
+        for f in range(n_frentes):
+            frente = f"Frente {f:03d}"
+            inicio = inicio_base + pd.Timedelta(days=int(rng.integers(0, 180)))
+            fim = inicio + pd.Timedelta(weeks=n_weeks, days=int(rng.integers(-1, 6)))
+            total = float(rng.integers(100, 10_000))
+            frentes.append((obra, frente, total, inicio, fim))
+            chaves = weeks_in_range(inicio, fim)
+            n = len(chaves)
+            planejado = np.full(n, round(total / n, 2)) if rng.random() < plan_ratio else np.full(n, np.nan)
+            realizado = np.full(n, np.nan)
+            feitas = int(n * realized_ratio)
+            realizado[:feitas] = rng.uniform(0, 2 * total / n, feitas).round(2)
+            semanas.append(pd.DataFrame({'Obra': obra, 'Frente': frente, 'Semana': chaves, 'Planejado': planejado, 'Realizado': realizado}))
+    df_frentes = pd.DataFrame(frentes, columns=['Obra', 'Frente', 'Total', 'Data Início', 'Data Fim'])
+    df_semanas = pd.concat(semanas, ignore_index=True) if semanas else pd.DataFrame(columns=WEEKLY_COLUMNS)
+    df_semanas = df_semanas.dropna(subset=['Planejado', 'Realizado'], how='all').reset_index(drop=True)
+    df_semanas = df_semanas.astype({'Obra': 'object', 'Frente': 'object', 'Semana': 'object'})
+    return Dataset(recalculate_dataframe(df_frentes, df_semanas), df_semanas)
+
+
+def generate_tier(nome, seed=0):
+    n_obras, n_frentes, n_weeks = TIERS[nome]
+    return generate_dataset(n_obras, n_frentes, n_weeks, seed=seed)
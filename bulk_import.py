@@ -0,0 +1,232 @@
+# -----------------------------------------------------------------------------
+# Arquivo: bulk_import.py (Importação em Lote do Andamento Semanal)
+# -----------------------------------------------------------------------------
+# As equipes de campo enviam planilhas (CSV ou XLSX) com milhares de linhas
+# (Obra, Frente, Semana, Realizado) por semana. Em vez de lançar frente por
+# frente no formulário, o arquivo enviado pelo dcc.Upload é:
+#   1. lido em blocos de IMPORT_CHUNK_ROWS linhas (read_csv com chunksize ou
+#      openpyxl em modo somente leitura); cada bloco vira colunas tipadas
+#      antes do próximo, e linhas da mesma frente e semana são somadas
+#   2. validado de uma vez, com operações vetorizadas, contra as frentes:
+#      frente inexistente, semana inválida ou fora de [Data Início, Data Fim],
+#      valor negativo e planejamento acima do Total
+#   3. mesclado na tabela de fatos semanais numa única operação, com um único
+#      recálculo dos totais para o lote inteiro
+# A importação é tudo ou nada: havendo erros, nenhuma linha é aplicada e os
+# primeiros erros são listados com o número da linha no arquivo.
+#
+# Colunas aceitas (sem diferenciar maiúsculas e acentos): Obra, Frente,
+# Semana (AAAA-Wss) ou Data (convertida na semana ISO), Realizado ou
+# Quantidade e, opcionalmente, Planejado.
+import base64
+import io
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+import schema
+from utils import FRENTE_KEYS, WEEKLY_COLUMNS, WEEKLY_DICT_COLUMNS
+from week_calendar import dates_to_weeks, weeks_to_dates
+
+IMPORT_CHUNK_ROWS = 50_000
+
+# Erros listados na mensagem (o total é sempre informado)
+MAX_REPORTED_ERRORS = 10
+
+COLUMN_ALIASES = {
+    'obra': 'Obra', 'frente': 'Frente', 'semana': 'Semana', 'data': 'Data',
+    'realizado': 'Realizado', 'quantidade': 'Realizado', 'planejado': 'Planejado',
+}
+
+WEEK_KEYS = ['Obra', 'Frente', 'Semana']
+
+
+class ImportFileError(Exception):
+    """O arquivo não pôde ser lido ou não tem as colunas necessárias"""
+
+
+def _normalize_header(nome):
+    texto = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode('ascii')
+    return COLUMN_ALIASES.get(texto.strip().lower(), str(nome).strip())
+
+
+def _text(serie):
+    return serie.fillna('').astype(str).str.strip()
+
+
+def _normalize_chunk(df, primeira_linha):
+    """Bloco lido do arquivo -> (Obra, Frente, Semana, Linha, Realizado/Planejado)"""
+    df = df.rename(columns=_normalize_header)
+    faltando = [c for c in FRENTE_KEYS if c not in df.columns]
+    if 'Semana' not in df.columns and 'Data' not in df.columns:
+        faltando.append('Semana (ou Data)')
+    valores = [c for c in WEEKLY_DICT_COLUMNS if c in df.columns]
+    if not valores:
+        faltando.append('Realizado (ou Quantidade)')
+    if faltando:
+        raise ImportFileError(f"Coluna(s) obrigatória(s) ausente(s): {', '.join(faltando)}.")
+
+    bloco = pd.DataFrame({
+        'Obra': _text(df['Obra']).to_numpy(dtype=object),
+        'Frente': _text(df['Frente']).to_numpy(dtype=object),
+        # Número da linha no arquivo (o cabeçalho é a linha 1)
+        'Linha': np.arange(primeira_linha, primeira_linha + len(df)),
+    })
+    if 'Semana' in df.columns:
+        partes = _text(df['Semana']).str.upper().str.extract(r'^(\d{4})-?W(\d{1,2})$')
+        bloco['Semana'] = (partes[0] + '-W' + partes[1].str.zfill(2)).to_numpy(dtype=object)
+    else:
+        bloco['Semana'] = dates_to_weeks(pd.to_datetime(df['Data'], errors='coerce', dayfirst=True))
+    for coluna in valores:
+        texto = _text(df[coluna])
+        numeros = df[coluna] if pd.api.types.is_numeric_dtype(df[coluna]) else texto.str.replace(',', '.', regex=False)
+        bloco[coluna] = pd.to_numeric(numeros, errors='coerce').to_numpy(dtype='float64')
+        # Célula preenchida que não é número vira erro na validação; vazia é só "sem valor"
+        bloco[f'{coluna} inválido'] = bloco[coluna].isna().to_numpy() & (texto != '').to_numpy()
+    return bloco
+
+
+def _read_csv_chunks(conteudo):
+    cabecalho = conteudo.split(b'\n', 1)[0].decode('utf-8-sig', errors='replace')
+    # Planilhas em português costumam sair com ';' e vírgula decimal
+    separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    # Decodifica aos poucos, conforme o read_csv lê cada bloco: o arquivo não é copiado inteiro como texto
+    texto = io.TextIOWrapper(io.BytesIO(conteudo), encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        yield from pd.read_csv(texto, sep=separador, dtype=str, chunksize=IMPORT_CHUNK_ROWS,
+                               skip_blank_lines=True, keep_default_na=False)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        raise ImportFileError(f"CSV inválido: {e}") from e
+
+
+def _read_xlsx_chunks(conteudo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ImportFileError("Leitura de XLSX indisponível: instale o pacote 'openpyxl'.") from e
+    try:
+        planilha = load_workbook(io.BytesIO(conteudo), read_only=True, data_only=True).worksheets[0]
+    except Exception as e:
+        raise ImportFileError(f"XLSX inválido: {e}") from e
+    linhas = planilha.iter_rows(values_only=True)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) == IMPORT_CHUNK_ROWS:
+            yield pd.DataFrame(bloco, columns=cabecalho)
+            bloco = []
+    if bloco:
+        yield pd.DataFrame(bloco, columns=cabecalho)
+
+
+def read_upload(contents, filename):
+    """Lê o arquivo enviado pelo dcc.Upload ('data:...;base64,...') em blocos.
+
+    Retorna os lançamentos somados por (Obra, Frente, Semana), com 'Linha'
+    (primeira linha de cada grupo no arquivo) e as colunas de valor presentes.
+    """
+    try:
+        conteudo = base64.b64decode(contents.split(',', 1)[1])
+    except (IndexError, ValueError) as e:
+        raise ImportFileError("Não foi possível ler o arquivo enviado.") from e
+    nome = (filename or '').lower()
+    if nome.endswith('.xlsx'):
+        blocos = _read_xlsx_chunks(conteudo)
+    elif nome.endswith(('.csv', '.txt')):
+        blocos = _read_csv_chunks(conteudo)
+    else:
+        raise ImportFileError("Formato não suportado: envie um arquivo .csv ou .xlsx.")
+
+    # Cada bloco de texto vira colunas tipadas antes de ler o próximo: só o bloco atual fica como texto
+    partes, proxima_linha = [], 2
+    for bloco in blocos:
+        normalizado = _normalize_chunk(bloco, proxima_linha)
+        proxima_linha += len(bloco)
+        partes.append(normalizado[normalizado['Obra'].ne('') | normalizado['Frente'].ne('')])
+    lancamentos = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+    if lancamentos.empty:
+        raise ImportFileError("O arquivo não tem lançamentos.")
+
+    # Linhas repetidas da mesma frente e semana (ex.: um lançamento por dia) são somadas
+    grupos = lancamentos.groupby(WEEK_KEYS, dropna=False, sort=False)
+    valores = [c for c in WEEKLY_DICT_COLUMNS if c in lancamentos.columns]
+    resultado = grupos[valores].sum(min_count=1)
+    resultado['Linha'] = grupos['Linha'].min()
+    invalidos = [c for c in lancamentos.columns if c.endswith(' inválido')]
+    resultado[invalidos] = grupos[invalidos].any()
+    return resultado.reset_index().sort_values('Linha', kind='stable', ignore_index=True)
+
+
+def validate(dataset, lancamentos):
+    """Erros do lote, um por linha e motivo: DataFrame (Linha, Obra, Frente, Semana, Motivo), vazio se não houver"""
+    frentes = dataset.frentes[dataset.frentes['Frente'] != '---'].drop_duplicates(FRENTE_KEYS)
+    chaves = pd.MultiIndex.from_arrays([frentes['Obra'].astype(str), frentes['Frente'].astype(str)])
+    posicao = chaves.get_indexer(pd.MultiIndex.from_frame(lancamentos[FRENTE_KEYS]))
+    existe = posicao >= 0
+    segunda = weeks_to_dates(lancamentos['Semana'].fillna(''))
+    semana_valida = segunda.notna()
+
+    inicio = pd.to_datetime(frentes['Data Início'], errors='coerce').to_numpy()[np.where(existe, posicao, 0)]
+    fim = pd.to_datetime(frentes['Data Fim'], errors='coerce').to_numpy()[np.where(existe, posicao, 0)]
+    # A semana (segunda a domingo) precisa tocar o intervalo; frentes sem datas não são verificadas
+    fora = existe & semana_valida & ((segunda.to_numpy() > fim) | (segunda.to_numpy() + np.timedelta64(6, 'D') < inicio))
+
+    erros = [
+        (~existe, 'frente não cadastrada'),
+        (~semana_valida, 'semana inválida (use AAAA-Wss) ou data inválida'),
+        (fora, 'semana fora do período da frente (Data Início a Data Fim)'),
+    ]
+    for coluna in WEEKLY_DICT_COLUMNS:
+        if coluna in lancamentos.columns:
+            erros.append((lancamentos[f'{coluna} inválido'].to_numpy(), f'{coluna} não numérico'))
+            erros.append(((lancamentos[coluna] < 0).to_numpy(), f'{coluna} negativo'))
+
+    if 'Planejado' in lancamentos.columns:
+        # Planejamento resultante de cada frente (o que já existe nas outras semanas + o lote) contra o Total
+        validos = lancamentos[existe]
+        afetadas = validos[FRENTE_KEYS].drop_duplicates()
+        semanas = merge_weekly(_select(dataset.semanas, afetadas), validos)
+        planejado = semanas.groupby(FRENTE_KEYS, observed=True)['Planejado'].sum()
+        total = pd.to_numeric(frentes.set_index(FRENTE_KEYS)['Total'], errors='coerce')
+        total = total.reindex(planejado.index)
+        excedido = planejado[planejado > total * (1 + 1e-9) + 1e-9]
+        linhas = pd.MultiIndex.from_frame(lancamentos[FRENTE_KEYS])
+        erros.append(((linhas.isin(excedido.index) & lancamentos['Planejado'].notna()).to_numpy(), 'planejado da frente acima do Total'))
+
+    partes = [lancamentos.loc[mascara, ['Linha'] + WEEK_KEYS].assign(Motivo=motivo) for mascara, motivo in erros if mascara.any()]
+    if not partes:
+        return pd.DataFrame(columns=['Linha'] + WEEK_KEYS + ['Motivo'])
+    return pd.concat(partes, ignore_index=True).sort_values('Linha', kind='stable', ignore_index=True)
+
+
+def _select(semanas, chaves):
+    """Fatos semanais das frentes (Obra, Frente) de 'chaves'"""
+    linhas = pd.MultiIndex.from_arrays([semanas['Obra'].astype(str), semanas['Frente'].astype(str)])
+    return semanas[linhas.isin(pd.MultiIndex.from_frame(chaves[FRENTE_KEYS]))]
+
+
+def merge_weekly(semanas, lancamentos):
+    """Fatos semanais com os valores do lote por cima dos existentes.
+
+    Semanas ausentes do lote, ou com a célula vazia, mantêm o valor atual.
+    """
+    colunas = [c for c in WEEKLY_DICT_COLUMNS if c in lancamentos.columns]
+    afetadas = lancamentos[FRENTE_KEYS].drop_duplicates()
+    atuais = _select(semanas, afetadas)
+    novos = lancamentos.set_index(WEEK_KEYS)[colunas].combine_first(atuais.set_index(WEEK_KEYS)[list(WEEKLY_DICT_COLUMNS)])
+    novos = novos.dropna(how='all').reset_index()
+    restantes = semanas.drop(index=atuais.index)
+    return schema.concat([restantes, novos[WEEKLY_COLUMNS]])[WEEKLY_COLUMNS]
+
+
+def apply_import(dataset, lancamentos):
+    """Novo Dataset com o lote aplicado: uma mescla, um recálculo e os agregados atualizados só nas frentes do lote"""
+    chaves = list(lancamentos[FRENTE_KEYS].drop_duplicates().itertuples(index=False, name=None))
+    novo = dataset.derive(semanas=merge_weekly(dataset.semanas, lancamentos)).recalculate().update_rollups(dataset, chaves)
+    for chave in chaves:
+        novo.mark_changed(chave)
+    return novo
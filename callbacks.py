@@ -1,143 +1,303 @@
 # -----------------------------------------------------------------------------
 # Arquivo: callbacks.py (VERSÃO MODIFICADA PARA GOOGLE SHEETS)
 # -----------------------------------------------------------------------------
-from dash import dcc, html, Input, Output, State, callback_context, no_update, dash_table, ALL
+from dash import html, Input, Output, State, callback_context, no_update, Patch, ClientsideFunction, set_props
 import dash_bootstrap_components as dbc
-import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
-import json
-import os
-from datetime import datetime
 
-# NOVAS IMPORTAÇÕES PARA GOOGLE SHEETS
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from io import StringIO
-
-from utils import recalculate_dataframe
-
-PLOTLY_TEMPLATE = "plotly_white"
-
-# --- CONFIGURAÇÃO DO GOOGLE SHEETS ---
-# O nome da sua planilha
-GOOGLE_SHEET_NAME = 'DadosDashboardObras' 
-
-# Define os "escopos" de permissão que nossa aplicação precisa
-SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-
-# Esta variável de ambiente guardará nossas credenciais de forma segura no Render
-# Vamos configurar isso no Passo 5
-CREDS_JSON_STRING = os.environ.get('GOOGLE_CREDENTIALS_JSON', None)
-
-def get_google_sheet():
-    """Função auxiliar para conectar e obter a planilha"""
-    if CREDS_JSON_STRING is None:
-        print("ERRO: A variável de ambiente 'GOOGLE_CREDENTIALS_JSON' não foi encontrada.")
-        return None
-
-    try:
-        creds_dict = json.loads(CREDS_JSON_STRING)
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, SCOPE)
-        client = gspread.authorize(creds)
-        sheet = client.open(GOOGLE_SHEET_NAME).sheet1
-        return sheet
-    except Exception as e:
-        print(f"Erro ao conectar com o Google Sheets: {e}")
+from storage import get_storage_backend, StorageConnectionError
+from utils import FRENTE_KEYS, get_weekly_values, set_weekly_values
+from dataset import Dataset
+from rollups import Rollups
+from linear_plan import plan_series
+from week_calendar import weeks_in_range, weeks_to_dates, week_label
+from data_store import SessionExpiredError, put_dataset, get_dataset
+import background
+import concurrency
+import schema
+import load_cache
+import metrics
+import figure_cache
+from figure_optimization import optimize_traces, top_n_with_others
+from layout import PLOTLY_TEMPLATE, TABELA_DETALHES_COLUNAS
+from table_query import apply_filter_query, apply_sort, get_page, page_count
+from bulk_import import ImportFileError, MAX_REPORTED_ERRORS, apply_import, read_upload, validate
+
+SEM_DADOS = {'text': 'Sem dados', 'showarrow': False}
+SESSAO_EXPIRADA = "Sua sessão expirou no servidor. Recarregue a página para continuar; alterações não salvas desta sessão foram perdidas."
+
+@metrics.timed_phase('deserialize')
+def load_dataset(data_token):
+    """Resolve o token de 'data-store' para o Dataset guardado no servidor (somente leitura).
+
+    Antes da carga inicial (sem token) devolve um Dataset vazio. Um token que
+    já saiu do cache levanta SessionExpiredError (ver handle_callback_error).
+    """
+    if not data_token:
+        return Dataset.empty()
+    dataset = get_dataset(data_token)
+    if dataset is None:
+        raise SessionExpiredError(SESSAO_EXPIRADA)
+    return dataset
+
+def handle_callback_error(err):
+    """Tratamento de erros de todos os callbacks (Dash(on_error=...)).
+
+    Sessão expirada: mostra o aviso para recarregar a página e deixa as saídas
+    como estão, em vez de esvaziar o painel. Os demais erros seguem como antes.
+    """
+    if isinstance(err, SessionExpiredError):
+        set_props('session-expired-alert', {'is_open': True})
         return None
+    raise err
+
+@metrics.timed_phase('serialize')
+def store_dataset(dataset, data_token=None):
+    """Guarda uma nova versão do Dataset no servidor e devolve o token para 'data-store'"""
+    return put_dataset(dataset, data_token)
+
+def weekly_grid_rows(semanas_lista, valores, planejado=None):
+    """Linhas das grades semanais (layout.weekly_grid) para as semanas informadas"""
+    linhas = []
+    for w in semanas_lista:
+        linha = {'Semana': w, 'Período': week_label(w), 'Valor': valores.get(w), 'Original': valores.get(w)}
+        if planejado is not None:
+            linha['Planejado'] = planejado.get(w, 0) or 0
+        linhas.append(linha)
+    return linhas
+
+def parse_weekly_changes(alteracoes):
+    """({semana: float ou None}, semanas com valor inválido) a partir das alterações enviadas pela grade"""
+    valores, invalidas = {}, []
+    for semana, valor in (alteracoes or {}).items():
+        if valor is None:
+            valores[semana] = None
+            continue
+        try:
+            valores[semana] = float(valor)
+        except (TypeError, ValueError):
+            invalidas.append(semana)
+            continue
+        if valores[semana] < 0 or np.isnan(valores[semana]):
+            invalidas.append(semana)
+    return valores, sorted(invalidas)
+
+def invalid_weeks_alert(invalidas):
+    return dbc.Alert(f"Valor inválido (não numérico ou negativo) em: {', '.join(week_label(w) for w in invalidas)}.", color="danger")
+
+def filter_frentes(dataset, selected_obra, selected_frente):
+    """(df_obra, df_filtered) das frentes visíveis, ou None quando não há o que exibir"""
+    df = dataset.frentes
+    if df.empty or 'Frente' not in df.columns: return None
+    # Sem cópias: recalculate_dataframe já deixa as datas como datetime, e
+    # os gráficos apenas leem as tabelas filtradas
+    df_vis = df[df['Frente'] != '---']
+    if df_vis.empty: return None
+    df_obra = df_vis[df_vis['Obra'] == selected_obra] if selected_obra else df_vis
+    df_filtered = df_obra[df_obra['Frente'] == selected_frente] if selected_frente and selected_frente != 'Todos' else df_obra
+    return df_obra, df_filtered
+
+def details_table_rows(data_token, selected_obra, selected_frente, sort_by, filter_query):
+    """Linhas da tabela (datas como datetime) com os filtros do dashboard e da tabela, na ordem pedida"""
+    if not data_token: return pd.DataFrame(columns=TABELA_DETALHES_COLUNAS)
+    dataset = load_dataset(data_token)
+    chave = (getattr(dataset, 'version', None), 'tabela', selected_obra, selected_frente)
+    linhas = figure_cache.get_or_build(chave, lambda: build_details_rows(dataset, selected_obra, selected_frente))
+    return apply_sort(apply_filter_query(linhas, filter_query), sort_by)
+
+def build_details_rows(dataset, selected_obra, selected_frente):
+    filtrado = filter_frentes(dataset, selected_obra, selected_frente)
+    if filtrado is None: return pd.DataFrame(columns=TABELA_DETALHES_COLUNAS)
+    return filtrado[1][TABELA_DETALHES_COLUNAS]
+
+def format_details_rows(linhas):
+    data_tabela = linhas.copy()
+    if not data_tabela.empty:
+        data_tabela['Data Início'] = pd.to_datetime(data_tabela['Data Início']).dt.strftime('%d/%m/%Y').replace('NaT', '')
+        data_tabela['Data Fim'] = pd.to_datetime(data_tabela['Data Fim']).dt.strftime('%d/%m/%Y').replace('NaT', '')
+    return data_tabela
+
+def register_clientside_callbacks(app):
+    """Callbacks de estado da interface, executados no navegador (funções em assets/clientside.js).
+
+    Divisão entre navegador e servidor:
+      - navegador: abrir/fechar modais sem dados, escala de tempo, cópia dos
+        filtros para os stores, seleção de linha da tabela, as células
+        alteradas das grades semanais e o endereço da exportação da tabela
+        (table_export.py). Só leem e escrevem
+        propriedades de componentes, sem acesso ao dataset.
+      - servidor (register_callbacks): tudo que lê ou grava o dataset, monta
+        gráficos, tabelas e formulários, ou fala com o armazenamento.
+    """
+    app.clientside_callback(
+        ClientsideFunction(namespace='ui', function_name='toggle_modal'),
+        Output('modal-detalhes-frentes', 'is_open'),
+        Input('btn-abrir-detalhes-modal', 'n_clicks'),
+        Input('btn-fechar-detalhes-modal', 'n_clicks'),
+        State('modal-detalhes-frentes', 'is_open'),
+        prevent_initial_call=True
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='ui', function_name='close_modal'),
+        Output('modal-nova-frente', 'is_open', allow_duplicate=True),
+        Input('btn-cancelar-nova-frente', 'n_clicks'),
+        prevent_initial_call=True
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='ui', function_name='close_modal'),
+        Output('modal-confirmar-excluir', 'is_open', allow_duplicate=True),
+        Input('btn-cancelar-excluir', 'n_clicks'),
+        prevent_initial_call=True
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='ui', function_name='update_active_timescale'),
+        Output('active-timescale-store', 'data'),
+        Input('btn-semanal', 'n_clicks'),
+        Input('btn-mensal', 'n_clicks'),
+        Input('btn-geral', 'n_clicks'),
+        prevent_initial_call=True
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='ui', function_name='copy_value'),
+        Output('category-filter-store', 'data'),
+        Input('category-filter', 'value')
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='ui', function_name='copy_value'),
+        Output('selected-obra-store', 'data'),
+        Input('obra-filter', 'value'),
+        prevent_initial_call=True
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='ui', function_name='handle_row_selection'),
+        Output('btn-abrir-realizado-modal', 'style'),
+        Output('btn-abrir-editar-modal', 'style'),
+        Output('btn-abrir-excluir-modal', 'style'),
+        Output('selected-row-index-store', 'data'),
+        Input('tabela-detalhes-frentes', 'selected_rows'),
+        State('tabela-detalhes-frentes', 'data'),
+        prevent_initial_call=True
+    )
+    for grade in ('grade-planejamento', 'grade-realizado'):
+        app.clientside_callback(
+            ClientsideFunction(namespace='ui', function_name='weekly_grid_changes'),
+            Output(f'{grade}-alteracoes', 'data'),
+            Input(grade, 'data')
+        )
+    app.clientside_callback(
+        ClientsideFunction(namespace='ui', function_name='export_url'),
+        Output('btn-exportar-tabela', 'href'),
+        Input('data-store', 'data'),
+        Input('selected-obra-store', 'data'),
+        Input('category-filter-store', 'data'),
+        Input('tabela-detalhes-frentes', 'sort_by'),
+        Input('tabela-detalhes-frentes', 'filter_query'),
+        State('btn-exportar-tabela', 'href')
+    )
 
-def get_empty_df():
-    return pd.DataFrame(columns=['Obra', 'Frente', 'Total', 'Data Início', 'Data Fim', 'Realizado por Semana', 'Planejamento Semanal'])
-
-# RESTANTE DAS FUNÇÕES AUXILIARES (get_weeks_in_range, etc.) PERMANECE IGUAL
-def get_weeks_in_range(start_date, end_date):
-    if pd.isna(start_date) or pd.isna(end_date):
-        return []
-    weeks = pd.date_range(start=start_date, end=end_date, freq='W-MON').strftime('%G-W%V').tolist()
-    start_week = start_date.strftime('%G-W%V')
-    if start_week not in weeks:
-        weeks.insert(0, start_week)
-    return sorted(list(set(weeks)))
 
 def register_callbacks(app):
+    register_clientside_callbacks(app)
+
+    # Carga e gravação rodam em segundo plano (background.py), numa thread do
+    # worker: a requisição é liberada enquanto o armazenamento responde, e o
+    # navegador mostra o andamento em 'persistence-progress', com opção de cancelar
+    def storage_running(mensagem):
+        return [(Output('persistence-progress', 'style'), {'display': 'flex'}, {'display': 'none'}),
+                (Output('persistence-progress-message', 'children'), mensagem, ''),
+                (Output('btn-persistir-dados', 'disabled'), True, False)]
 
     # --- CALLBACK MODIFICADO ---
-    @app.callback(
+    @background.callback(
+        app,
         Output('data-store', 'data', allow_duplicate=True),
         Output('obra-filter', 'options'),
         Output('obra-filter', 'value'),
         Output('persistence-feedback-message', 'children', allow_duplicate=True),
         Input('app-layout-hidden-trigger', 'children'),
+        running=storage_running("Carregando dados..."),
+        progress=Output('persistence-progress-message', 'children'),
+        cancel=[Input('btn-cancelar-armazenamento', 'n_clicks')],
         prevent_initial_call='initial_duplicate'
     )
-    def load_initial_data(_):
-        sheet = get_google_sheet()
-        if sheet is None:
-            return get_empty_df().to_json(date_format='iso', orient='split'), [], None, dbc.Alert("Falha ao conectar com a base de dados (Google Sheets).", color="danger")
-
+    def load_initial_data(set_progress, _):
         try:
-            # Lê todos os dados da planilha
-            records = sheet.get_all_records()
-            if not records: # Se a planilha estiver vazia (só com cabeçalho)
-                df = get_empty_df()
-            else:
-                df = pd.DataFrame(records)
-
-            # Tratamento de dados lidos da planilha
-            for col in ['Realizado por Semana', 'Planejamento Semanal']:
-                if col not in df.columns:
-                    df[col] = '' # Adiciona colunas se não existirem
-                # Converte strings de dicionário (se vierem como string) para dict
-                df[col] = df[col].apply(lambda x: json.loads(x) if isinstance(x, str) and x.strip().startswith('{') else (x if isinstance(x, dict) else {}))
-
-            df['Data Início'] = pd.to_datetime(df['Data Início'], errors='coerce')
-            df['Data Fim'] = pd.to_datetime(df['Data Fim'], errors='coerce')
-
-            df_recalc = recalculate_dataframe(df)
+            backend = get_storage_backend()
+            set_progress(f"Carregando dados ({backend.descricao})...")
+            # Cache compartilhado entre os workers: evita baixar a base a cada abertura da página.
+            # A versão de cada frente é registrada na carga para detectar edições simultâneas ao salvar
+            dataset = load_cache.get_or_load(backend.descricao, lambda: concurrency.stamp(backend.load()))
+            set_progress("Preparando o painel...")
+            df = dataset.frentes
             obras = sorted(df['Obra'].unique()) if 'Obra' in df.columns else []
-            return df_recalc.to_json(date_format='iso', orient='split'), [{'label': o, 'value': o} for o in obras], obras[0] if obras else None, dbc.Alert(f"Dados da planilha '{GOOGLE_SHEET_NAME}' carregados.", color="info", duration=3000, fade=True)
+            return store_dataset(dataset), [{'label': o, 'value': o} for o in obras], obras[0] if obras else None, dbc.Alert(f"Dados carregados ({backend.descricao}).", color="info", duration=3000, fade=True)
+        except StorageConnectionError as e:
+            return store_dataset(Dataset.empty()), [], None, dbc.Alert(str(e), color="danger")
         except Exception as e:
-            return get_empty_df().to_json(date_format='iso', orient='split'), [], None, dbc.Alert(f"Erro ao ler dados da planilha: {e}.", color="danger")
+            return store_dataset(Dataset.empty()), [], None, dbc.Alert(f"Erro ao ler dados: {e}.", color="danger")
 
     # --- CALLBACK MODIFICADO ---
-    @app.callback(
+    @background.callback(
+        app,
+        Output('data-store', 'data', allow_duplicate=True),
         Output('persistence-feedback-message', 'children', allow_duplicate=True),
         Input('btn-persistir-dados', 'n_clicks'),
         State('data-store', 'data'),
+        running=storage_running("Salvando..."),
+        progress=Output('persistence-progress-message', 'children'),
+        cancel=[Input('btn-cancelar-armazenamento', 'n_clicks')],
         prevent_initial_call=True
     )
-    def persist_data_to_file(n_clicks, data_json):
-        if n_clicks and data_json:
-            sheet = get_google_sheet()
-            if sheet is None:
-                return dbc.Alert("Falha ao conectar com a base de dados (Google Sheets) para salvar.", color="danger")
-
+    def persist_data_to_file(set_progress, n_clicks, data_token):
+        if n_clicks and data_token:
             try:
-                df_to_save = pd.read_json(StringIO(data_json), orient='split')
-                cols_to_save = ['Obra', 'Frente', 'Total', 'Data Início', 'Data Fim', 'Realizado por Semana', 'Planejamento Semanal']
-
-                # Prepara o DataFrame para ser salvo
-                df_final = df_to_save[cols_to_save].copy()
-                df_final['Data Início'] = pd.to_datetime(df_final['Data Início']).dt.strftime('%Y-%m-%d').replace('NaT', '')
-                df_final['Data Fim'] = pd.to_datetime(df_final['Data Fim']).dt.strftime('%Y-%m-%d').replace('NaT', '')
-                # Converte dicionários para string JSON para salvar na planilha
-                df_final['Realizado por Semana'] = df_final['Realizado por Semana'].apply(json.dumps)
-                df_final['Planejamento Semanal'] = df_final['Planejamento Semanal'].apply(json.dumps)
-                    
-                # --> INÍCIO DA CORREÇÃO <---
-                # Substitui todos os valores 'NaN' por None (nulo), que é compatível com JSON
-                df_final = df_final.replace({np.nan: None})
-                # --> FIM DA CORREÇÃO <---
-
-                # Limpa a planilha (exceto o cabeçalho) e insere os novos dados
-                sheet.clear()
-                sheet.update([df_final.columns.values.tolist()] + df_final.values.tolist())
-                    
-                return dbc.Alert("Dados salvos com sucesso na nuvem!", color="success", duration=4000, fade=True)
+                dataset = load_dataset(data_token)
+                if not dataset.has_changes():
+                    return no_update, dbc.Alert("Nenhuma alteração para salvar.", color="info", duration=3000, fade=True)
+
+                backend = get_storage_backend()
+                # Releitura, conferência e escrita sem outra gravação no meio (de qualquer worker)
+                with concurrency.save_lock(backend.descricao, lambda: set_progress("Aguardando outra gravação terminar...")):
+                    # Relê o armazenamento: as alterações de outros usuários desde a nossa leitura são
+                    # mantidas, e as frentes que eles mudaram e nós também ficam de fora (conflitos)
+                    set_progress(f"Verificando alterações de outros usuários em {backend.descricao}...")
+                    gravar, resultado_sessao, conflitos = concurrency.merge_for_save(dataset, backend.load())
+
+                    # Envia apenas as frentes alteradas, inseridas e excluídas sem conflito
+                    resultado = {'linhas': 0, 'excluidas': 0, 'celulas': 0}
+                    if gravar.has_changes():
+                        set_progress(f"Salvando {len(gravar.alteradas) + len(gravar.inseridas) + len(gravar.excluidas)} frente(s) em {backend.descricao}...")
+                        # Invalida também antes: se a gravação for interrompida no meio, o finally abaixo não roda
+                        load_cache.invalidate(backend.descricao)
+                        try:
+                            resultado = backend.save_delta(gravar)
+                        finally:
+                            # Mesmo uma gravação parcial deixa o cache da carga inicial desatualizado
+                            load_cache.invalidate(backend.descricao)
+
+                mensagem = f"Dados salvos com sucesso! {resultado['linhas']} linha(s) e {resultado['celulas']} célula(s) gravadas"
+                if resultado['excluidas']:
+                    mensagem += f", {resultado['excluidas']} linha(s) excluída(s)"
+                if conflitos:
+                    frentes = ', '.join(f"{obra} / {frente}" for obra, frente in conflitos)
+                    alerta = dbc.Alert([
+                        html.P(mensagem + "."),
+                        html.P(f"{len(conflitos)} frente(s) foram alteradas por outro usuário desde que você carregou os dados "
+                               f"e não foram gravadas: {frentes}."),
+                        html.P("Salve novamente para sobrescrever com a sua versão, ou recarregue a página para descartá-la.",
+                               className="mb-0"),
+                    ], color="warning")
+                    return store_dataset(resultado_sessao, data_token), alerta
+                return store_dataset(resultado_sessao, data_token), dbc.Alert(mensagem + ".", color="success", duration=4000, fade=True)
+            except SessionExpiredError:
+                return no_update, dbc.Alert(SESSAO_EXPIRADA, color="warning")
+            except (StorageConnectionError, concurrency.SaveInProgressError) as e:
+                return no_update, dbc.Alert(str(e), color="danger")
             except Exception as e:
-                return dbc.Alert(f"Falha ao salvar dados na nuvem: {e}", color="danger")
-        return no_update
+                return no_update, dbc.Alert(f"Falha ao salvar dados: {e}", color="danger")
+        return no_update, no_update
 
     @app.callback(
         Output('modal-obras', 'is_open'),
@@ -147,11 +307,11 @@ def register_callbacks(app):
         State('modal-obras', 'is_open'),
         State('data-store', 'data')
     )
-    def toggle_and_populate_obras_modal(n_open, n_close, is_open, data_json):
+    def toggle_and_populate_obras_modal(n_open, n_close, is_open, data_token):
         if not callback_context.triggered: return no_update, no_update
         button_id = callback_context.triggered[0]['prop_id'].split('.')[0]
         if button_id == 'btn-abrir-modal-obras':
-            df = pd.read_json(StringIO(data_json), orient='split')
+            df = load_dataset(data_token).frentes
             obras = sorted(df['Obra'].unique()) if 'Obra' in df.columns and not df.empty else []
             lista = dbc.ListGroup([dbc.ListGroupItem(o) for o in obras]) if obras else html.P("Nenhuma obra cadastrada.")
             return True, lista
@@ -169,16 +329,20 @@ def register_callbacks(app):
         State('data-store', 'data'),
         prevent_initial_call=True
     )
-    def add_new_obra(n_clicks, nome_obra, data_json):
+    def add_new_obra(n_clicks, nome_obra, data_token):
         if not n_clicks or not nome_obra:
             return no_update, dbc.Alert("O nome da obra não pode estar vazio.", color="warning"), "", no_update
-        df = pd.read_json(StringIO(data_json), orient='split')
+        dataset = load_dataset(data_token)
+        df = dataset.frentes
         if 'Obra' in df.columns and nome_obra.strip() in df['Obra'].unique():
             return no_update, dbc.Alert(f"A obra '{nome_obra}' já existe.", color="danger"), "", no_update
-        new_row = {'Obra': nome_obra.strip(), 'Frente': '---', 'Total': 0, 'Data Início': None, 'Data Fim': None, 'Realizado por Semana': {}, 'Planejamento Semanal': {}}
+        new_row = {'Obra': nome_obra.strip(), 'Frente': '---', 'Total': 0, 'Data Início': pd.NaT, 'Data Fim': pd.NaT}
         df_new = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
         obras = sorted(df_new['Obra'].unique())
-        return df_new.to_json(orient='split', date_format='iso'), dbc.Alert("Obra cadastrada!", color="success"), "", [{'label': o, 'value': o} for o in obras]
+        # A linha '---' não entra nos agregados por período
+        novo_dataset = dataset.derive(frentes=df_new).update_rollups(dataset, [])
+        novo_dataset.mark_inserted((nome_obra.strip(), '---'))
+        return store_dataset(novo_dataset, data_token), dbc.Alert("Obra cadastrada!", color="success"), "", [{'label': o, 'value': o} for o in obras]
 
     @app.callback(
         Output('modal-nova-frente', 'is_open', allow_duplicate=True),
@@ -196,34 +360,30 @@ def register_callbacks(app):
         State('data-store', 'data'),
         prevent_initial_call=True
     )
-    def open_add_frente_modal(n_clicks, data_json):
+    def open_add_frente_modal(n_clicks, data_token):
         if not n_clicks: return (no_update,) * 11
-        df = pd.read_json(StringIO(data_json), orient='split')
+        df = load_dataset(data_token).frentes
         obras = sorted(df['Obra'].unique()) if 'Obra' in df.columns else []
         return True, "Adicionar Nova Frente", {'mode': 'add'}, None, [{'label': o, 'value': o} for o in obras], None, False, None, None, None, None
 
     @app.callback(
-        Output('weekly-planning-container', 'children'),
+        Output('weekly-planning-container', 'style'),
+        Output('grade-planejamento', 'data'),
         Input('form-data-inicio', 'date'),
         Input('form-data-fim', 'date'),
         State('edit-mode-store', 'data'),
         State('data-store', 'data'),
     )
-    def generate_weekly_planning_inputs(start_date_str, end_date_str, edit_mode, data_json):
-        if not start_date_str or not end_date_str: return None
+    def generate_weekly_planning_inputs(start_date_str, end_date_str, edit_mode, data_token):
+        if not start_date_str or not end_date_str: return {'display': 'none'}, []
         start_date, end_date = pd.to_datetime(start_date_str), pd.to_datetime(end_date_str)
-        weeks_list = get_weeks_in_range(start_date, end_date)
+        weeks_list = weeks_in_range(start_date, end_date)
         planning_values = {}
         if edit_mode.get('mode') == 'edit':
-            df = pd.read_json(StringIO(data_json), orient='split')
             identifier = edit_mode.get('identifier')
             if identifier:
-                frente_data_row = df[(df['Obra'] == identifier['Obra']) & (df['Frente'] == identifier['Frente'])]
-                if not frente_data_row.empty:
-                    planning_values = frente_data_row.iloc[0].get('Planejamento Semanal', {})
-                    if not isinstance(planning_values, dict): planning_values = {}
-        form_inputs = [dbc.Row([dbc.Col(dbc.Label(f"Semana {w.split('-W')[-1]} ({w.split('-W')[0]})"), width=6), dbc.Col(dbc.Input(id={'type': 'input-planejamento-semana', 'id': w}, type='number', min=0, value=planning_values.get(w)), width=6)], className="mb-2") for w in weeks_list]
-        return [html.Hr(), html.H5("Planejamento Semanal (Opcional)"), html.P("Deixe em branco para um planejamento linear.", className="small text-muted")] + form_inputs
+                planning_values = get_weekly_values(load_dataset(data_token).semanas, identifier['Obra'], identifier['Frente'], 'Planejado')
+        return ({'display': 'block'} if weeks_list else {'display': 'none'}), weekly_grid_rows(weeks_list, planning_values)
 
     @app.callback(
         Output('modal-nova-frente', 'is_open', allow_duplicate=True),
@@ -242,9 +402,9 @@ def register_callbacks(app):
         State('data-store', 'data'),
         prevent_initial_call=True
     )
-    def open_edit_modal_and_populate(n_clicks, frente_identifier, data_json):
+    def open_edit_modal_and_populate(n_clicks, frente_identifier, data_token):
         if not n_clicks or not frente_identifier: return (no_update,) * 11
-        df = pd.read_json(StringIO(data_json), orient='split')
+        df = load_dataset(data_token).frentes
         frente_data = df[(df['Obra'] == frente_identifier['Obra']) & (df['Frente'] == frente_identifier['Frente'])].iloc[0]
         obras = sorted(df['Obra'].unique())
         obra_val, frente_val, total_val = frente_data.get('Obra'), frente_data.get('Frente'), frente_data.get('Total')
@@ -252,14 +412,6 @@ def register_callbacks(app):
         data_inicio_str, data_fim_str = (data_inicio_ts.strftime('%Y-%m-%d') if pd.notna(data_inicio_ts) else None), (data_fim_ts.strftime('%Y-%m-%d') if pd.notna(data_fim_ts) else None)
         return True, f"Editar Frente: {frente_val}", {'mode': 'edit', 'identifier': frente_identifier}, None, [{'label': o, 'value': o} for o in obras], obra_val, True, frente_val, total_val, data_inicio_str, data_fim_str
 
-    @app.callback(
-        Output('modal-nova-frente', 'is_open', allow_duplicate=True),
-        Input('btn-cancelar-nova-frente', 'n_clicks'),
-        prevent_initial_call=True
-    )
-    def close_add_edit_modal(n_clicks):
-        return False if n_clicks else no_update
-
     @app.callback(
         Output('data-store', 'data', allow_duplicate=True),
         Output('new-frente-feedback-message', 'children', allow_duplicate=True),
@@ -274,71 +426,60 @@ def register_callbacks(app):
         State('form-frente-total', 'value'),
         State('form-data-inicio', 'date'),
         State('form-data-fim', 'date'),
-        State({'type': 'input-planejamento-semana', 'id': ALL}, 'id'),
-        State({'type': 'input-planejamento-semana', 'id': ALL}, 'value'),
+        State('grade-planejamento-alteracoes', 'data'),
         prevent_initial_call=True
     )
-    def save_frente_data(n_clicks, data_json, edit_mode, obra, frente, total, data_inicio, data_fim, plan_ids, plan_values):
+    def save_frente_data(n_clicks, data_token, edit_mode, obra, frente, total, data_inicio, data_fim, alteracoes_planejamento):
         if not n_clicks: return (no_update,) * 5
         if not all([obra, frente, total is not None, data_inicio, data_fim]):
             return no_update, dbc.Alert("Todos os campos principais são obrigatórios!", color="danger"), True, no_update, no_update
         if pd.to_datetime(data_fim) < pd.to_datetime(data_inicio):
             return no_update, dbc.Alert("Erro: A Data de Fim não pode ser anterior à Data de Início!", color="danger"), True, no_update, no_update
-        total_planejado = sum(pd.to_numeric(v, errors='coerce') or 0 for v in plan_values)
+        alteracoes, invalidas = parse_weekly_changes(alteracoes_planejamento)
+        if invalidas:
+            return no_update, invalid_weeks_alert(invalidas), True, no_update, no_update
+        dataset = load_dataset(data_token)
+        is_editing = edit_mode.get('mode') == 'edit'
+        original_identifier = edit_mode.get('identifier')
+        # A grade envia só as células alteradas: o restante vem do planejamento
+        # já gravado, limitado às semanas do período (as de fora são descartadas)
+        semanas_periodo = weeks_in_range(pd.to_datetime(data_inicio), pd.to_datetime(data_fim))
+        planejamento_atual = get_weekly_values(dataset.semanas, original_identifier['Obra'], original_identifier['Frente'], 'Planejado') if is_editing else {}
+        planejamento_semanal = {w: planejamento_atual.get(w) for w in semanas_periodo}
+        planejamento_semanal.update({w: v for w, v in alteracoes.items() if w in planejamento_semanal})
+        total_planejado = sum(v or 0 for v in planejamento_semanal.values())
         if total_planejado > float(total):
             return no_update, dbc.Alert(f"Erro: O planejado ({total_planejado}) excede o Total ({total})!", color="danger"), True, no_update, no_update
-        df = pd.read_json(StringIO(data_json), orient='split')
+        df, semanas = dataset.frentes.copy(), dataset.semanas
         df['Data Início'] = pd.to_datetime(df['Data Início'])
         df['Data Fim'] = pd.to_datetime(df['Data Fim'])
         obra, frente = obra.strip(), frente.strip()
-        is_editing = edit_mode.get('mode') == 'edit'
-        original_identifier = edit_mode.get('identifier')
         potential_duplicate = df[(df['Obra'] == obra) & (df['Frente'] == frente)]
         if not potential_duplicate.empty and (not is_editing or potential_duplicate.iloc[0]['Frente'] != original_identifier.get('Frente')):
             return no_update, dbc.Alert(f"A frente '{frente}' já existe!", color="danger"), True, no_update, no_update
-        planejamento_semanal = {p_id['id']: (float(val) if val is not None else None) for p_id, val in zip(plan_ids, plan_values)}
-        new_data = {'Obra': obra, 'Frente': frente, 'Total': float(total), 'Data Início': data_inicio, 'Data Fim': data_fim, 'Planejamento Semanal': planejamento_semanal}
+        new_data = {'Obra': obra, 'Frente': frente, 'Total': float(total), 'Data Início': data_inicio, 'Data Fim': data_fim}
         if is_editing:
             idx = df[(df['Obra'] == original_identifier['Obra']) & (df['Frente'] == original_identifier['Frente'])].index[0]
-            new_data['Realizado por Semana'] = df.at[idx, 'Realizado por Semana'] if 'Realizado por Semana' in df.columns and isinstance(df.at[idx, 'Realizado por Semana'], dict) else {}
             for key, value in new_data.items(): df.at[idx, key] = value
+            if original_identifier['Frente'] != frente:
+                # A frente foi renomeada: leva junto o realizado semanal já lançado
+                semanas = schema.set_key(semanas, (semanas['Obra'] == original_identifier['Obra']) & (semanas['Frente'] == original_identifier['Frente']), 'Frente', frente)
             feedback_msg = dbc.Alert("Frente atualizada!", color="success", duration=3000)
         else:
-            new_data['Realizado por Semana'] = {}
             new_row_df = pd.DataFrame([new_data])
             new_row_df['Data Início'] = pd.to_datetime(new_row_df['Data Início'])
             new_row_df['Data Fim'] = pd.to_datetime(new_row_df['Data Fim'])
             df = pd.concat([df, new_row_df], ignore_index=True)
             feedback_msg = dbc.Alert("Frente adicionada!", color="success", duration=3000)
-        df_recalculated = recalculate_dataframe(df)
-        obras = sorted(df_recalculated['Obra'].unique())
-        return df_recalculated.to_json(date_format='iso', orient='split'), feedback_msg, False, [{'label': o, 'value': o} for o in obras], obra
-
-    @app.callback(
-        Output('modal-detalhes-frentes', 'is_open'),
-        Input('btn-abrir-detalhes-modal', 'n_clicks'),
-        Input('btn-fechar-detalhes-modal', 'n_clicks'),
-        State('modal-detalhes-frentes', 'is_open'),
-        prevent_initial_call=True,
-    )
-    def toggle_detalhes_modal(n_open, n_close, is_open):
-        return not is_open if (n_open or n_close) else is_open
-
-    @app.callback(
-        Output('btn-abrir-realizado-modal', 'style'),
-        Output('btn-abrir-editar-modal', 'style'),
-        Output('btn-abrir-excluir-modal', 'style'),
-        Output('selected-row-index-store', 'data'),
-        Input('tabela-detalhes-frentes', 'selected_rows'),
-        State('tabela-detalhes-frentes', 'data'),
-        prevent_initial_call=True
-    )
-    def handle_row_selection(selected_rows, table_data):
-        if selected_rows and selected_rows[0] < len(table_data):
-            row_data = table_data[selected_rows[0]]
-            identifier = {'Obra': row_data.get('Obra'), 'Frente': row_data.get('Frente')}
-            return {'display': 'inline-block'}, {'display': 'inline-block'}, {'display': 'inline-block'}, identifier
-        return {'display': 'none'}, {'display': 'none'}, {'display': 'none'}, None
+        semanas = set_weekly_values(semanas, obra, frente, 'Planejado', planejamento_semanal, substituir=True)
+        afetadas = {(obra, frente)} | ({(original_identifier['Obra'], original_identifier['Frente'])} if is_editing else set())
+        novo_dataset = dataset.derive(df, semanas).recalculate(afetadas).update_rollups(dataset, afetadas)
+        if is_editing:
+            novo_dataset.mark_changed((obra, frente), (original_identifier['Obra'], original_identifier['Frente']))
+        else:
+            novo_dataset.mark_inserted((obra, frente))
+        obras = sorted(novo_dataset.frentes['Obra'].unique())
+        return store_dataset(novo_dataset, data_token), feedback_msg, False, [{'label': o, 'value': o} for o in obras], obra
 
     @app.callback(
         Output('modal-confirmar-excluir', 'is_open'),
@@ -352,14 +493,6 @@ def register_callbacks(app):
             return True, f"Tem a certeza que deseja excluir a frente '{frente_identifier['Frente']}'?"
         return False, None
 
-    @app.callback(
-        Output('modal-confirmar-excluir', 'is_open', allow_duplicate=True),
-        Input('btn-cancelar-excluir', 'n_clicks'),
-        prevent_initial_call=True
-    )
-    def cancel_delete(n_clicks):
-        return False if n_clicks else no_update
-
     @app.callback(
         Output('data-store', 'data', allow_duplicate=True),
         Output('table-save-feedback-message', 'children', allow_duplicate=True),
@@ -370,95 +503,101 @@ def register_callbacks(app):
         State('data-store', 'data'),
         prevent_initial_call=True
     )
-    def execute_delete(n_clicks, frente_identifier, data_json):
+    def execute_delete(n_clicks, frente_identifier, data_token):
         if not n_clicks or not frente_identifier: return no_update, no_update, True, no_update
-        df = pd.read_json(StringIO(data_json), orient='split')
+        dataset = load_dataset(data_token)
+        df, semanas = dataset.frentes, dataset.semanas
         idx_to_delete = df[(df['Obra'] == frente_identifier['Obra']) & (df['Frente'] == frente_identifier['Frente'])].index
         if not idx_to_delete.empty:
-            df.drop(idx_to_delete, inplace=True)
-            return df.to_json(date_format='iso', orient='split'), dbc.Alert("Frente excluída!", color="success"), False, []
+            df = df.drop(idx_to_delete)
+            semanas = semanas[~((semanas['Obra'] == frente_identifier['Obra']) & (semanas['Frente'] == frente_identifier['Frente']))]
+            novo_dataset = dataset.derive(df, semanas).update_rollups(dataset, [(frente_identifier['Obra'], frente_identifier['Frente'])])
+            novo_dataset.mark_deleted((frente_identifier['Obra'], frente_identifier['Frente']))
+            return store_dataset(novo_dataset, data_token), dbc.Alert("Frente excluída!", color="success"), False, []
         return no_update, dbc.Alert("Erro ao excluir.", color="danger"), True, []
 
     @app.callback(
         Output('modal-preencher-realizado', 'is_open'),
         Output('modal-realizado-header', 'children'),
         Output('modal-realizado-body', 'children'),
+        Output('grade-realizado', 'data'),
         Input('btn-abrir-realizado-modal', 'n_clicks'),
         Input('btn-cancelar-realizado', 'n_clicks'),
         State('selected-row-index-store', 'data'),
         State('data-store', 'data'),
         prevent_initial_call=True
     )
-    def open_realizado_modal(n_open, n_cancel, frente_identifier, data_json):
+    def open_realizado_modal(n_open, n_cancel, frente_identifier, data_token):
         if callback_context.triggered_id == 'btn-abrir-realizado-modal' and frente_identifier:
-            df = pd.read_json(StringIO(data_json), orient='split')
-            df['Data Início'] = pd.to_datetime(df['Data Início'])
-            df['Data Fim'] = pd.to_datetime(df['Data Fim'])
+            dataset = load_dataset(data_token)
+            df = dataset.frentes
             frente_data = df[(df['Obra'] == frente_identifier['Obra']) & (df['Frente'] == frente_identifier['Frente'])].iloc[0]
-            start_date, end_date = frente_data.get('Data Início'), frente_data.get('Data Fim')
-            weeks_list = get_weeks_in_range(start_date, end_date)
-            realizado_semanal = frente_data.get('Realizado por Semana', {})
-            planejado_semanal = frente_data.get('Planejamento Semanal', {})
-            form_inputs = [dbc.Row([
-                dbc.Col(dbc.Label(f"Semana {w.split('-W')[-1]} ({w.split('-W')[0]})"), width=5),
-                dbc.Col(html.Small(f"Planejado: {planejado_semanal.get(w, 0) or 0}", className="text-muted"), width=3),
-                dbc.Col(dbc.Input(id={'type': 'input-realizado-semana', 'id': w}, type='number', value=realizado_semanal.get(w)), width=4)
-            ], className="mb-2 align-items-center") for w in weeks_list]
-            return True, f"Lançar Andamento: {frente_identifier['Frente']}", dbc.Form(form_inputs) if form_inputs else html.P("Período inválido.")
-        return False, no_update, no_update
+            start_date, end_date = pd.to_datetime(frente_data.get('Data Início')), pd.to_datetime(frente_data.get('Data Fim'))
+            weeks_list = weeks_in_range(start_date, end_date)
+            realizado_semanal = get_weekly_values(dataset.semanas, frente_identifier['Obra'], frente_identifier['Frente'], 'Realizado')
+            planejado_semanal = get_weekly_values(dataset.semanas, frente_identifier['Obra'], frente_identifier['Frente'], 'Planejado')
+            aviso = html.P("Edite a coluna Realizado ou cole os valores do Excel.", className="small text-muted") if weeks_list else html.P("Período inválido.")
+            return True, f"Lançar Andamento: {frente_identifier['Frente']}", aviso, weekly_grid_rows(weeks_list, realizado_semanal, planejado_semanal)
+        return False, no_update, no_update, no_update
 
     @app.callback(
         Output('data-store', 'data', allow_duplicate=True),
         Output('table-save-feedback-message', 'children', allow_duplicate=True),
         Output('modal-preencher-realizado', 'is_open', allow_duplicate=True),
         Input('btn-salvar-realizado', 'n_clicks'),
-        State({'type': 'input-realizado-semana', 'id': ALL}, 'id'),
-        State({'type': 'input-realizado-semana', 'id': ALL}, 'value'),
+        State('grade-realizado-alteracoes', 'data'),
         State('selected-row-index-store', 'data'),
         State('data-store', 'data'),
         prevent_initial_call=True
     )
-    def save_realizado_values(n_clicks, semana_ids, semana_valores, frente_identifier, data_json):
+    def save_realizado_values(n_clicks, alteracoes_realizado, frente_identifier, data_token):
         if not n_clicks or not frente_identifier: return no_update, no_update, True
-        df = pd.read_json(StringIO(data_json), orient='split')
-        idx = df[(df['Obra'] == frente_identifier['Obra']) & (df['Frente'] == frente_identifier['Frente'])].index[0]
-        if 'Realizado por Semana' not in df.columns or not isinstance(df.at[idx, 'Realizado por Semana'], dict):
-            df.at[idx, 'Realizado por Semana'] = {}
-        for sid, val in zip(semana_ids, semana_valores):
-            if val is not None: df.at[idx, 'Realizado por Semana'][sid['id']] = float(val)
-        return recalculate_dataframe(df).to_json(date_format='iso', orient='split'), dbc.Alert("Andamento salvo!", color="success"), False
-
-    @app.callback(
-        Output('active-timescale-store', 'data'),
-        Input('btn-semanal', 'n_clicks'),
-        Input('btn-mensal', 'n_clicks'),
-        Input('btn-geral', 'n_clicks'),
-        prevent_initial_call=True
-    )
-    def update_active_timescale(n_sem, n_mes, n_geral):
-        return callback_context.triggered[0]['prop_id'].split('.')[0].replace('btn-', '')
+        realizado, invalidas = parse_weekly_changes(alteracoes_realizado)
+        if invalidas:
+            return no_update, invalid_weeks_alert(invalidas), True
+        if not realizado:
+            return no_update, dbc.Alert("Nenhuma alteração no andamento.", color="info", duration=3000), False
+        dataset = load_dataset(data_token)
+        chave = (frente_identifier['Obra'], frente_identifier['Frente'])
+        semanas = set_weekly_values(dataset.semanas, *chave, 'Realizado', realizado, apagar_nulos=True)
+        novo_dataset = dataset.derive(semanas=semanas).recalculate([chave]).update_rollups(dataset, [chave])
+        novo_dataset.mark_changed(chave)
+        return store_dataset(novo_dataset, data_token), dbc.Alert("Andamento salvo!", color="success"), False
 
     @app.callback(
-        Output('semana-slider-col', 'style'),
-        Input('active-timescale-store', 'data')
-    )
-    def toggle_slider_visibility(timescale):
-        return {'display': 'none'}
-
-    @app.callback(
-        Output('category-filter-store', 'data'),
-        Input('category-filter', 'value')
-    )
-    def update_category_filter_store(selected_frente):
-        return selected_frente
-
-    @app.callback(
-        Output('selected-obra-store', 'data'),
-        Input('obra-filter', 'value'),
+        Output('data-store', 'data', allow_duplicate=True),
+        Output('import-feedback-message', 'children'),
+        Output('upload-andamento', 'contents'),
+        Input('upload-andamento', 'contents'),
+        State('upload-andamento', 'filename'),
+        State('data-store', 'data'),
         prevent_initial_call=True
     )
-    def update_selected_obra_store(selected_obra):
-        return selected_obra
+    def import_weekly_progress(contents, filename, data_token):
+        # Limpa 'contents' ao final para que o mesmo arquivo possa ser enviado de novo
+        if not contents: return no_update, no_update, no_update
+        dataset = load_dataset(data_token)
+        try:
+            lancamentos = read_upload(contents, filename)
+        except ImportFileError as e:
+            return no_update, dbc.Alert(f"Falha ao importar '{filename}': {e}", color="danger"), None
+
+        erros = validate(dataset, lancamentos)
+        if not erros.empty:
+            itens = [html.Li(f"Linha {e.Linha}: {e.Obra} / {e.Frente} / {e.Semana if isinstance(e.Semana, str) else '-'}: {e.Motivo}")
+                     for e in erros.head(MAX_REPORTED_ERRORS).itertuples()]
+            if len(erros) > MAX_REPORTED_ERRORS:
+                itens.append(html.Li(f"... e mais {len(erros) - MAX_REPORTED_ERRORS} problema(s)."))
+            return no_update, dbc.Alert([
+                html.P(f"{len(erros)} problema(s) em '{filename}'. Nenhuma linha foi importada.", className="mb-1"),
+                html.Ul(itens, className="mb-0"),
+            ], color="danger"), None
+
+        novo_dataset = apply_import(dataset, lancamentos)
+        n_frentes = len(lancamentos[FRENTE_KEYS].drop_duplicates())
+        mensagem = (f"{len(lancamentos)} lançamento(s) semanais de {n_frentes} frente(s) importados de '{filename}'. "
+                    "Use 'Salvar Dados no Servidor' para gravá-los.")
+        return store_dataset(novo_dataset, data_token), dbc.Alert(mensagem, color="success", duration=6000, fade=True), None
 
     @app.callback(
         Output('category-filter', 'options'),
@@ -467,107 +606,164 @@ def register_callbacks(app):
         State('data-store', 'data'),
         prevent_initial_call=True
     )
-    def update_frente_options(selected_obra, data_json):
-        if not data_json or not selected_obra: return [], 'Todos'
-        df = pd.read_json(StringIO(data_json), orient='split')
+    def update_frente_options(selected_obra, data_token):
+        if not data_token or not selected_obra: return [], 'Todos'
+        df = load_dataset(data_token).frentes
         if df.empty or 'Obra' not in df.columns: return [], 'Todos'
         frentes = sorted(df[(df['Obra'] == selected_obra) & (df['Frente'] != '---')]['Frente'].unique())
         return [{'label': 'Todos', 'value': 'Todos'}] + [{'label': f, 'value': f} for f in frentes], 'Todos'
 
+    # --- Atualização dos visuais, separada por dependência ---
+    # Cada saída tem o próprio callback com apenas as entradas de que realmente
+    # depende: trocar a escala de tempo recalcula só o gráfico de evolução. Os
+    # gráficos com estrutura fixa (medidor e evolução) partem da figura base do
+    # layout e recebem um Patch que troca apenas os traços e o título, sem
+    # reenviar o template a cada atualização.
+    def patch_figure(traces, title=''):
+        """Patch que substitui os traços, o título e as anotações, mantendo o restante da figura base"""
+        patch = Patch()
+        patch['data'] = traces
+        patch['layout']['title'] = {'text': title}
+        patch['layout']['annotations'] = [] if traces else [SEM_DADOS]
+        return patch
+
+    def placeholder_figure():
+        return go.Figure(layout={'template': PLOTLY_TEMPLATE, 'annotations': [SEM_DADOS]})
+
     @app.callback(
         Output('graph-progresso-frente', 'figure'),
-        Output('graph-performance-frentes', 'figure'),
-        Output('graph-evolucao-tempo', 'figure'),
-        Output('tabela-detalhes-frentes', 'data'),
-        Output('tabela-detalhes-frentes', 'columns'),
-        Output('tabela-detalhes-frentes', 'style_data_conditional'),
         Output('summary-cards-row', 'children'),
         Input('data-store', 'data'),
         Input('selected-obra-store', 'data'),
         Input('category-filter-store', 'data'),
-        Input('active-timescale-store', 'data'),
         prevent_initial_call=True
     )
-    def update_visuals_and_table(jsonified_data, selected_obra, selected_frente, timescale):
-        fig_placeholder = go.Figure(layout={'template': PLOTLY_TEMPLATE, 'annotations': [{'text': 'Sem dados', 'showarrow': False}]})
-        if not jsonified_data: return (fig_placeholder,) * 3 + ([], [], [], [])
-
-        df = pd.read_json(StringIO(jsonified_data), orient='split')
-        if df.empty or 'Frente' not in df.columns: return (fig_placeholder,) * 3 + ([], [], [], [])
-        
-        df['Data Início'] = pd.to_datetime(df['Data Início'])
-        df['Data Fim'] = pd.to_datetime(df['Data Fim'])
-        df_vis = df[df['Frente'] != '---'].copy()
-        
-        if df_vis.empty: return (fig_placeholder,) * 3 + ([], [], [], [])
-
-        df_obra = df_vis[df_vis['Obra'] == selected_obra] if selected_obra else df_vis.copy()
-        df_filtered = df_obra[df_obra['Frente'] == selected_frente] if selected_frente and selected_frente != 'Todos' else df_obra.copy()
-
+    def update_progress_summary(data_token, selected_obra, selected_frente):
+        if not data_token: return patch_figure([]), []
+        dataset = load_dataset(data_token)
+        chave = (getattr(dataset, 'version', None), 'progresso', selected_obra, selected_frente)
+        gauge, cards = figure_cache.get_or_build(chave, lambda: build_progress_summary(dataset, selected_obra, selected_frente))
+        return patch_figure(gauge), cards
+
+    def build_progress_summary(dataset, selected_obra, selected_frente):
+        filtrado = filter_frentes(dataset, selected_obra, selected_frente)
+        if filtrado is None: return [], []
+        df_obra, df_filtered = filtrado
         df_card = df_filtered if selected_frente != 'Todos' else df_obra
         progresso = (df_card['Ano (Realizado)'].sum() / df_card['Ano (Previsto)'].sum() * 100) if df_card['Ano (Previsto)'].sum() > 0 else 0
         cards = [dbc.Col(dbc.Card([dbc.CardHeader("Progresso"), dbc.CardBody([html.H3(f"{progresso:.1f}%")])]), md=4),
                  dbc.Col(dbc.Card([dbc.CardHeader("Concluídas"), dbc.CardBody([html.H3(f"{df_card[df_card['Total (%)'] >= 99.9].shape[0]} de {df_card['Frente'].nunique()}")])]), md=4),
                  dbc.Col(dbc.Card([dbc.CardHeader("Status"), dbc.CardBody([html.H3("Finalizado" if progresso >= 100 else "Em Andamento")])]), md=4)]
+        with metrics.phase('figure'):
+            gauge = go.Indicator(mode="gauge+number", value=(df_filtered.iloc[0]['Total (%)'] if not df_filtered.empty and selected_frente != 'Todos' else progresso), title={'text': f"{selected_frente if selected_frente != 'Todos' else 'Geral'}"})
+        return [gauge], cards
 
-        fig_gauge = go.Figure(go.Indicator(mode="gauge+number", value=(df_filtered.iloc[0]['Total (%)'] if not df_filtered.empty and selected_frente != 'Todos' else progresso), title={'text': f"{selected_frente if selected_frente != 'Todos' else 'Geral'}"}))
-
-        fig_performance = go.Figure(layout={'template': PLOTLY_TEMPLATE})
-        if selected_frente and selected_frente != 'Todos' and not df_filtered.empty:
-            frente = df_filtered.iloc[0]
-            start, end, total = frente.get('Data Início'), frente.get('Data Fim'), frente.get('Total', 0)
-            plano_semanal = frente.get('Planejamento Semanal', {})
-            realizado = frente.get('Realizado por Semana', {})
-            xaxis_format = '%b (%G-W%V)'
-            if isinstance(plano_semanal, dict) and any(val for val in plano_semanal.values() if val is not None and val > 0):
-                planned_series = pd.Series(plano_semanal).sort_index(); planned_series.index = pd.to_datetime(planned_series.index.str.replace('-W', '') + '-1', format='%G%V-%w')
-                planned_cumulative = planned_series.cumsum()
-                fig_performance.add_trace(go.Scatter(x=planned_cumulative.index.strftime(xaxis_format), y=planned_cumulative, name='Planejado', line={'dash': 'dash', 'color': 'red'}, marker={'color': 'red'}, mode='lines+markers'))
-            elif pd.notna(start) and pd.notna(end) and total > 0:
-                planned_series = pd.Series(total / len(pd.date_range(start, end)), index=pd.date_range(start, end)).resample('W-MON').sum()
-                planned_cumulative = planned_series.cumsum()
-                fig_performance.add_trace(go.Scatter(x=planned_cumulative.index.strftime(xaxis_format), y=planned_cumulative, name='Previsto (Linear)', line={'dash': 'dot', 'color': 'red'}, marker={'color': 'red'}, mode='lines+markers'))
-            if isinstance(realizado, dict) and realizado:
-                realizado_series = pd.Series(realizado).sort_index(); realizado_series.index = pd.to_datetime(realizado_series.index.str.replace('-W', '') + '-1', format='%G%V-%w')
-                realizado_cumulative = realizado_series.cumsum()
-                fig_performance.add_trace(go.Scatter(x=realizado_cumulative.index.strftime(xaxis_format), y=realizado_cumulative, name='Realizado', line={'color': 'blue'}, marker={'color': 'blue'}, mode='lines+markers'))
-            fig_performance.update_layout(title=f'Curva S: {selected_frente}', xaxis_title='Semana (Mês/Ano-WNumero)')
-        else:
-            fig_performance = px.bar(df_obra.sort_values('Total (%)'), x='Total (%)', y='Frente', orientation='h', title=f'Performance Geral ({selected_obra})')
-
-        fig_evolucao = go.Figure(layout={'barmode': 'group', 'template': PLOTLY_TEMPLATE, 'title': f'Evolução ({timescale.capitalize()})'})
-        series_list_real = [pd.Series({pd.to_datetime(k.replace('-W', '')+'-1', format='%G%V-%w'): v for k,v in r.get('Realizado por Semana',{}).items() if v is not None}) for _, r in df_filtered.iterrows()]
-        series_list_plan = []
-        for _, r in df_filtered.iterrows():
-            plano_semanal, start, end, total = r.get('Planejamento Semanal', {}), r.get('Data Início'), r.get('Data Fim'), r.get('Total', 0)
-            if isinstance(plano_semanal, dict) and any(val for val in plano_semanal.values() if val is not None and val > 0):
-                series_list_plan.append(pd.Series({pd.to_datetime(k.replace('-W', '')+'-1', format='%G%V-%w'): v for k,v in plano_semanal.items() if v is not None}))
-            elif pd.notna(start) and pd.notna(end) and total > 0:
-                series_list_plan.append(pd.Series(total / len(pd.date_range(start, end)), index=pd.date_range(start, end)))
-        non_empty_series_plan = [s for s in series_list_plan if not s.empty]
-        if non_empty_series_plan:
-            total_planejado = pd.concat(non_empty_series_plan).groupby(level=0).sum().sort_index()
-            if not total_planejado.empty:
-                freq = 'ME' if timescale == 'mensal' else 'W-MON'; fmt = '%Y-%m' if timescale == 'mensal' else '%b (%G-W%V)'
-                resampled = total_planejado.resample(freq).sum()
-                fig_evolucao.add_trace(go.Bar(x=resampled.index.strftime(fmt), y=resampled.values, name='Previsto', marker_color='red'))
-        non_empty_series_real = [s for s in series_list_real if not s.empty]
-        if non_empty_series_real:
-            total_realizado = pd.concat(non_empty_series_real).groupby(level=0).sum().sort_index()
-            if not total_realizado.empty:
-                freq = 'ME' if timescale == 'mensal' else 'W-MON'; fmt = '%Y-%m' if timescale == 'mensal' else '%b (%G-W%V)'
-                resampled = total_realizado.resample(freq).sum()
-                fig_evolucao.add_trace(go.Bar(x=resampled.index.strftime(fmt), y=resampled.values, name='Realizado', marker_color='blue'))
-        if timescale == 'geral':
-            fig_evolucao.add_trace(go.Bar(x=['Visão Geral'], y=[df_filtered['Ano (Previsto)'].sum()], name='Total Previsto', marker_color='red'))
-            fig_evolucao.add_trace(go.Bar(x=['Visão Geral'], y=[df_filtered['Ano (Realizado)'].sum()], name='Total Realizado', marker_color='blue'))
-
-        cols_tabela = ['Obra', 'Frente', 'Total', 'Data Início', 'Data Fim', 'Total (%)']
-        data_tabela = df_filtered[cols_tabela].copy()
-        if not data_tabela.empty:
-            data_tabela['Data Início'] = pd.to_datetime(data_tabela['Data Início']).dt.strftime('%d/%m/%Y').replace('NaT', '')
-            data_tabela['Data Fim'] = pd.to_datetime(data_tabela['Data Fim']).dt.strftime('%d/%m/%Y').replace('NaT', '')
-        
-        return (fig_gauge, fig_performance, fig_evolucao, data_tabela.to_dict('records'), [{"name": i, "id": i} for i in cols_tabela], 
-                [{'if': {'column_id': 'Total (%)', 'filter_query': '{Total (%)} >= 99.9'}, 'backgroundColor': '#d4edda'}], 
-                cards)
+    @app.callback(
+        Output('graph-performance-frentes', 'figure'),
+        Input('data-store', 'data'),
+        Input('selected-obra-store', 'data'),
+        Input('category-filter-store', 'data'),
+        prevent_initial_call=True
+    )
+    def update_performance_chart(data_token, selected_obra, selected_frente):
+        # Alterna entre Curva S (uma frente) e barras (todas): a figura muda de tipo e vai inteira
+        if not data_token: return placeholder_figure()
+        dataset = load_dataset(data_token)
+        chave = (getattr(dataset, 'version', None), 'performance', selected_obra, selected_frente)
+        return figure_cache.get_or_build(chave, lambda: build_performance_chart(dataset, selected_obra, selected_frente))
+
+    def build_performance_chart(dataset, selected_obra, selected_frente):
+        filtrado = filter_frentes(dataset, selected_obra, selected_frente)
+        if filtrado is None: return placeholder_figure()
+        df_obra, df_filtered = filtrado
+        traces, layout = [], {'template': PLOTLY_TEMPLATE}
+        with metrics.phase('figure'):
+            if selected_frente and selected_frente != 'Todos' and not df_filtered.empty:
+                frente = df_filtered.iloc[0]
+                start, end, total = frente.get('Data Início'), frente.get('Data Fim'), frente.get('Total', 0)
+                # Fatos semanais da frente, com a segunda-feira de cada semana ISO
+                semanas = dataset.semanas
+                fatos_frente = semanas[(semanas['Obra'] == frente['Obra']) & (semanas['Frente'] == frente['Frente'])].sort_values('Semana')
+                fatos_frente = fatos_frente.assign(Data=weeks_to_dates(fatos_frente['Semana']))
+                # Eixo de datas (com o rótulo da semana ISO): os pontos reduzidos de cada série continuam no lugar
+                xaxis_format = '%b (%G-W%V)'
+                if (fatos_frente['Planejado'] > 0).any():
+                    planned_cumulative = fatos_frente.dropna(subset=['Planejado']).set_index('Data')['Planejado'].cumsum()
+                    traces.append(go.Scatter(x=planned_cumulative.index, y=planned_cumulative, name='Planejado', line={'dash': 'dash', 'color': 'red'}, marker={'color': 'red'}, mode='lines+markers'))
+                elif pd.notna(start) and pd.notna(end) and total > 0:
+                    planned_cumulative = plan_series(start, end, total, 'semanal').cumsum()
+                    traces.append(go.Scatter(x=planned_cumulative.index, y=planned_cumulative, name='Previsto (Linear)', line={'dash': 'dot', 'color': 'red'}, marker={'color': 'red'}, mode='lines+markers'))
+                realizado = fatos_frente.dropna(subset=['Realizado'])
+                if not realizado.empty:
+                    realizado_cumulative = realizado.set_index('Data')['Realizado'].cumsum()
+                    traces.append(go.Scatter(x=realizado_cumulative.index, y=realizado_cumulative, name='Realizado', line={'color': 'blue'}, marker={'color': 'blue'}, mode='lines+markers'))
+                layout.update(title=f'Curva S: {selected_frente}', xaxis={'title': 'Semana (Mês/Ano-WNumero)', 'tickformat': xaxis_format, 'hoverformat': xaxis_format})
+            else:
+                # Uma barra por frente, até PERFORMANCE_MAX_BARS (as demais viram "Outras")
+                barras = top_n_with_others(df_obra, 'Total (%)', 'Frente').sort_values('Total (%)', kind='stable')
+                traces.append(go.Bar(x=barras['Total (%)'], y=barras['Frente'], orientation='h', hovertemplate='Total (%)=%{x}<br>Frente=%{y}<extra></extra>'))
+                layout.update(title=f'Performance Geral ({selected_obra})', barmode='relative', xaxis={'title': 'Total (%)'}, yaxis={'title': 'Frente'})
+            fig_performance = go.Figure(data=optimize_traces(traces), layout=layout)
+        return fig_performance
+
+    @app.callback(
+        Output('graph-evolucao-tempo', 'figure'),
+        Input('data-store', 'data'),
+        Input('selected-obra-store', 'data'),
+        Input('category-filter-store', 'data'),
+        Input('active-timescale-store', 'data'),
+        prevent_initial_call=True
+    )
+    def update_evolution_chart(data_token, selected_obra, selected_frente, timescale):
+        if not data_token: return patch_figure([])
+        dataset = load_dataset(data_token)
+        chave = (getattr(dataset, 'version', None), 'evolucao', selected_obra, selected_frente, timescale)
+        traces = figure_cache.get_or_build(chave, lambda: build_evolution_traces(dataset, selected_obra, selected_frente, timescale))
+        return patch_figure(traces, f'Evolução ({timescale.capitalize()})' if traces else '')
+
+    def build_evolution_traces(dataset, selected_obra, selected_frente, timescale):
+        filtrado = filter_frentes(dataset, selected_obra, selected_frente)
+        if filtrado is None: return []
+        _, df_filtered = filtrado
+        traces = []
+        with metrics.phase('figure'):
+            escala = 'mensal' if timescale == 'mensal' else 'semanal'; fmt = '%Y-%m' if timescale == 'mensal' else '%b (%G-W%V)'
+            # Todas as frentes: agregados materializados do dataset; uma frente: agregados só dela
+            if selected_frente and selected_frente != 'Todos':
+                rollups, obra_rollup = Rollups.build(df_filtered, dataset.semanas), None
+            else:
+                rollups, obra_rollup = dataset.rollups, selected_obra or None
+            resampled = rollups.series(escala, 'Planejado', obra_rollup)
+            if not resampled.empty:
+                traces.append(go.Bar(x=resampled.index.strftime(fmt), y=resampled.values, name='Previsto', marker_color='red'))
+            resampled = rollups.series(escala, 'Realizado', obra_rollup)
+            if not resampled.empty:
+                traces.append(go.Bar(x=resampled.index.strftime(fmt), y=resampled.values, name='Realizado', marker_color='blue'))
+            if timescale == 'geral':
+                traces.append(go.Bar(x=['Visão Geral'], y=[df_filtered['Ano (Previsto)'].sum()], name='Total Previsto', marker_color='red'))
+                traces.append(go.Bar(x=['Visão Geral'], y=[df_filtered['Ano (Realizado)'].sum()], name='Total Realizado', marker_color='blue'))
+        return optimize_traces(traces)
+
+    @app.callback(
+        Output('tabela-detalhes-frentes', 'data'),
+        Output('tabela-detalhes-frentes', 'page_count'),
+        Output('tabela-detalhes-frentes', 'page_current'),
+        Output('tabela-detalhes-frentes', 'selected_rows', allow_duplicate=True),
+        Input('data-store', 'data'),
+        Input('selected-obra-store', 'data'),
+        Input('category-filter-store', 'data'),
+        Input('tabela-detalhes-frentes', 'page_current'),
+        Input('tabela-detalhes-frentes', 'page_size'),
+        Input('tabela-detalhes-frentes', 'sort_by'),
+        Input('tabela-detalhes-frentes', 'filter_query'),
+        prevent_initial_call=True
+    )
+    def update_details_table(data_token, selected_obra, selected_frente, page_current, page_size, sort_by, filter_query):
+        # Paginação, ordenação e filtro no servidor: só a página visível vai ao navegador.
+        # Colunas e formatação condicional são fixas e ficam no layout.
+        linhas = details_table_rows(data_token, selected_obra, selected_frente, sort_by, filter_query)
+        pagina, atual = get_page(linhas, page_current, page_size)
+        # A seleção é um índice dentro da página: perde o sentido ao trocar de página, ordem ou filtro
+        selecao = [] if callback_context.triggered_id == 'tabela-detalhes-frentes' else no_update
+        return (format_details_rows(pagina).to_dict('records'), page_count(len(linhas), page_size),
+                atual if atual != page_current else no_update, selecao)
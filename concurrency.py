@@ -0,0 +1,222 @@
+# -----------------------------------------------------------------------------
+# Arquivo: concurrency.py (Edição Simultânea com Controle Otimista)
+# -----------------------------------------------------------------------------
+# Cada sessão edita a sua própria cópia do portfólio e só grava ao clicar em
+# salvar. Para que vários usuários editem ao mesmo tempo sem que um apague o
+# trabalho do outro, cada frente tem uma versão: a impressão digital (hash)
+# do seu conteúdo no armazenamento (Total, datas e valores semanais). As
+# versões lidas na carga ficam no Dataset ('versoes_base').
+#
+# Ao salvar, o armazenamento é lido de novo e cada alteração pendente é
+# conferida com a versão atual da frente:
+#   - igual à lida: ninguém mexeu na frente e a alteração é aplicada
+#   - diferente: outro usuário alterou, excluiu ou criou a mesma frente nesse
+#     meio tempo; é um conflito e a alteração não é gravada
+# As alterações aceitas são aplicadas sobre o estado atual do armazenamento,
+# então a sessão passa a ver também o que os outros gravaram. As frentes em
+# conflito continuam pendentes com a versão local, agora tendo como base a
+# versão atual: salvar de novo sobrescreve, recarregar a página descarta.
+#
+# Como a versão vem do conteúdo, a planilha não precisa de coluna extra e
+# edições feitas direto no Google Sheets também são detectadas.
+#
+# A conferência só vale se nada mudar entre a releitura e a escrita: dois
+# usuários salvando juntos gravariam cada um sobre o estado que leu, e a
+# gravação na planilha localiza as linhas pela posição lida no início. Por
+# isso releitura, conferência e escrita rodam dentro de save_lock(), um
+# bloqueio de arquivo em CACHE_DIR que vale para todos os workers da máquina.
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import schema
+from data_store import CACHE_DIR, ensure_cache_dir
+from dataset import Dataset
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows (servidor de desenvolvimento, um único processo)
+    fcntl = None
+
+# Casas decimais consideradas: a ida e volta pelo armazenamento não deve mudar a versão
+VERSION_DECIMALS = 6
+
+# Tempo máximo esperando outra gravação terminar antes de desistir
+SAVE_LOCK_TIMEOUT_SECONDS = float(os.environ.get('SAVE_LOCK_TIMEOUT_SECONDS', 120))
+
+_local_lock = threading.Lock()
+
+
+class SaveInProgressError(Exception):
+    """Outra gravação no mesmo armazenamento não terminou dentro de SAVE_LOCK_TIMEOUT_SECONDS"""
+
+
+def _texto(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Converte só as categorias, não cada linha
+        return serie if pd.api.types.is_string_dtype(serie.cat.categories) else serie.cat.rename_categories(serie.cat.categories.astype(str))
+    return serie if pd.api.types.is_string_dtype(serie) else serie.astype(str)
+
+
+def _frente_keys(df):
+    colunas = [_texto(df[c]) for c in ('Obra', 'Frente')]
+    return pd.MultiIndex.from_arrays(colunas)
+
+
+def _day_numbers(datas):
+    if not pd.api.types.is_datetime64_any_dtype(datas):
+        datas = pd.to_datetime(datas, errors='coerce')
+    return pd.DatetimeIndex(datas).to_numpy().astype('datetime64[D]').astype('int64')
+
+
+def _numbers(valores):
+    return np.round(pd.to_numeric(valores, errors='coerce').to_numpy(dtype='float64'), VERSION_DECIMALS)
+
+
+def row_versions(dataset):
+    """{(Obra, Frente): versão} de todas as frentes do dataset"""
+    frentes, semanas = dataset.frentes, dataset.semanas
+    if frentes.empty:
+        return {}
+    versoes = pd.util.hash_pandas_object(pd.DataFrame({
+        'Total': _numbers(frentes['Total']),
+        'Data Início': _day_numbers(frentes['Data Início']),
+        'Data Fim': _day_numbers(frentes['Data Fim']),
+    }), index=False).to_numpy(copy=True)
+
+    # Os fatos semanais entram por XOR dos hashes de cada semana: não depende da ordem das linhas
+    fatos = semanas[semanas['Planejado'].notna() | semanas['Realizado'].notna()]
+    posicoes = _frente_keys(frentes).get_indexer(_frente_keys(fatos))
+    existentes = posicoes >= 0
+    if existentes.any():
+        fatos, posicoes = fatos[existentes], posicoes[existentes]
+        hashes = pd.util.hash_pandas_object(pd.DataFrame({
+            'Semana': fatos['Semana'].to_numpy(dtype=object),
+            'Planejado': _numbers(fatos['Planejado']),
+            'Realizado': _numbers(fatos['Realizado']),
+        }), index=False).to_numpy()
+        ordem = np.argsort(posicoes, kind='stable')
+        com_fatos, inicio = np.unique(posicoes[ordem], return_index=True)
+        versoes[com_fatos] ^= np.bitwise_xor.reduceat(hashes[ordem], inicio)
+    return {chave: f"{v:016x}" for chave, v in zip(zip(frentes['Obra'], frentes['Frente']), versoes)}
+
+
+def stamp(dataset):
+    """Registra no dataset recém-lido do armazenamento a versão de cada frente"""
+    dataset.versoes_base = row_versions(dataset)
+    return dataset
+
+
+def _apply(base, origem, alteradas, inseridas, excluidas):
+    """Novo Dataset: 'base' com as frentes alteradas/inseridas vindas de 'origem' e as excluídas removidas.
+
+    A frente alterada ocupa o lugar da linha original; as novas vão para o fim.
+    """
+    remover = set(excluidas) | set(alteradas) | set(alteradas.values()) | set(inseridas)
+    incluir = set(alteradas) | set(inseridas)
+    if not remover:
+        return Dataset(base.frentes, base.semanas)
+    ids_remover = pd.MultiIndex.from_tuples([tuple(map(str, c)) for c in remover], names=['Obra', 'Frente'])
+    ids_incluir = pd.MultiIndex.from_tuples([tuple(map(str, c)) for c in incluir], names=['Obra', 'Frente'])
+    posicao = {chave: i for i, chave in enumerate(zip(base.frentes['Obra'], base.frentes['Frente']))}
+
+    mantidas = ~_frente_keys(base.frentes).isin(ids_remover)
+    novas = origem.frentes[_frente_keys(origem.frentes).isin(ids_incluir)]
+    ordem = np.concatenate([
+        np.flatnonzero(mantidas).astype('float64'),
+        [posicao.get(alteradas.get(chave, chave), len(posicao)) + 0.5 for chave in zip(novas['Obra'], novas['Frente'])],
+    ])
+    frentes = pd.concat([base.frentes[mantidas], novas], ignore_index=True)
+    frentes = frentes.iloc[np.argsort(ordem, kind='stable')].reset_index(drop=True)
+    semanas = schema.concat([base.semanas[~_frente_keys(base.semanas).isin(ids_remover)],
+                             origem.semanas[_frente_keys(origem.semanas).isin(ids_incluir)]])
+    return Dataset(frentes, semanas)
+
+
+def merge_for_save(sessao, atual):
+    """Aplica as alterações pendentes de 'sessao' sobre 'atual' (recém-lido do armazenamento).
+
+    Retorna (gravar, resultado, conflitos):
+      - gravar: 'atual' com as alterações sem conflito, registradas como
+        pendentes (é o dataset a passar para save_delta)
+      - resultado: o que a sessão passa a ver depois da gravação, com as
+        alterações em conflito ainda pendentes
+      - conflitos: chaves (Obra, Frente) em conflito, em ordem
+    """
+    base = getattr(sessao, 'versoes_base', {})
+    versoes = row_versions(atual)
+
+    def mudou(chave):
+        return versoes.get(chave) != base.get(chave)
+
+    def existe_e_mudou(chave):
+        return chave in versoes and mudou(chave)
+
+    aceitas = ({}, set(), set())
+    recusadas = ({}, set(), set())
+    for chave, original in sessao.alteradas.items():
+        # Alterada/excluída por outro usuário, ou renomeada para uma frente que outro usuário criou
+        conflito = mudou(original) or (chave != original and existe_e_mudou(chave))
+        (recusadas if conflito else aceitas)[0][chave] = original
+    for chave in sessao.inseridas:
+        (recusadas if existe_e_mudou(chave) else aceitas)[1].add(chave)
+    for chave in sessao.excluidas:
+        if chave in versoes:  # Se outro usuário já excluiu, não há o que fazer
+            (recusadas if mudou(chave) else aceitas)[2].add(chave)
+
+    gravar = _apply(atual, sessao, *aceitas)
+    gravar.alteradas, gravar.inseridas, gravar.excluidas = aceitas
+
+    resultado = _apply(gravar, sessao, *recusadas)
+    resultado.alteradas, resultado.inseridas, resultado.excluidas = recusadas
+    resultado.versoes_base = row_versions(gravar)
+    for chave in set(recusadas[0]) | set(recusadas[0].values()) | recusadas[1] | recusadas[2]:
+        # A base das frentes em conflito passa a ser a versão atual: salvar de novo sobrescreve
+        if chave in versoes:
+            resultado.versoes_base[chave] = versoes[chave]
+        else:
+            resultado.versoes_base.pop(chave, None)
+
+    conflitos = sorted(set(recusadas[0]) | recusadas[1] | recusadas[2], key=lambda c: (str(c[0]), str(c[1])))
+    return gravar, resultado, conflitos
+
+
+@contextmanager
+def save_lock(nome, aguardando=None):
+    """Bloqueio exclusivo, entre os workers, da gravação no armazenamento 'nome'.
+
+    aguardando() é chamada uma vez se outra gravação estiver em andamento.
+    Levanta SaveInProgressError se o bloqueio não sair em SAVE_LOCK_TIMEOUT_SECONDS.
+    """
+    if fcntl is None:
+        if not _local_lock.acquire(timeout=SAVE_LOCK_TIMEOUT_SECONDS):
+            raise SaveInProgressError("Outra gravação ainda está em andamento. Tente novamente em instantes.")
+        try:
+            yield
+        finally:
+            _local_lock.release()
+        return
+    ensure_cache_dir()
+    caminho = os.path.join(CACHE_DIR, f"save-{hashlib.sha1(nome.encode('utf-8')).hexdigest()[:16]}.lock")
+    with open(caminho, 'a') as arquivo:
+        limite = time.monotonic() + SAVE_LOCK_TIMEOUT_SECONDS
+        while True:
+            try:
+                fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= limite:
+                    raise SaveInProgressError("Outra gravação ainda está em andamento. Tente novamente em instantes.")
+                if aguardando is not None:
+                    aguardando()
+                    aguardando = None
+                time.sleep(0.2)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
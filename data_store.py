@@ -0,0 +1,215 @@
+# -----------------------------------------------------------------------------
+# Arquivo: data_store.py (Cache de Datasets no Servidor)
+# -----------------------------------------------------------------------------
+# O navegador guarda em 'data-store' apenas um token pequeno
+# ({'session': ..., 'version': ...}). Os DataFrames ficam aqui, num cache LRU
+# em memória com cópia em disco, para que vários workers do Gunicorn (e
+# reinícios do processo) consigam resolver o mesmo token. Em disco, cada
+# versão é gravada no formato binário de serialization.py.
+#
+# Cada carga da página abre uma sessão e cada edição cria uma nova versão
+# dela. A evicção é por sessão: primeiro saem as versões já substituídas
+# (o navegador só guarda a última), e a última versão de uma sessão só sai
+# quando não há mais nenhuma antiga, começando pela sessão parada há mais
+# tempo. Um token que não existe mais levanta SessionExpiredError, para que
+# a tela avise o usuário em vez de mostrar o painel vazio.
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import schema
+from serialization import decode_dataset, encode_dataset
+
+# Quantidade máxima de versões mantidas em memória e em disco
+MAX_MEMORY_ENTRIES = int(os.environ.get('DATASET_CACHE_MEMORY_ENTRIES', 32))
+MAX_DISK_ENTRIES = int(os.environ.get('DATASET_CACHE_DISK_ENTRIES', 256))
+
+# Extensão dos arquivos de dataset em disco
+DISK_SUFFIX = '.dataset'
+
+# Diretório local compartilhado entre os workers. Fica num caminho previsível
+# (o /tmp é de todos os usuários da máquina): é criado só com acesso do dono,
+# e só é considerado privado se pertencer ao usuário do processo
+CACHE_DIR = os.environ.get('DATASET_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'dashboard-obras-datasets'))
+
+_lock = threading.Lock()
+_memory_cache = OrderedDict()
+_cache_dir_private = None
+
+
+class SessionExpiredError(Exception):
+    """O token aponta para uma versão que já saiu do cache (memória e disco)"""
+
+
+def ensure_cache_dir():
+    """Cria CACHE_DIR (modo 0700) e, se for do usuário do processo, fecha o acesso dos outros"""
+    os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    info = os.stat(CACHE_DIR)
+    if hasattr(os, 'getuid') and info.st_uid == os.getuid() and info.st_mode & 0o077:
+        os.chmod(CACHE_DIR, 0o700)
+
+
+def cache_dir_is_private():
+    """True se CACHE_DIR pertence ao usuário do processo e ninguém mais pode escrever nele.
+
+    Só assim o formato pickle (serialization.py, sem pyarrow) é lido: outro
+    usuário da máquina que grave ali um arquivo executaria código no app.
+    """
+    global _cache_dir_private
+    if _cache_dir_private is None:
+        try:
+            ensure_cache_dir()
+            info = os.stat(CACHE_DIR)
+        except OSError:
+            return False
+        if not hasattr(os, 'getuid'):  # Windows: o diretório temporário já é do próprio usuário
+            _cache_dir_private = True
+        else:
+            _cache_dir_private = info.st_uid == os.getuid() and not info.st_mode & 0o022
+        if not _cache_dir_private:
+            print(f"Aviso: o diretório de cache '{CACHE_DIR}' não é privado; datasets no formato pickle não serão lidos.")
+    return _cache_dir_private
+
+
+def _new_version():
+    # Prefixo com o instante da criação (ms, hexadecimal de largura fixa): a maior versão é a última da sessão
+    return f"{time.time_ns() // 1_000_000:011x}{uuid.uuid4().hex[:5]}"
+
+
+def _session_of(key):
+    return key.split('-', 1)[0]
+
+
+def _superseded(keys):
+    """Chaves que não são a última versão da sua sessão"""
+    ultimas = {}
+    for key in keys:
+        sessao = _session_of(key)
+        if key > ultimas.get(sessao, ''):
+            ultimas[sessao] = key
+    return set(keys) - set(ultimas.values())
+
+
+def _cache_key(token):
+    if not isinstance(token, dict) or not token.get('session') or not token.get('version'):
+        return None
+    return f"{token['session']}-{token['version']}"
+
+
+def _disk_path(key):
+    return os.path.join(CACHE_DIR, f"{key}{DISK_SUFFIX}")
+
+
+def _remember(key, dataset):
+    with _lock:
+        _memory_cache[key] = dataset
+        _memory_cache.move_to_end(key)
+        excesso = len(_memory_cache) - MAX_MEMORY_ENTRIES
+        if excesso > 0:
+            # Em ordem de uso: as versões substituídas primeiro, depois as últimas das sessões paradas
+            antigas = _superseded(_memory_cache)
+            ordem = [k for k in _memory_cache if k in antigas] + [k for k in _memory_cache if k not in antigas]
+            for chave in ordem[:excesso]:
+                del _memory_cache[chave]
+
+
+def _write_to_disk(key, dataset):
+    try:
+        ensure_cache_dir()
+        tmp_path = f"{_disk_path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(encode_dataset(dataset))
+        os.replace(tmp_path, _disk_path(key))
+        _evict_disk()
+    except OSError as e:
+        print(f"Aviso: não foi possível gravar o dataset '{key}' em disco: {e}")
+
+
+def _evict_disk():
+    # Só os arquivos de versões de sessão (chave 'sessão-versão'); os do load_cache.py ficam
+    keys = [name[:-len(DISK_SUFFIX)] for name in os.listdir(CACHE_DIR)
+            if name.endswith(DISK_SUFFIX) and '-' in name and not name.startswith('load-')]
+    if len(keys) <= MAX_DISK_ENTRIES:
+        return
+    antigas = _superseded(keys)
+
+    def uso(key):
+        try:
+            return os.path.getmtime(_disk_path(key))
+        except OSError:
+            return 0
+    keys.sort(key=lambda key: (key not in antigas, uso(key)))
+    for key in keys[:len(keys) - MAX_DISK_ENTRIES]:
+        try:
+            os.remove(_disk_path(key))
+        except OSError:
+            pass
+
+
+def _read_from_disk(key):
+    path = _disk_path(key)
+    try:
+        with open(path, 'rb') as f:
+            dataset = decode_dataset(f.read(), permitir_pickle=cache_dir_is_private())
+        os.utime(path)  # Marca como usado recentemente para a evicção LRU em disco
+        return dataset
+    except (OSError, ValueError):
+        return None
+
+
+def put_dataset(dataset, token=None):
+    """Guarda uma nova versão do dataset e devolve o token para o navegador.
+
+    Se 'token' for informado, a nova versão pertence à mesma sessão.
+    """
+    session = token.get('session') if isinstance(token, dict) and token.get('session') else uuid.uuid4().hex
+    new_token = {'session': session, 'version': _new_version()}
+    key = _cache_key(new_token)
+    _remember(key, dataset)
+    _write_to_disk(key, dataset)
+    return new_token
+
+
+def get_dataset(token):
+    """Resolve o token para o dataset guardado, ou None se ele não existir mais.
+
+    O objeto devolvido é compartilhado: faça uma cópia antes de modificá-lo.
+    """
+    key = _cache_key(token)
+    if key is None:
+        return None
+    with _lock:
+        dataset = _memory_cache.get(key)
+        if dataset is not None:
+            _memory_cache.move_to_end(key)
+            return dataset
+    dataset = _read_from_disk(key)
+    if dataset is not None:
+        _remember(key, dataset)
+    return dataset
+
+
+def clear_cache():
+    with _lock:
+        _memory_cache.clear()
+
+
+def memory_report():
+    """Bytes dos datasets guardados em memória, por tabela, e a quantidade de entradas.
+
+    Versões derivadas umas das outras compartilham DataFrames (Dataset.derive);
+    cada DataFrame é contado uma única vez.
+    """
+    with _lock:
+        datasets = list(_memory_cache.values())
+    uso = {'frentes': 0, 'semanas': 0, 'rollups': 0}
+    contados = set()
+    for dataset in datasets:
+        for tabela, df in schema.tables(dataset):
+            if id(df) not in contados:
+                contados.add(id(df))
+                uso[tabela] += int(df.memory_usage(deep=True).sum())
+    return uso, len(datasets)
@@ -0,0 +1,131 @@
+# -----------------------------------------------------------------------------
+# Arquivo: dataset.py (Frentes + Fatos Semanais)
+# -----------------------------------------------------------------------------
+# O portfólio é mantido em duas tabelas:
+#   - frentes: uma linha por (Obra, Frente) com Total, datas e os totais calculados
+#   - semanas: tabela longa (Obra, Frente, Semana, Planejado, Realizado)
+# As colunas de dicionário 'Realizado por Semana' / 'Planejamento Semanal'
+# existem apenas no formato da planilha (from_wide / to_wide).
+#
+# Cada Dataset recebe uma 'version' própria ao ser criado: como as tabelas não
+# são alteradas depois de guardadas, a versão identifica o conteúdo e serve de
+# chave para os caches derivados (ex.: figure_cache).
+#
+# Os agregados por período do gráfico de evolução (rollups.Rollups) são
+# montados na primeira consulta e, nas gravações, atualizados apenas com a
+# diferença das frentes alteradas (update_rollups); em portfólios pequenos
+# são apenas descartados, e remontados na próxima consulta.
+#
+# As chaves (Obra, Frente, Semana) da tabela de fatos semanais são guardadas
+# como category (schema.py), o que a deixa ~10x menor em memória.
+#
+# O dataset também registra quais frentes mudaram desde a última leitura ou
+# gravação na planilha, para que o salvamento envie apenas essas linhas, e a
+# versão de cada frente quando foi lida (concurrency.py), para detectar
+# edições simultâneas de outros usuários.
+import uuid
+
+import pandas as pd
+
+import schema
+from rollups import ROLLUP_DELTA_MIN_ROWS, Rollups
+from utils import SHEET_COLUMNS, WEEKLY_DICT_COLUMNS, get_empty_semanas, semanas_from_dicts, dicts_from_semanas, recalculate_dataframe
+
+
+class Dataset:
+    def __init__(self, frentes, semanas=None):
+        self.frentes = frentes
+        self.semanas = schema.compact_semanas(semanas if semanas is not None else get_empty_semanas())
+        self.version = uuid.uuid4().hex[:12]
+        self._rollups = None
+        # chave atual -> chave da linha na planilha (difere quando a frente foi renomeada)
+        self.alteradas = {}
+        self.inseridas = set()
+        self.excluidas = set()
+        # (Obra, Frente) -> versão da frente no armazenamento, como lida por esta sessão
+        self.versoes_base = {}
+
+    @classmethod
+    def empty(cls):
+        return cls.from_wide(pd.DataFrame(columns=SHEET_COLUMNS))
+
+    @classmethod
+    def from_wide(cls, df):
+        """Cria o dataset a partir do formato da planilha (dicionários por célula)"""
+        semanas = semanas_from_dicts(df)
+        frentes = df.drop(columns=[c for c in WEEKLY_DICT_COLUMNS.values() if c in df.columns])
+        return cls(recalculate_dataframe(frentes, semanas), semanas)
+
+    def to_wide(self):
+        """Devolve as frentes com as colunas de dicionário, no formato da planilha"""
+        return dicts_from_semanas(self.frentes, self.semanas)
+
+    def derive(self, frentes=None, semanas=None):
+        """Nova versão do dataset com outras tabelas, mantendo o registro de alterações"""
+        novo = Dataset(self.frentes if frentes is None else frentes, self.semanas if semanas is None else semanas)
+        novo.alteradas = dict(self.alteradas)
+        novo.inseridas = set(self.inseridas)
+        novo.excluidas = set(self.excluidas)
+        novo.versoes_base = getattr(self, 'versoes_base', {})
+        if frentes is None and semanas is None:
+            novo._rollups = getattr(self, '_rollups', None)
+        return novo
+
+    def copy(self):
+        return self.derive(self.frentes.copy(), self.semanas.copy())
+
+    def recalculate(self, chaves=None):
+        """Recalcula os totais das frentes; com 'chaves', só os das frentes editadas"""
+        self.frentes = recalculate_dataframe(self.frentes, self.semanas, chaves)
+        self.version = uuid.uuid4().hex[:12]
+        return self
+
+    def memory_usage(self):
+        """Bytes ocupados pelas tabelas e agregados (schema.memory_usage)"""
+        return schema.memory_usage(self)
+
+    @property
+    def rollups(self):
+        if getattr(self, '_rollups', None) is None:
+            self._rollups = Rollups.build(self.frentes, self.semanas)
+        return self._rollups
+
+    def update_rollups(self, anterior, chaves):
+        """Deriva os agregados de 'anterior', recalculando só a contribuição das frentes 'chaves'
+
+        Com poucos fatos semanais os agregados ficam para a próxima consulta (rollups), que os remonta.
+        """
+        base = getattr(anterior, '_rollups', None)
+        if base is not None and (not chaves or len(self.semanas) >= ROLLUP_DELTA_MIN_ROWS):
+            self._rollups = base.update(anterior, self, chaves)
+        return self
+
+    # --- Registro de alterações pendentes de gravação ---
+    def has_changes(self):
+        return bool(self.alteradas or self.inseridas or self.excluidas)
+
+    def mark_inserted(self, chave):
+        if chave in self.excluidas:
+            # Excluída e recriada com o mesmo nome: basta sobrescrever a linha existente
+            self.excluidas.discard(chave)
+            self.alteradas[chave] = chave
+        else:
+            self.inseridas.add(chave)
+
+    def mark_changed(self, chave, chave_anterior=None):
+        chave_anterior = chave_anterior or chave
+        if chave_anterior in self.inseridas:
+            self.inseridas.discard(chave_anterior)
+            self.inseridas.add(chave)
+            return
+        self.alteradas[chave] = self.alteradas.pop(chave_anterior, chave_anterior)
+
+    def mark_deleted(self, chave):
+        if chave in self.inseridas:
+            self.inseridas.discard(chave)
+            return
+        self.excluidas.add(self.alteradas.pop(chave, chave))
+
+    def mark_saved(self):
+        self.alteradas, self.inseridas, self.excluidas = {}, set(), set()
+        return self
@@ -0,0 +1,54 @@
+# -----------------------------------------------------------------------------
+# Arquivo: figure_cache.py (Cache LRU dos Gráficos e Tabelas)
+# -----------------------------------------------------------------------------
+# Guarda as saídas já montadas dos callbacks de visuais (gráficos, traços,
+# linhas da tabela), indexadas pela versão do dataset, pela saída e pelos
+# filtros que ela usa (obra, frente, escala de tempo). Voltar a uma obra ou
+# escala já exibida custa só a consulta ao cache.
+#
+# Como a versão faz parte da chave, qualquer alteração nos dados (que sempre
+# gera um novo Dataset) invalida naturalmente as entradas antigas, que saem
+# pela evicção LRU. As entradas são por processo e ficam apenas em memória.
+import os
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.environ.get('FIGURE_CACHE_ENTRIES', 64))
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def get_or_build(chave, builder):
+    """Retorna o resultado guardado para 'chave' ou executa builder() e guarda o resultado.
+
+    Sem versão na chave (chave[0] None) o resultado não é guardado. O objeto
+    devolvido é compartilhado: não o modifique.
+    """
+    if MAX_ENTRIES <= 0 or chave[0] is None:
+        return builder()
+    with _lock:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            _stats['hits'] += 1
+            return _cache[chave]
+        _stats['misses'] += 1
+    resultado = builder()
+    with _lock:
+        _cache[chave] = resultado
+        _cache.move_to_end(chave)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+            _stats['evictions'] += 1
+    return resultado
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+def stats():
+    with _lock:
+        return dict(_stats, entries=len(_cache))
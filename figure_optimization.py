@@ -0,0 +1,126 @@
+# -----------------------------------------------------------------------------
+# Arquivo: figure_optimization.py (Redução dos Traços Enviados ao Navegador)
+# -----------------------------------------------------------------------------
+# Os gráficos de performance crescem com o tamanho da obra: a Curva S tem um
+# ponto por semana em cada série (obras de vários anos passam de mil pontos)
+# e as barras de performance têm uma barra por frente. Cada ponto vai no JSON
+# do callback e é desenhado pelo navegador. Antes de sair do servidor, os
+# traços passam por optimize_traces():
+#   - linhas acima de FIGURE_MAX_POINTS pontos são reduzidas com LTTB
+#     (Largest-Triangle-Three-Buckets), que mantém os pontos que definem a
+#     forma da curva, incluindo o primeiro e o último
+#   - linhas que continuam acima de FIGURE_WEBGL_POINTS (ex.: com a redução
+#     desligada) viram Scattergl, desenhadas pela placa de vídeo
+#   - valores float são arredondados para FIGURE_DECIMALS casas, e datas à
+#     meia-noite vão como 'AAAA-MM-DD': o JSON não leva 1234.5600000000002
+#     nem horários vazios
+# top_n_with_others() limita as barras por frente a PERFORMANCE_MAX_BARS,
+# agrupando o restante em uma barra "Outras".
+#
+# Quando FIGURE_MAX_POINTS é 0 a redução fica desligada, e FIGURE_DECIMALS
+# negativo mantém os valores sem arredondar.
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+FIGURE_MAX_POINTS = int(os.environ.get('FIGURE_MAX_POINTS', 400))
+FIGURE_WEBGL_POINTS = int(os.environ.get('FIGURE_WEBGL_POINTS', 1000))
+FIGURE_DECIMALS = int(os.environ.get('FIGURE_DECIMALS', 2))
+PERFORMANCE_MAX_BARS = int(os.environ.get('PERFORMANCE_MAX_BARS', 40))
+
+
+def lttb(x, y, limite):
+    """Índices dos pontos mantidos ao reduzir (x, y) a 'limite' pontos com LTTB"""
+    n = len(y)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    indices = np.empty(limite, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    # O primeiro e o último ficam fixos; os demais são divididos em limite - 2 grupos
+    bordas = (np.arange(limite - 1) * (n - 2) / (limite - 2)).astype(np.int64) + 1
+    bordas[-1] = n - 1
+    anterior = 0
+    for i in range(limite - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        # Média do grupo seguinte (o último ponto, no caso do último grupo)
+        proximo = slice(fim, bordas[i + 2]) if i + 2 < len(bordas) else slice(n - 1, n)
+        media_x, media_y = x[proximo].mean(), y[proximo].mean()
+        # Mantém o ponto do grupo que forma o maior triângulo com o anterior e a média seguinte
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+    return indices
+
+
+def _numeric_x(x, n):
+    """Eixo x como números para o LTTB: datas e números pelo valor, categorias pela posição"""
+    valores = np.asarray(x) if x is not None else None
+    if valores is None or len(valores) != n:
+        return np.arange(n, dtype='float64')
+    if np.issubdtype(valores.dtype, np.datetime64):
+        return valores.astype('datetime64[s]').astype('float64')
+    if np.issubdtype(valores.dtype, np.number):
+        return valores.astype('float64')
+    return np.arange(n, dtype='float64')
+
+
+def _compact(valores):
+    """Arredonda floats e troca datas à meia-noite por 'AAAA-MM-DD'; outros valores passam como estão"""
+    if valores is None or isinstance(valores, str):
+        return valores
+    array = np.asarray(valores)
+    if np.issubdtype(array.dtype, np.floating) and FIGURE_DECIMALS >= 0:
+        return array.round(FIGURE_DECIMALS)
+    if np.issubdtype(array.dtype, np.datetime64):
+        datas = pd.DatetimeIndex(array)
+        if (datas.dropna() == datas.dropna().normalize()).all():
+            return np.asarray(datas.strftime('%Y-%m-%d'), dtype=object)
+    return valores
+
+
+def optimize_trace(trace):
+    """Novo traço com os pontos reduzidos e compactados (o próprio traço se não for linha ou barra)"""
+    if trace.type not in ('scatter', 'scattergl', 'bar'):
+        return trace
+    classe, x, y = type(trace), trace.x, trace.y
+    if trace.type != 'bar' and y is not None:
+        n = len(y)
+        valores_y = np.asarray(y)
+        # Com lacunas (NaN) ou valores não numéricos a linha fica inteira
+        if 0 < FIGURE_MAX_POINTS < n and valores_y.dtype.kind in 'iuf' and np.isfinite(valores_y).all():
+            indices = lttb(_numeric_x(x, n), valores_y, FIGURE_MAX_POINTS)
+            x = np.asarray(x)[indices] if x is not None else indices
+            y = valores_y[indices]
+            n = len(indices)
+        if trace.type == 'scatter' and n > FIGURE_WEBGL_POINTS:
+            classe = go.Scattergl
+    dados = trace.to_plotly_json()
+    dados.pop('type', None)
+    dados.update(x=_compact(x), y=_compact(y))
+    return classe({k: v for k, v in dados.items() if v is not None})
+
+
+def optimize_traces(traces):
+    """Lista de traços pronta para enviar ao navegador (reduzida, arredondada, WebGL se grande)"""
+    return [optimize_trace(trace) for trace in traces]
+
+
+def top_n_with_others(df, coluna_valor, coluna_rotulo, limite=None):
+    """As 'limite' - 1 linhas de menor 'coluna_valor' mais uma linha "Outras" com a média das demais.
+
+    Nas barras de performance as frentes mais atrasadas são as que pedem
+    atenção; as adiantadas ficam resumidas na barra "Outras (N frentes)".
+    """
+    limite = PERFORMANCE_MAX_BARS if limite is None else limite
+    if limite <= 1 or len(df) <= limite:
+        return df
+    ordenado = df.sort_values(coluna_valor, kind='stable')
+    mantidas, demais = ordenado.iloc[:limite - 1], ordenado.iloc[limite - 1:]
+    outras = pd.DataFrame({coluna_rotulo: [f'Outras ({len(demais)} frentes)'],
+                           coluna_valor: [demais[coluna_valor].mean()]})
+    return pd.concat([mantidas[[coluna_rotulo, coluna_valor]], outras], ignore_index=True)
@@ -0,0 +1,154 @@
+# -----------------------------------------------------------------------------
+# Arquivo: http_compression.py (Compressão e Revalidação das Respostas HTTP)
+# -----------------------------------------------------------------------------
+# As respostas do Dash (figuras, dados da tabela, o layout e o plotly.js) são
+# JSON/JavaScript muito repetitivos e saem do Flask sem compressão. Em campo,
+# com conexão 3G, isso significa esperar por vários MB. Aqui, no próprio
+# servidor (sem depender de proxy ou do flask-compress):
+#   - compressão brotli (com o pacote opcional 'brotli') ou gzip, conforme o
+#     Accept-Encoding do navegador, das respostas de texto acima de
+#     COMPRESSION_MIN_BYTES: callbacks (_dash-update-component), layout,
+#     dependências, página inicial e arquivos estáticos
+#   - ETag pelo conteúdo (hash) nas respostas GET: layout, dependências,
+#     página e arquivos estáticos. Quando nada mudou, o navegador recebe um
+#     304 sem corpo. A ETag não depende da data dos arquivos, então continua
+#     valendo após um novo deploy com o mesmo conteúdo.
+#
+# Os arquivos estáticos (assets/ e os pacotes JavaScript dos componentes) são
+# comprimidos uma única vez, no nível máximo, e ficam guardados em memória;
+# as respostas dinâmicas usam um nível mais rápido. Os POSTs de callbacks não
+# podem ser revalidados pelo navegador, então só são comprimidos.
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get('HTTP_COMPRESSION', '1').lower() not in ('0', 'false', 'no')
+
+# Respostas menores que isso não compensam o custo de comprimir
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+
+# Níveis das respostas dinâmicas (a cada requisição) e dos arquivos estáticos (uma vez)
+GZIP_LEVEL, GZIP_STATIC_LEVEL = 6, 9
+BROTLI_QUALITY, BROTLI_STATIC_QUALITY = 5, 11
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'text/javascript', 'text/html', 'text/css', 'text/plain',
+    'image/svg+xml',
+}
+
+# Arquivos estáticos mantidos em memória, já com ETag e comprimidos
+MAX_STATIC_ENTRIES = 64
+
+# Rotas de arquivos estáticos (o conteúdo de cada URL não muda enquanto o processo roda)
+STATIC_PATHS = ('/_dash-component-suites/', '/assets/')
+
+_lock = threading.Lock()
+_static_cache = OrderedDict()
+
+
+def _encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings):
+    """Codificação a usar dado o Accept-Encoding do navegador (werkzeug MIMEAccept), ou None"""
+    aceitas = [e for e in _encodings() if accept_encodings[e] > 0]
+    return max(aceitas, key=lambda e: accept_encodings[e]) if aceitas else None
+
+
+def compress(dados, encoding, estatico=False):
+    if encoding == 'br':
+        return brotli.compress(dados, quality=BROTLI_STATIC_QUALITY if estatico else BROTLI_QUALITY)
+    # mtime=0: o mesmo conteúdo gera sempre os mesmos bytes
+    return gzip.compress(dados, compresslevel=GZIP_STATIC_LEVEL if estatico else GZIP_LEVEL, mtime=0)
+
+
+def content_etag(dados):
+    return hashlib.sha1(dados).hexdigest()
+
+
+class _StaticEntry:
+    def __init__(self, dados):
+        self.dados = dados
+        self.etag = content_etag(dados)
+        self.comprimidos = {}
+
+    def compressed(self, encoding):
+        if encoding not in self.comprimidos:
+            self.comprimidos[encoding] = compress(self.dados, encoding, estatico=True)
+        return self.comprimidos[encoding]
+
+
+def _static_entry(chave, response):
+    with _lock:
+        entrada = _static_cache.get(chave)
+        if entrada is not None:
+            _static_cache.move_to_end(chave)
+            return entrada
+    response.direct_passthrough = False  # send_file entrega o arquivo aos poucos: lê tudo
+    entrada = _StaticEntry(response.get_data())
+    with _lock:
+        _static_cache[chave] = entrada
+        while len(_static_cache) > MAX_STATIC_ENTRIES:
+            _static_cache.popitem(last=False)
+    return entrada
+
+
+def _not_modified(response, etag):
+    import flask
+    resposta = flask.Response(status=304)
+    resposta.set_etag(etag)
+    for cabecalho in ('Cache-Control', 'Expires', 'Vary'):
+        if cabecalho in response.headers:
+            resposta.headers[cabecalho] = response.headers[cabecalho]
+    return resposta
+
+
+def optimize_response(request, response):
+    """Aplica ETag/304 e compressão a uma resposta do Flask"""
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    comprimivel = response.mimetype in COMPRESSIBLE_MIMETYPES
+    revalidavel = request.method == 'GET'
+    estatico = revalidavel and any(caminho in request.path for caminho in STATIC_PATHS)
+    if (not comprimivel and not revalidavel) or (response.is_streamed and not estatico):
+        return response  # Gerada aos poucos (ex.: stream): não há corpo completo para comprimir
+
+    # A ETag original dos estáticos (data e tamanho do arquivo) entra na chave do cache
+    entrada = _static_entry((request.path, response.get_etag()[0]), response) if estatico else None
+    dados = entrada.dados if entrada is not None else response.get_data()
+
+    encoding = choose_encoding(request.accept_encodings) if comprimivel and len(dados) >= COMPRESSION_MIN_BYTES else None
+    if comprimivel:
+        response.vary.add('Accept-Encoding')
+    if revalidavel:
+        # A ETag muda com a codificação: o mesmo conteúdo comprimido é outra representação
+        etag = (entrada.etag if entrada is not None else content_etag(dados)) + (f'-{encoding}' if encoding else '')
+        if request.if_none_match.contains(etag):
+            return _not_modified(response, etag)
+        response.set_etag(etag)
+    if encoding:
+        response.set_data(entrada.compressed(encoding) if entrada is not None else compress(dados, encoding))
+        response.headers['Content-Encoding'] = encoding
+    elif entrada is not None and response.direct_passthrough:
+        response.direct_passthrough = False
+        response.set_data(dados)
+    return response
+
+
+def init_app(app):
+    """Registra a compressão e as ETags no servidor Flask do app (se ativado)"""
+    if not COMPRESSION_ENABLED:
+        return
+    import flask
+
+    @app.server.after_request
+    def compress_response(response):
+        return optimize_response(flask.request, response)
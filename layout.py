@@ -4,10 +4,44 @@
 from dash import dcc, html, dash_table
 import dash_bootstrap_components as dbc
 import pandas as pd
+import plotly.graph_objects as go
+
+from table_export import EXPORT_PATH
+
+PLOTLY_TEMPLATE = "plotly_white"
+TABELA_DETALHES_COLUNAS = ['Obra', 'Frente', 'Total', 'Data Início', 'Data Fim', 'Total (%)']
+
+# Figuras base dos gráficos atualizados por Patch (callbacks.py): o template e
+# a estrutura vão uma única vez com o layout; os callbacks trocam só os traços.
+# Criá-las carrega os templates do plotly (o padrão e PLOTLY_TEMPLATE), a maior
+# parte do tempo de importação deste módulo, que os callbacks pagariam de
+# qualquer forma no primeiro gráfico; com "gunicorn --preload" isso acontece
+# uma vez, antes de criar os workers.
+BASE_FIGURE_PROGRESSO = go.Figure(layout={'xaxis': {'visible': False}, 'yaxis': {'visible': False}})
+BASE_FIGURE_EVOLUCAO = go.Figure(layout={'barmode': 'group', 'template': PLOTLY_TEMPLATE})
+
+# Grades semanais dos formulários (planejamento e andamento): uma tabela com
+# uma linha por semana no lugar de um campo por semana. A coluna 'Valor' é a
+# editável e aceita colar um bloco de células do Excel; cada linha leva
+# também a chave da semana ('Semana') e o valor lido ('Original'), para que
+# assets/clientside.js envie ao servidor apenas as células alteradas.
+WEEKLY_GRID_STYLE_TABLE = {'maxHeight': '55vh', 'overflowY': 'auto'}
+
+def weekly_grid(grid_id, nome_valor, com_planejado=False):
+    colunas = [{'name': 'Semana', 'id': 'Período', 'editable': False}]
+    if com_planejado:
+        colunas.append({'name': 'Planejado', 'id': 'Planejado', 'type': 'numeric', 'editable': False})
+    # Sem conversão no navegador: '1,5' colado do Excel chega como texto e é tratado em clientside.js
+    colunas.append({'name': nome_valor, 'id': 'Valor', 'type': 'numeric', 'editable': True, 'on_change': {'action': 'none'}})
+    return dash_table.DataTable(id=grid_id, columns=colunas, data=[], editable=True, page_action='none', style_table=WEEKLY_GRID_STYLE_TABLE, style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'}, style_cell={'textAlign': 'left', 'padding': '5px'}, style_data_conditional=[{'if': {'column_id': 'Valor'}, 'backgroundColor': '#fffdf5'}])
 
 def create_layout(app_instance):
     return dbc.Container([
         dbc.Row(dbc.Col(html.Div(html.H2("Dashboard de Obras com Planejamento", className="app-title"), className="app-header"), width=12), className="mb-4"),
+        # Aberto por callbacks.handle_callback_error quando a versão da sessão saiu do cache do servidor
+        dbc.Alert([html.Span("Sua sessão expirou no servidor e os dados desta página não estão mais disponíveis. "),
+                   html.A("Recarregue a página", href="", className="alert-link"), html.Span(" para continuar.")],
+                  id="session-expired-alert", color="warning", is_open=False),
         dbc.Card(dbc.CardBody([
             dbc.Row([
                 dbc.Col([
@@ -15,7 +49,15 @@ def create_layout(app_instance):
                     dbc.Button([html.I(className="fas fa-hard-hat me-2"), "Gerenciar Obras"], id="btn-abrir-modal-obras", color="success", className="me-2 mb-2"),
                     dbc.Button([html.I(className="fas fa-plus me-2"), "Adicionar Nova Frente"], id="btn-abrir-modal-nova-frente", color="primary", className="me-2 mb-2"),
                     dbc.Button([html.I(className="fas fa-save me-2"), "Salvar Dados no Servidor"], id="btn-persistir-dados", color="warning", className="me-2 mb-2"),
-                    html.Div(id="persistence-feedback-message", className="mt-2 small")
+                    # Andamento semanal em lote (CSV/XLSX), lido e validado no servidor (bulk_import.py)
+                    dcc.Upload(dbc.Button([html.I(className="fas fa-file-upload me-2"), "Importar Andamento (CSV/XLSX)"], color="secondary", outline=True, className="me-2 mb-2"), id="upload-andamento", accept=".csv,.xlsx", max_size=20 * 1024 * 1024, className="d-inline-block"),
+                    html.Div([
+                        dbc.Spinner(size="sm", spinner_class_name="me-2"),
+                        html.Span(id="persistence-progress-message"),
+                        dbc.Button("Cancelar", id="btn-cancelar-armazenamento", color="link", size="sm", className="ms-2 p-0")
+                    ], id="persistence-progress", className="mt-2 small align-items-center", style={'display': 'none'}),
+                    html.Div(id="persistence-feedback-message", className="mt-2 small"),
+                    html.Div(id="import-feedback-message", className="mt-2 small")
                 ], md=5, className="mb-3 mb-md-0 border-end"),
                 dbc.Col([
                     html.H5("Filtros de Visualização"),
@@ -36,10 +78,10 @@ def create_layout(app_instance):
         ]),
         dcc.Loading(id="loading-graphs", type="default", children=[
             dbc.Row([
-                dbc.Col(dbc.Card(dbc.CardBody(dcc.Graph(id='graph-progresso-frente', config={'responsive': True})), className="shadow-sm mb-4 h-100"), md=12, lg=4),
+                dbc.Col(dbc.Card(dbc.CardBody(dcc.Graph(id='graph-progresso-frente', figure=BASE_FIGURE_PROGRESSO, config={'responsive': True})), className="shadow-sm mb-4 h-100"), md=12, lg=4),
                 dbc.Col(dbc.Card(dbc.CardBody(dcc.Graph(id='graph-performance-frentes', config={'responsive': True})), className="shadow-sm mb-4 h-100"), md=12, lg=8)
             ]),
-            dbc.Row([dbc.Col(dbc.Card(dbc.CardBody(dcc.Graph(id='graph-evolucao-tempo', config={'responsive': True})), className="shadow-sm mb-4"), md=12)]),
+            dbc.Row([dbc.Col(dbc.Card(dbc.CardBody(dcc.Graph(id='graph-evolucao-tempo', figure=BASE_FIGURE_EVOLUCAO, config={'responsive': True})), className="shadow-sm mb-4"), md=12)]),
             dbc.Row([dbc.Col(dbc.Button([html.I(className="fas fa-table me-2"), "Ver Detalhes e Lançar Andamento"], id="btn-abrir-detalhes-modal", color="secondary", className="w-100 mt-3"), width={"size": 6, "offset": 3})], className="mb-4")
         ]),
         html.Footer(dbc.Container(dbc.Row(dbc.Col(html.P(f"© {pd.Timestamp.now().year} Dashboard de Obras com Planejamento", className="text-center text-muted small"), width=12)), fluid=True, className="footer-custom")),
@@ -49,6 +91,8 @@ def create_layout(app_instance):
         dcc.Store(id='active-timescale-store', data='mensal'),
         dcc.Store(id='selected-row-index-store'),
         dcc.Store(id='edit-mode-store', data={'mode': 'add', 'identifier': None}),
+        dcc.Store(id='grade-planejamento-alteracoes'),
+        dcc.Store(id='grade-realizado-alteracoes'),
         dbc.Modal([
             dbc.ModalHeader(dbc.ModalTitle("Adicionar Nova Frente de Serviço", id="modal-nova-frente-title")),
             dbc.ModalBody([
@@ -63,25 +107,30 @@ def create_layout(app_instance):
                         dbc.Col([dbc.Label("Data de Início:", html_for="form-data-inicio"), dcc.DatePickerSingle(id='form-data-inicio', display_format='DD/MM/YYYY', className="w-100")]),
                         dbc.Col([dbc.Label("Data de Fim:", html_for="form-data-fim"), dcc.DatePickerSingle(id='form-data-fim', display_format='DD/MM/YYYY', className="w-100")])
                     ], className="mb-3"),
-                    html.Div(id='weekly-planning-container', className="mt-3")
+                    html.Div([
+                        html.Hr(), html.H5("Planejamento Semanal (Opcional)"), html.P("Deixe em branco para um planejamento linear.", className="small text-muted"),
+                        weekly_grid('grade-planejamento', "Planejado")
+                    ], id='weekly-planning-container', className="mt-3", style={'display': 'none'})
                 ])
             ]),
             dbc.ModalFooter([dbc.Button("Cancelar", id="btn-cancelar-nova-frente", color="secondary"), dbc.Button("Salvar", id="btn-salvar-nova-frente", color="primary")])
         ], id="modal-nova-frente", is_open=False, size="lg", centered=True, scrollable=True),
         dbc.Modal([
             dbc.ModalHeader(dbc.ModalTitle(id="modal-realizado-header")),
-            dbc.ModalBody(id="modal-realizado-body"), 
+            dbc.ModalBody([html.Div(id="modal-realizado-body"), weekly_grid('grade-realizado', "Realizado", com_planejado=True)]),
             dbc.ModalFooter([dbc.Button("Cancelar", id="btn-cancelar-realizado", color="secondary"), dbc.Button("Salvar Andamento", id="btn-salvar-realizado", color="success")])
         ], id="modal-preencher-realizado", is_open=False, size="lg", centered=True, scrollable=True),
         dbc.Modal([
             dbc.ModalHeader(dbc.ModalTitle("Detalhes e Andamento das Frentes de Serviço")),
             dbc.ModalBody([
                 html.Div(id='table-save-feedback-message', className="mb-2"),
-                dash_table.DataTable(id='tabela-detalhes-frentes', columns=[], data=[], editable=False, page_size=10, row_selectable='single', style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'}, style_cell={'textAlign': 'left', 'padding': '5px'}, sort_action="native", filter_action="native", export_format="xlsx", export_headers="display"),
+                dash_table.DataTable(id='tabela-detalhes-frentes', columns=[{"name": i, "id": i} for i in TABELA_DETALHES_COLUNAS], data=[], style_data_conditional=[{'if': {'column_id': 'Total (%)', 'filter_query': '{Total (%)} >= 99.9'}, 'backgroundColor': '#d4edda'}], editable=False, page_current=0, page_size=10, page_count=1, page_action="custom", row_selectable='single', style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'}, style_cell={'textAlign': 'left', 'padding': '5px'}, sort_action="custom", sort_mode="single", sort_by=[], filter_action="custom", filter_query=''),
                 html.Div([
                     dbc.Button([html.I(className="fas fa-pencil-alt me-2"), "Lançar Andamento"], id="btn-abrir-realizado-modal", color="success", className="mt-3", style={'display': 'none'}),
                     dbc.Button([html.I(className="fas fa-edit me-2"), "Editar Frente"], id="btn-abrir-editar-modal", color="info", className="mt-3 ms-2", style={'display': 'none'}),
                     dbc.Button([html.I(className="fas fa-trash-alt me-2"), "Excluir Frente"], id="btn-abrir-excluir-modal", color="danger", className="mt-3 ms-2", style={'display': 'none'}),
+                    # Link para a rota de exportação (table_export.py); a query string com os filtros é montada no navegador
+                    dbc.Button([html.I(className="fas fa-file-excel me-2"), "Exportar Excel"], id="btn-exportar-tabela", href=app_instance.get_relative_path(EXPORT_PATH), external_link=True, download="frentes.xlsx", color="secondary", outline=True, className="mt-3 ms-auto"),
                 ], className="d-flex")
             ]),
             dbc.ModalFooter(dbc.Button("Fechar", id="btn-fechar-detalhes-modal", className="ms-auto"))
@@ -0,0 +1,74 @@
+# -----------------------------------------------------------------------------
+# Arquivo: linear_plan.py (Distribuição Linear do Planejamento por Período)
+# -----------------------------------------------------------------------------
+# Frentes sem planejamento semanal distribuem o Total igualmente entre os dias
+# de [Data Início, Data Fim]. Em vez de gerar um ponto por dia e reagrupar com
+# resample, a parte de cada período (semana W-MON ou mês ME) é calculada
+# direto pela sobreposição do intervalo com o período:
+#     parte = Total / dias do intervalo * dias do intervalo dentro do período
+# Todas as frentes são processadas de uma vez, com arrays do numpy.
+#
+# Os rótulos seguem o resample do pandas: a semana termina na segunda-feira
+# (a segunda-feira pertence à própria semana) e o mês é rotulado pelo último dia.
+import numpy as np
+import pandas as pd
+
+def _days(datas):
+    if not pd.api.types.is_datetime64_any_dtype(datas):
+        datas = pd.to_datetime(datas)
+    return pd.DatetimeIndex(datas).to_numpy().astype('datetime64[D]')
+
+
+def _labels(dias, escala):
+    if escala == 'mensal':
+        return (dias.astype('datetime64[M]') + np.timedelta64(1, 'M')).astype('datetime64[D]') - np.timedelta64(1, 'D')
+    # 1970-01-01 foi uma quinta-feira: (dias + 3) % 7 é o dia da semana com segunda = 0
+    return dias + (7 - (dias.astype('int64') + 3) % 7) % 7
+
+
+def period_labels(datas, escala):
+    """Rótulo do período de cada data, como em resample(freq): segunda-feira seguinte (W-MON) ou fim do mês (ME)"""
+    return pd.DatetimeIndex(_labels(_days(datas), escala).astype('datetime64[ns]'))
+
+
+def allocate(inicio, fim, total, escala):
+    """Parte do Total de cada intervalo em cada período que ele toca.
+
+    inicio/fim/total: sequências alinhadas (uma posição por frente). Intervalos
+    sem datas ou com fim antes do início são ignorados. Retorna
+    (posicao, periodo, valor, dias): a posição da frente na entrada, o rótulo
+    do período (DatetimeIndex), a parte do Total e quantos dias do intervalo
+    caem no período. Os períodos de cada frente saem contíguos e em ordem.
+    """
+    inicio, fim = _days(inicio), _days(fim)
+    total = np.asarray(total, dtype='float64')
+    validas = ~np.isnat(inicio) & ~np.isnat(fim)
+    validas[validas] = fim[validas] >= inicio[validas]
+    inicio, fim, total = inicio[validas], fim[validas], total[validas]
+    duracao = (fim - inicio).astype('int64') + 1
+
+    primeiro, ultimo = _labels(inicio, escala), _labels(fim, escala)
+    if escala == 'mensal':
+        quantidade = (ultimo.astype('datetime64[M]') - primeiro.astype('datetime64[M]')).astype('int64') + 1
+    else:
+        quantidade = (ultimo - primeiro).astype('int64') // 7 + 1
+
+    frente = np.repeat(np.arange(len(inicio)), quantidade)
+    ordem = np.arange(len(frente)) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+    if escala == 'mensal':
+        mes = primeiro.astype('datetime64[M]')[frente] + ordem
+        abertura = mes.astype('datetime64[D]')
+        periodo = (mes + np.timedelta64(1, 'M')).astype('datetime64[D]') - np.timedelta64(1, 'D')
+    else:
+        periodo = primeiro[frente] + 7 * ordem
+        abertura = periodo - 6
+    dias = (np.minimum(fim[frente], periodo) - np.maximum(inicio[frente], abertura)).astype('int64') + 1
+    valor = total[frente] / duracao[frente] * dias
+    return np.flatnonzero(validas)[frente], pd.DatetimeIndex(periodo.astype('datetime64[ns]')), valor, dias
+
+
+def plan_series(inicio, fim, total, escala='semanal'):
+    """Planejamento linear de uma frente por período, igual a
+    pd.Series(total / n, index=pd.date_range(inicio, fim)).resample(freq).sum()"""
+    _, periodo, valor, _ = allocate([inicio], [fim], [total], escala)
+    return pd.Series(valor, index=periodo)
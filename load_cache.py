@@ -0,0 +1,183 @@
+# -----------------------------------------------------------------------------
+# Arquivo: load_cache.py (Cache Compartilhado da Carga Inicial)
+# -----------------------------------------------------------------------------
+# Cada abertura do dashboard dispara load_initial_data. Em vez de baixar a base
+# inteira a cada acesso, o último portfólio carregado fica num arquivo local
+# compartilhado entre os workers do Gunicorn:
+#   - até LOAD_CACHE_TTL_SECONDS: servido direto do cache (hit)
+#   - até TTL + LOAD_CACHE_STALE_SECONDS: servido o dado antigo enquanto uma
+#     thread recarrega a base em segundo plano (stale-while-revalidate)
+#   - depois disso, ou sem cache: carga síncrona (miss)
+# Uma gravação chama invalidate(), que descarta o cache de todos os workers.
+import hashlib
+import os
+import threading
+import time
+
+from data_store import CACHE_DIR, DISK_SUFFIX, cache_dir_is_private, ensure_cache_dir
+from serialization import decode_dataset, encode_dataset
+
+LOAD_CACHE_TTL_SECONDS = float(os.environ.get('LOAD_CACHE_TTL_SECONDS', 60))
+LOAD_CACHE_STALE_SECONDS = float(os.environ.get('LOAD_CACHE_STALE_SECONDS', 10 * 60))
+
+# Uma recarga em segundo plano que não terminou nesse prazo é considerada abandonada
+REFRESH_LOCK_TIMEOUT_SECONDS = 5 * 60
+
+_lock = threading.Lock()
+_memory = {}  # nome -> (mtime do arquivo, dataset)
+_stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0, 'invalidations': 0}
+
+
+def _paths(nome):
+    base = os.path.join(CACHE_DIR, f"load-{hashlib.sha1(nome.encode('utf-8')).hexdigest()[:16]}")
+    return f"{base}{DISK_SUFFIX}", f"{base}.refresh.lock", f"{base}.invalidated"
+
+
+def _count(evento):
+    with _lock:
+        _stats[evento] += 1
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _read(nome):
+    """Retorna (momento da carga, dataset) do cache compartilhado, ou (None, None)"""
+    path, _, _ = _paths(nome)
+    mtime = _mtime(path)
+    if mtime is None:
+        return None, None
+    with _lock:
+        memoria = _memory.get(nome)
+    if memoria is not None and memoria[0] == mtime:
+        return mtime, memoria[1]
+    try:
+        with open(path, 'rb') as f:
+            dataset = decode_dataset(f.read(), permitir_pickle=cache_dir_is_private())
+    except (OSError, ValueError):
+        return None, None
+    with _lock:
+        _memory[nome] = (mtime, dataset)
+    return mtime, dataset
+
+
+def _write(nome, dataset, iniciado_em):
+    """Grava o resultado de uma carga, a menos que a base tenha sido alterada durante ela"""
+    path, _, invalidated_path = _paths(nome)
+    invalidado_em = _mtime(invalidated_path)
+    if invalidado_em is not None and invalidado_em >= iniciado_em:
+        return
+    try:
+        ensure_cache_dir()
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(encode_dataset(dataset))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Aviso: não foi possível gravar o cache da carga inicial: {e}")
+
+
+def _acquire_refresh_lock(lock_path):
+    """Garante que apenas um worker recarregue a base por vez"""
+    try:
+        ensure_cache_dir()
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        criado_em = _mtime(lock_path)
+        if criado_em is not None and time.time() - criado_em > REFRESH_LOCK_TIMEOUT_SECONDS:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+        return False
+    except OSError:
+        return False
+
+
+def _refresh_in_background(nome, loader):
+    _, lock_path, _ = _paths(nome)
+    if not _acquire_refresh_lock(lock_path):
+        return
+
+    def recarregar():
+        try:
+            iniciado_em = time.time()
+            _write(nome, loader(), iniciado_em)
+            _count('refreshes')
+        except Exception as e:
+            _count('refresh_errors')
+            print(f"Aviso: falha ao recarregar a base em segundo plano: {e}")
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    threading.Thread(target=recarregar, name='load-cache-refresh', daemon=True).start()
+
+
+def get_or_load(nome, loader, background_refresh=True):
+    """Retorna o dataset carregado por loader(), usando o cache compartilhado.
+
+    'nome' identifica a origem dos dados (ex.: a descrição do backend). O objeto
+    devolvido é compartilhado: faça uma cópia antes de modificá-lo.
+    Com background_refresh=False (quem chama já roda fora da requisição, num
+    processo que pode ser encerrado a qualquer momento) uma entrada vencida é
+    recarregada na hora, e o dado antigo só é usado se a recarga falhar.
+    """
+    if LOAD_CACHE_TTL_SECONDS <= 0:
+        _count('misses')
+        return loader()
+    carregado_em, dataset = _read(nome)
+    anterior = None
+    if dataset is not None:
+        idade = time.time() - carregado_em
+        if idade < LOAD_CACHE_TTL_SECONDS:
+            _count('hits')
+            return dataset
+        if idade < LOAD_CACHE_TTL_SECONDS + LOAD_CACHE_STALE_SECONDS:
+            if background_refresh:
+                _count('stale_hits')
+                _refresh_in_background(nome, loader)
+                return dataset
+            anterior = dataset
+    _count('misses')
+    iniciado_em = time.time()
+    try:
+        dataset = loader()
+    except Exception as e:
+        if anterior is None:
+            raise
+        _count('refresh_errors')
+        print(f"Aviso: falha ao recarregar a base, usando os dados em cache: {e}")
+        return anterior
+    _write(nome, dataset, iniciado_em)
+    return dataset
+
+
+def invalidate(nome):
+    """Descarta o cache (em todos os workers) após uma gravação na base"""
+    path, _, invalidated_path = _paths(nome)
+    try:
+        ensure_cache_dir()
+        with open(invalidated_path, 'a'):
+            pass
+        os.utime(invalidated_path)
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        print(f"Aviso: não foi possível invalidar o cache da carga inicial: {e}")
+    with _lock:
+        _memory.pop(nome, None)
+    _count('invalidations')
+
+
+def stats():
+    """Contadores deste processo: hits, stale_hits, misses, refreshes, refresh_errors, invalidations"""
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,269 @@
+# -----------------------------------------------------------------------------
+# Arquivo: metrics.py (Instrumentação dos Callbacks e Rota /metrics)
+# -----------------------------------------------------------------------------
+# Opcional: ativado com METRICS_ENABLED=1. Registra, por callback:
+#   - latência total (histograma)
+#   - bytes da requisição e da resposta de /_dash-update-component
+#   - tempo por fase: 'deserialize' (resolver o dataset do token), 'figure'
+#     (montagem dos gráficos), 'serialize' (guardar o novo dataset) e
+#     'compute' (o restante)
+#   - chamadas à API do Google Sheets (quantidade e duração por método)
+# e expõe tudo em texto no formato Prometheus na rota /metrics do Flask.
+# Com METRICS_SLOW_CALLBACK_MS > 0, callbacks mais lentos que o limite são
+# registrados no log com o detalhamento por fase.
+#
+# Os valores são por processo: com vários workers do Gunicorn, cada coleta
+# de /metrics enxerga apenas o worker que atendeu a requisição.
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+METRICS_PATH = os.environ.get('METRICS_PATH', '/metrics')
+SLOW_CALLBACK_MS = float(os.environ.get('METRICS_SLOW_CALLBACK_MS', 0))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CALLBACK_PHASES = ('deserialize', 'compute', 'figure', 'serialize')
+
+_lock = threading.Lock()
+_current_phases = contextvars.ContextVar('metrics_callback_phases', default=None)
+
+
+def _escape(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(nomes, valores, extra=()):
+    pares = list(zip(nomes, valores)) + list(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escape(valor)}"' for nome, valor in pares) + '}'
+
+
+class Counter:
+    def __init__(self, nome, descricao, labels=()):
+        self.nome, self.descricao, self.labels = nome, descricao, tuple(labels)
+        self._valores = {}
+
+    def inc(self, *labels, valor=1):
+        with _lock:
+            self._valores[labels] = self._valores.get(labels, 0) + valor
+
+    def render(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} counter"]
+        with _lock:
+            itens = sorted(self._valores.items())
+        linhas += [f"{self.nome}{_format_labels(self.labels, chave)} {valor:g}" for chave, valor in itens]
+        return linhas
+
+
+class Histogram:
+    def __init__(self, nome, descricao, labels=(), buckets=LATENCY_BUCKETS):
+        self.nome, self.descricao, self.labels, self.buckets = nome, descricao, tuple(labels), tuple(buckets)
+        self._valores = {}  # labels -> [contagem por bucket..., soma, contagem]
+
+    def observe(self, *labels, valor):
+        with _lock:
+            serie = self._valores.get(labels)
+            if serie is None:
+                serie = self._valores[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def render(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with _lock:
+            itens = sorted((chave, list(serie)) for chave, serie in self._valores.items())
+        for chave, serie in itens:
+            for limite, contagem in zip(self.buckets, serie):
+                linhas.append(f"{self.nome}_bucket{_format_labels(self.labels, chave, [('le', f'{limite:g}')])} {contagem}")
+            linhas.append(f"{self.nome}_bucket{_format_labels(self.labels, chave, [('le', '+Inf')])} {serie[-1]}")
+            linhas.append(f"{self.nome}_sum{_format_labels(self.labels, chave)} {serie[-2]:.6f}")
+            linhas.append(f"{self.nome}_count{_format_labels(self.labels, chave)} {serie[-1]}")
+        return linhas
+
+
+CALLBACK_DURATION = Histogram('dashboard_callback_duration_seconds', 'Duração total de cada callback.', ['callback'])
+CALLBACK_PHASE = Histogram('dashboard_callback_phase_seconds', 'Duração de cada fase do callback.', ['callback', 'phase'])
+CALLBACK_ERRORS = Counter('dashboard_callback_errors_total', 'Callbacks que terminaram com exceção.', ['callback'])
+CALLBACK_REQUEST_BYTES = Histogram('dashboard_callback_request_bytes', 'Tamanho do corpo da requisição do callback.', ['callback'], BYTES_BUCKETS)
+CALLBACK_RESPONSE_BYTES = Histogram('dashboard_callback_response_bytes', 'Tamanho da resposta JSON do callback.', ['callback'], BYTES_BUCKETS)
+SHEETS_CALLS = Counter('dashboard_sheets_api_calls_total', 'Chamadas à API do Google Sheets.', ['method', 'status'])
+SHEETS_DURATION = Histogram('dashboard_sheets_api_duration_seconds', 'Duração das chamadas à API do Google Sheets.', ['method'])
+
+REGISTRY = [CALLBACK_DURATION, CALLBACK_PHASE, CALLBACK_ERRORS, CALLBACK_REQUEST_BYTES, CALLBACK_RESPONSE_BYTES, SHEETS_CALLS, SHEETS_DURATION]
+
+
+@contextmanager
+def phase(nome):
+    """Atribui o tempo do bloco a uma fase do callback em execução (sem efeito fora dele)"""
+    fases = _current_phases.get()
+    if fases is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        fases[nome] = fases.get(nome, 0.0) + time.perf_counter() - inicio
+
+
+def timed_phase(nome):
+    """Versão em decorator de phase()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(nome):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _instrument_callback(func):
+    nome = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        fases = {}
+        token = _current_phases.set(fases)
+        inicio = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            CALLBACK_ERRORS.inc(nome)
+            raise
+        finally:
+            duracao = time.perf_counter() - inicio
+            _current_phases.reset(token)
+            fases['compute'] = max(duracao - sum(fases.values()), 0.0)
+            CALLBACK_DURATION.observe(nome, valor=duracao)
+            for fase, segundos in fases.items():
+                CALLBACK_PHASE.observe(nome, fase, valor=segundos)
+            _tag_request(nome)
+            if SLOW_CALLBACK_MS > 0 and duracao * 1000 >= SLOW_CALLBACK_MS:
+                detalhes = ', '.join(f"{f}={fases[f] * 1000:.0f}ms" for f in CALLBACK_PHASES if f in fases)
+                print(f"Aviso: callback lento '{nome}': {duracao * 1000:.0f}ms ({detalhes})")
+
+    return wrapper
+
+
+def _tag_request(nome):
+    # Associa a requisição HTTP ao callback, para medir os bytes em after_request
+    import flask
+    if flask.has_request_context():
+        flask.g.dashboard_callback = nome
+
+
+class InstrumentedApp:
+    """Repassa tudo ao app Dash, mas envolve cada função registrada com app.callback"""
+
+    def __init__(self, app):
+        self._app = app
+
+    def callback(self, *args, **kwargs):
+        registrar = self._app.callback(*args, **kwargs)
+
+        def decorator(func):
+            return registrar(_instrument_callback(func))
+        return decorator
+
+    def __getattr__(self, nome):
+        return getattr(self._app, nome)
+
+
+def instrument(app):
+    """App a ser passado para register_callbacks (o próprio app se as métricas estiverem desligadas)"""
+    return InstrumentedApp(app) if METRICS_ENABLED else app
+
+
+class InstrumentedWorksheet:
+    """Envolve um gspread.Worksheet contando e cronometrando as chamadas à API"""
+
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._worksheet, nome)
+        if not callable(atributo):
+            return atributo
+
+        @functools.wraps(atributo)
+        def wrapper(*args, **kwargs):
+            with observe_sheets_call(nome):
+                return atributo(*args, **kwargs)
+        return wrapper
+
+
+@contextmanager
+def observe_sheets_call(metodo):
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        SHEETS_CALLS.inc(metodo, 'error')
+        raise
+    else:
+        SHEETS_CALLS.inc(metodo, 'ok')
+    finally:
+        SHEETS_DURATION.observe(metodo, valor=time.perf_counter() - inicio)
+
+
+def instrument_worksheet(worksheet):
+    return InstrumentedWorksheet(worksheet) if METRICS_ENABLED else worksheet
+
+
+def render():
+    """Todas as métricas no formato de texto do Prometheus"""
+    import data_store
+    import figure_cache
+    import load_cache
+    linhas = []
+    for metrica in REGISTRY:
+        linhas += metrica.render()
+    linhas += ['# HELP dashboard_load_cache_events_total Eventos do cache da carga inicial.',
+               '# TYPE dashboard_load_cache_events_total counter']
+    linhas += [f'dashboard_load_cache_events_total{{event="{evento}"}} {valor}' for evento, valor in sorted(load_cache.stats().items())]
+    linhas += ['# HELP dashboard_figure_cache_events_total Eventos do cache de gráficos.',
+               '# TYPE dashboard_figure_cache_events_total counter']
+    cache_figuras = figure_cache.stats()
+    linhas += [f'dashboard_figure_cache_events_total{{event="{evento}"}} {cache_figuras[evento]}' for evento in ('evictions', 'hits', 'misses')]
+    linhas += ['# HELP dashboard_figure_cache_entries Entradas no cache de gráficos.',
+               '# TYPE dashboard_figure_cache_entries gauge',
+               f"dashboard_figure_cache_entries {cache_figuras['entries']}"]
+    uso, entradas = data_store.memory_report()
+    linhas += ['# HELP dashboard_dataset_cache_bytes Memória dos datasets guardados no worker, por tabela.',
+               '# TYPE dashboard_dataset_cache_bytes gauge']
+    linhas += [f'dashboard_dataset_cache_bytes{{table="{tabela}"}} {valor}' for tabela, valor in sorted(uso.items())]
+    linhas += ['# HELP dashboard_dataset_cache_entries Versões de dataset guardadas em memória no worker.',
+               '# TYPE dashboard_dataset_cache_entries gauge',
+               f"dashboard_dataset_cache_entries {entradas}"]
+    return '\n'.join(linhas) + '\n'
+
+
+def init_app(app):
+    """Registra a rota /metrics e a medição de bytes no servidor Flask (se ativado)"""
+    if not METRICS_ENABLED:
+        return
+    import flask
+    server = app.server
+
+    @server.after_request
+    def record_payload_bytes(response):
+        nome = flask.g.pop('dashboard_callback', None)
+        if nome is not None:
+            CALLBACK_REQUEST_BYTES.observe(nome, valor=flask.request.content_length or 0)
+            if not response.direct_passthrough:
+                CALLBACK_RESPONSE_BYTES.observe(nome, valor=response.calculate_content_length() or len(response.get_data()))
+        return response
+
+    @server.route(METRICS_PATH)
+    def metrics_endpoint():
+        return flask.Response(render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
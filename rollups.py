@@ -0,0 +1,168 @@
+# -----------------------------------------------------------------------------
+# Arquivo: rollups.py (Agregados Semanais/Mensais Materializados)
+# -----------------------------------------------------------------------------
+# O gráfico de evolução soma o previsto e o realizado de todas as frentes
+# filtradas por semana (W-MON) ou por mês (ME). Em vez de reagregar a tabela
+# de fatos a cada renderização, o Dataset mantém estes agregados prontos:
+#   - por obra x período (semanal e mensal)
+#   - total do portfólio x período
+# Cada período guarda a soma e a quantidade de lançamentos que contribuíram
+# ('n_*'): é a quantidade que decide se o período aparece no gráfico, como
+# acontecia com o resample, e evita resíduos de ponto flutuante ao subtrair.
+#
+# Nas gravações, apenas a contribuição das frentes afetadas é subtraída (a
+# partir do dataset anterior) e somada de novo (a partir do novo dataset).
+# Essa troca tem um custo fixo (~30 ms) que só compensa em tabelas grandes:
+# abaixo de ROLLUP_DELTA_MIN_ROWS fatos semanais os agregados são descartados
+# na gravação e remontados inteiros quando um gráfico os consultar.
+import os
+
+import numpy as np
+import pandas as pd
+
+from linear_plan import allocate, period_labels
+from week_calendar import weeks_to_dates
+
+ROLLUP_FREQS = {'semanal': 'W-MON', 'mensal': 'ME'}
+
+# Tamanho da tabela de fatos a partir do qual a atualização incremental sai mais barata que remontar
+ROLLUP_DELTA_MIN_ROWS = int(os.environ.get('ROLLUP_DELTA_MIN_ROWS', 10000))
+
+
+def _frente_ids(df):
+    """Identificador textual de cada (Obra, Frente), para testes de pertinência vetorizados"""
+    return df['Obra'].astype(str) + '\x1f' + df['Frente'].astype(str)
+
+
+def _lancamentos(frentes, semanas, peso=1):
+    """Lançamentos (Obra, período) das frentes informadas, por escala, como o gráfico os soma.
+
+    Frentes com planejamento semanal (algum valor > 0) usam os próprios valores
+    na segunda-feira de cada semana; as demais, com Total e datas, distribuem o
+    Total igualmente entre os dias do intervalo (linear_plan.allocate). Cada
+    lançamento leva também a contagem ('n_*', em dias no caso linear)
+    multiplicada por 'peso' (-1 para retirar a contribuição).
+    Retorna {escala: DataFrame com Obra, Data (rótulo do período) e colunas}.
+    """
+    frentes = frentes[frentes['Frente'] != '---']
+    ids_frentes = _frente_ids(frentes)
+    ids_fatos = _frente_ids(semanas)
+    existe = ids_fatos.isin(ids_frentes).to_numpy()
+    fatos, ids_fatos = semanas[existe], ids_fatos[existe]
+    com_plano = ids_fatos[(fatos['Planejado'] > 0).to_numpy()].unique()
+    datas = weeks_to_dates(fatos['Semana'])
+    plano = (ids_fatos.isin(com_plano) & fatos['Planejado'].notna()).to_numpy()
+    feito = fatos['Realizado'].notna().to_numpy()
+    obras_fatos = fatos['Obra'].to_numpy()
+
+    inicio, fim = pd.to_datetime(frentes['Data Início']), pd.to_datetime(frentes['Data Fim'])
+    total = pd.to_numeric(frentes['Total'], errors='coerce')
+    linear = (~ids_frentes.isin(com_plano) & inicio.notna() & fim.notna() & (total > 0)).to_numpy()
+    obras_linear = frentes['Obra'].to_numpy()[linear]
+
+    resultado = {}
+    for escala in ROLLUP_FREQS:
+        posicao, periodos, valores, dias = allocate(inicio[linear], fim[linear], total[linear], escala)
+        rotulos = period_labels(datas, escala)
+        n_plano, n_feito, n_linear = plano.sum(), feito.sum(), len(posicao)
+        resultado[escala] = pd.DataFrame({
+            'Obra': np.concatenate([obras_fatos[plano], obras_linear[posicao], obras_fatos[feito]]).astype(object),
+            'Data': rotulos[plano].append([periodos, rotulos[feito]]),
+            'Planejado': np.concatenate([fatos['Planejado'].to_numpy(dtype='float64')[plano], valores, np.zeros(n_feito)]) * peso,
+            'n_planejado': np.concatenate([np.ones(n_plano), dias, np.zeros(n_feito)]) * peso,
+            'Realizado': np.concatenate([np.zeros(n_plano + n_linear), fatos['Realizado'].to_numpy(dtype='float64')[feito]]) * peso,
+            'n_realizado': np.concatenate([np.zeros(n_plano + n_linear), np.ones(n_feito)]) * peso,
+        })
+    return resultado
+
+
+def _aggregate(lancamentos):
+    """Soma e contagem por (Obra, período)"""
+    return lancamentos.groupby(['Obra', 'Data']).sum()
+
+
+def _totals(tabela):
+    return tabela.groupby(level='Data').sum()
+
+
+def _clean(tabela):
+    """Remove períodos sem lançamentos e zera somas de colunas sem contribuição"""
+    valores = tabela.to_numpy(dtype='float64', copy=True)
+    planejado, n_planejado, realizado, n_realizado = (tabela.columns.get_loc(c) for c in ['Planejado', 'n_planejado', 'Realizado', 'n_realizado'])
+    valores[valores[:, n_planejado] <= 0, planejado] = 0.0
+    valores[valores[:, n_realizado] <= 0, realizado] = 0.0
+    manter = (valores[:, n_planejado] > 0) | (valores[:, n_realizado] > 0)
+    return pd.DataFrame(valores[manter], index=tabela.index[manter], columns=tabela.columns)
+
+
+def _apply(tabela, delta):
+    """Soma 'delta' à tabela; só os períodos tocados são alterados (tabelas ordenadas pelo índice)"""
+    posicoes = tabela.index.get_indexer(delta.index)
+    existentes = posicoes >= 0
+    valores = tabela.to_numpy(dtype='float64', copy=True)
+    valores[posicoes[existentes]] += delta.to_numpy(dtype='float64')[existentes]
+    resultado = pd.DataFrame(valores, index=tabela.index, columns=tabela.columns)
+    if not existentes.all():
+        resultado = pd.concat([resultado, delta[~existentes]]).sort_index()
+    return _clean(resultado)
+
+
+def _select(dataset, chaves):
+    """Linhas de frentes e de fatos semanais das frentes 'chaves'"""
+    obras, nomes = {o for o, _ in chaves}, {f for _, f in chaves}
+
+    def filtrar(df):
+        df = df[df['Obra'].isin(obras) & df['Frente'].isin(nomes)]
+        if len(obras) > 1 and len(nomes) > 1:
+            df = df[[chave in chaves for chave in zip(df['Obra'], df['Frente'])]]
+        return df
+    return filtrar(dataset.frentes), filtrar(dataset.semanas)
+
+
+class Rollups:
+    def __init__(self, por_obra, totais):
+        self.por_obra = por_obra  # escala -> DataFrame indexado por (Obra, Data)
+        self.totais = totais      # escala -> DataFrame indexado por Data
+
+    @classmethod
+    def build(cls, frentes, semanas):
+        lancamentos = _lancamentos(frentes, semanas)
+        por_obra = {escala: _clean(_aggregate(lancamentos[escala]).sort_index()) for escala in ROLLUP_FREQS}
+        return cls(por_obra, {escala: _totals(tabela) for escala, tabela in por_obra.items()})
+
+    def update(self, anterior, novo, chaves):
+        """Novos agregados trocando a contribuição das frentes 'chaves' de 'anterior' pela de 'novo'.
+
+        anterior/novo: Datasets antes e depois da alteração. Os agregados atuais
+        não são modificados (podem estar em uso por outras sessões).
+        """
+        if not chaves:
+            return self
+        chaves = set(chaves)
+        # Frente excluída (nada depois) ou nova (nada antes): só um dos lados tem lançamentos
+        lados = [_lancamentos(frentes, semanas, peso) for (frentes, semanas), peso
+                 in ((_select(anterior, chaves), -1), (_select(novo, chaves), 1)) if not frentes.empty]
+        if not lados:
+            return self
+        por_obra, totais = {}, {}
+        for escala in ROLLUP_FREQS:
+            delta = _aggregate(pd.concat([lado[escala] for lado in lados], ignore_index=True))
+            por_obra[escala] = _apply(self.por_obra[escala], delta)
+            totais[escala] = _apply(self.totais[escala], _totals(delta))
+        return Rollups(por_obra, totais)
+
+    def series(self, escala, coluna, obra=None):
+        """Série contínua por período de uma obra (ou do portfólio), igual a resample(freq).sum()
+
+        Vazia quando não há lançamentos para a coluna.
+        """
+        if obra is None:
+            tabela = self.totais[escala]
+        else:
+            tabela = self.por_obra[escala]
+            tabela = tabela.xs(obra, level='Obra') if obra in tabela.index.get_level_values('Obra') else tabela.iloc[0:0].droplevel('Obra')
+        tabela = tabela[tabela[f"n_{coluna.lower()}"] > 0]
+        if tabela.empty:
+            return pd.Series(dtype='float64')
+        periodos = pd.date_range(tabela.index.min(), tabela.index.max(), freq=ROLLUP_FREQS[escala])
+        return tabela[coluna].reindex(periodos, fill_value=0.0)
@@ -0,0 +1,85 @@
+# -----------------------------------------------------------------------------
+# Arquivo: schema.py (Tipos Compactos das Tabelas do Dataset)
+# -----------------------------------------------------------------------------
+# Cada worker guarda várias versões do portfólio (data_store, load_cache,
+# uma por sessão e edição). Na tabela de fatos semanais, Obra, Frente e
+# Semana se repetem em todas as linhas: como texto, cada célula é um objeto
+# Python (~60 bytes); como category, é um código de 1-2 bytes mais uma única
+# cópia de cada texto. No tier 'large' do benchmark a tabela cai de ~32 MB
+# para ~3 MB. A tabela de frentes (uma linha por frente, editada célula a
+# célula pela tela) continua com texto comum.
+#
+# Os valores continuam float64: em float32, quantidades como 1234.56 seriam
+# gravadas como 1234.5600586, mudando a versão das frentes (concurrency.py)
+# e o que a tabela exibe, para uma economia pequena perto das chaves.
+#
+# pd.concat de categorias diferentes volta para texto, e atribuir um valor
+# fora das categorias é erro; concat() e set_key() abaixo unem as categorias
+# antes, para que as gravações não precisem reconverter a tabela inteira. As
+# categorias são mantidas em ordem alfabética, então ordenar por elas (ex.:
+# por Semana) é o mesmo que ordenar pelo texto.
+import numpy as np
+import pandas as pd
+
+WEEK_KEY_COLUMNS = ['Obra', 'Frente', 'Semana']
+
+
+def _is_categorical(serie):
+    return isinstance(serie.dtype, pd.CategoricalDtype)
+
+
+def compact(df, colunas):
+    """df com as 'colunas' como category (o próprio df se elas já forem)"""
+    converter = {c: 'category' for c in colunas if c in df.columns and not _is_categorical(df[c])}
+    return df.astype(converter) if converter else df
+
+
+def compact_semanas(semanas):
+    return compact(semanas, WEEK_KEY_COLUMNS)
+
+
+def _union_categories(series, extras=()):
+    categorias = pd.Index(np.concatenate([s.cat.categories.to_numpy(dtype=object) for s in series]
+                                         + [np.asarray(extras, dtype=object)])).unique()
+    try:
+        return categorias.sort_values()
+    except TypeError:  # Chaves de tipos misturados (ex.: números e texto) ficam na ordem de chegada
+        return categorias
+
+
+def concat(partes, colunas=WEEK_KEY_COLUMNS):
+    """pd.concat(partes, ignore_index=True) mantendo 'colunas' como category, com as categorias unidas"""
+    partes = [compact(p, colunas) for p in partes]
+    for coluna in colunas:
+        if all(coluna in p.columns for p in partes):
+            tipo = pd.CategoricalDtype(_union_categories([p[coluna] for p in partes]))
+            partes = [p if p[coluna].dtype == tipo else p.astype({coluna: tipo}) for p in partes]
+    return pd.concat(partes, ignore_index=True)
+
+
+def set_key(df, mascara, coluna, valor):
+    """Cópia de df com 'valor' na 'coluna' das linhas de 'mascara' (ex.: renomear uma frente)"""
+    df = df.copy()
+    if _is_categorical(df[coluna]) and valor not in df[coluna].cat.categories:
+        df[coluna] = df[coluna].cat.set_categories(_union_categories([df[coluna]], [valor]))
+    df.loc[mascara, coluna] = valor
+    return df
+
+
+def tables(dataset):
+    """[(tabela, DataFrame)] do dataset: 'frentes', 'semanas' e, se já montados, os 'rollups'"""
+    tabelas = [('frentes', dataset.frentes), ('semanas', dataset.semanas)]
+    rollups = getattr(dataset, '_rollups', None)
+    if rollups is not None:
+        for agregados in (rollups.por_obra, rollups.totais):
+            tabelas += [('rollups', df) for df in agregados.values()]
+    return tabelas
+
+
+def memory_usage(dataset):
+    """Bytes ocupados por tabela do dataset: {'frentes', 'semanas', 'rollups', 'total'}"""
+    uso = {'frentes': 0, 'semanas': 0, 'rollups': 0}
+    for tabela, df in tables(dataset):
+        uso[tabela] += int(df.memory_usage(deep=True).sum())
+    uso['total'] = sum(uso.values())
+    return uso
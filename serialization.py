@@ -0,0 +1,134 @@
+# -----------------------------------------------------------------------------
+# Arquivo: serialization.py (Formato Binário dos Datasets em Disco)
+# -----------------------------------------------------------------------------
+# Os caches em disco (data_store e load_cache) guardam Datasets inteiros e os
+# leem de volta em outros workers. Em vez de pickle, as tabelas vão em Arrow
+# IPC comprimido (lz4): os tipos das colunas (datas, float64, texto) são
+# preservados sem reinferência, e gravar/ler é várias vezes mais rápido que
+# o pickle de DataFrames, com um arquivo ~3x menor.
+#
+# Formato: MAGIC + tamanho (4 bytes) + metadados em JSON + um stream Arrow IPC
+# por tabela, na ordem listada nos metadados. Os metadados trazem a versão,
+# o registro de alterações, as versões base (concurrency.py) e os tipos
+# originais das colunas de texto. Os agregados (rollups) vão junto quando já
+# foram montados, para que o outro worker não precise recalculá-los.
+#
+# pyarrow está no requirements.txt. Sem ele, encode_dataset usa pickle
+# comprimido com zlib; decode_dataset reconhece os dois formatos pelo MAGIC,
+# mas só lê pickle quando quem chama garante que o arquivo veio de um
+# diretório privado (ler pickle de terceiros executa código arbitrário).
+import io
+import json
+import pickle
+import struct
+import zlib
+
+from dataset import Dataset
+from rollups import ROLLUP_FREQS, Rollups
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - depende do ambiente
+    pa = None
+
+MAGIC_ARROW = b'DSA1'
+MAGIC_PICKLE = b'DSP1'
+
+ARROW_COMPRESSION = 'lz4'
+
+# Nível do zlib no formato sem pyarrow: o mais rápido, a compressão já é boa
+PICKLE_COMPRESSION_LEVEL = 1
+
+
+def _keys_to_json(chaves):
+    return [list(chave) for chave in chaves]
+
+
+def _keys_from_json(chaves):
+    return [tuple(chave) for chave in chaves]
+
+
+def _tables(dataset):
+    """[(nome, DataFrame, preserve_index do Arrow)] a gravar"""
+    # None: um RangeIndex vai só nos metadados, outros índices viram colunas
+    tabelas = [('frentes', dataset.frentes, None), ('semanas', dataset.semanas, None)]
+    rollups = getattr(dataset, '_rollups', None)
+    if rollups is not None:
+        for escala in ROLLUP_FREQS:
+            tabelas.append((f'por_obra:{escala}', rollups.por_obra[escala], True))
+            tabelas.append((f'totais:{escala}', rollups.totais[escala], True))
+    return tabelas
+
+
+def _encode_arrow(dataset):
+    tabelas = _tables(dataset)
+    metadados = {
+        'version': dataset.version,
+        'alteradas': [[list(chave), list(original)] for chave, original in dataset.alteradas.items()],
+        'inseridas': _keys_to_json(dataset.inseridas),
+        'excluidas': _keys_to_json(dataset.excluidas),
+        'versoes_base': [[*chave, versao] for chave, versao in getattr(dataset, 'versoes_base', {}).items()],
+        'tabelas': [nome for nome, _, _ in tabelas],
+        # O Arrow devolve texto como 'str': guarda quais colunas eram 'object' para restaurá-las
+        'objetos': {nome: [c for c in df.columns if df[c].dtype == object] for nome, df, _ in tabelas},
+    }
+    cabecalho = json.dumps(metadados, ensure_ascii=False).encode('utf-8')
+    saida = io.BytesIO()
+    saida.write(MAGIC_ARROW + struct.pack('<I', len(cabecalho)) + cabecalho)
+    opcoes = ipc.IpcWriteOptions(compression=ARROW_COMPRESSION)
+    for _, df, indice in tabelas:
+        tabela = pa.Table.from_pandas(df, preserve_index=indice)
+        with ipc.new_stream(saida, tabela.schema, options=opcoes) as writer:
+            writer.write_table(tabela)
+    return saida.getvalue()
+
+
+def _decode_arrow(dados):
+    tamanho, = struct.unpack_from('<I', dados, len(MAGIC_ARROW))
+    inicio = len(MAGIC_ARROW) + 4
+    metadados = json.loads(dados[inicio:inicio + tamanho].decode('utf-8'))
+    leitor = pa.BufferReader(pa.py_buffer(dados)[inicio + tamanho:])
+    tabelas = {}
+    for nome in metadados['tabelas']:
+        df = ipc.open_stream(leitor).read_all().to_pandas()
+        objetos = metadados['objetos'].get(nome, [])
+        if objetos:
+            df = df.astype({c: object for c in objetos})
+        tabelas[nome] = df
+
+    dataset = Dataset(tabelas['frentes'], tabelas['semanas'])
+    dataset.version = metadados['version']
+    dataset.alteradas = {tuple(chave): tuple(original) for chave, original in metadados['alteradas']}
+    dataset.inseridas = set(_keys_from_json(metadados['inseridas']))
+    dataset.excluidas = set(_keys_from_json(metadados['excluidas']))
+    dataset.versoes_base = {(obra, frente): versao for obra, frente, versao in metadados['versoes_base']}
+    if 'por_obra:semanal' in tabelas:
+        dataset._rollups = Rollups({escala: tabelas[f'por_obra:{escala}'] for escala in ROLLUP_FREQS},
+                                   {escala: tabelas[f'totais:{escala}'] for escala in ROLLUP_FREQS})
+    return dataset
+
+
+def encode_dataset(dataset):
+    """Bytes do Dataset para gravar em disco (Arrow IPC, ou pickle+zlib sem pyarrow)"""
+    if pa is not None:
+        return _encode_arrow(dataset)
+    return MAGIC_PICKLE + zlib.compress(pickle.dumps(dataset, protocol=pickle.HIGHEST_PROTOCOL), PICKLE_COMPRESSION_LEVEL)
+
+
+def decode_dataset(dados, permitir_pickle=False):
+    """Dataset gravado por encode_dataset.
+
+    ValueError (ou OSError, de erros de leitura do Arrow) se os bytes estiverem
+    corrompidos, em formato desconhecido ou em pickle sem 'permitir_pickle'.
+    """
+    try:
+        if dados.startswith(MAGIC_ARROW) and pa is not None:
+            return _decode_arrow(dados)
+        if dados.startswith(MAGIC_PICKLE):
+            if not permitir_pickle:
+                raise ValueError("dataset em formato pickle recusado: o diretório de cache não é privado")
+            return pickle.loads(zlib.decompress(dados[len(MAGIC_PICKLE):]))
+    except (pickle.UnpicklingError, zlib.error, EOFError, KeyError, struct.error) as e:
+        raise ValueError(f"dataset corrompido: {e}") from e
+    raise ValueError("formato de dataset desconhecido")
@@ -0,0 +1,283 @@
+# -----------------------------------------------------------------------------
+# Arquivo: sheets_client.py (Conexão Reutilizável com o Google Sheets)
+# -----------------------------------------------------------------------------
+# Uma conexão por processo (worker do Gunicorn): as credenciais são lidas e o
+# cliente é autorizado uma única vez, e a chave da planilha é guardada após a
+# primeira busca pelo nome. Em caso de erro, invalidate() força a reconexão.
+#
+# gspread e oauth2client são importados só na primeira conexão: a
+# inicialização do app não paga por eles, e os backends locais (e a planilha
+# em memória) nunca os carregam.
+import json
+import os
+import threading
+import time
+
+import metrics
+
+# O nome da sua planilha
+GOOGLE_SHEET_NAME = 'DadosDashboardObras'
+
+# Define os "escopos" de permissão que nossa aplicação precisa
+SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+
+# Esta variável de ambiente guardará nossas credenciais de forma segura no Render
+CREDS_JSON_STRING = os.environ.get('GOOGLE_CREDENTIALS_JSON', None)
+
+# Chave da planilha (opcional): evita a busca pelo nome no Drive
+GOOGLE_SHEET_KEY = os.environ.get('GOOGLE_SHEET_KEY', None)
+
+# Os tokens de acesso do Google valem 1 hora: reautoriza um pouco antes disso
+TOKEN_MAX_AGE_SECONDS = int(os.environ.get('GOOGLE_TOKEN_MAX_AGE_SECONDS', 50 * 60))
+
+# Usa uma planilha em memória no lugar do Google Sheets (testes e uso local)
+USE_FAKE_SHEET = os.environ.get('GOOGLE_SHEETS_FAKE', '').lower() in ('1', 'true', 'yes')
+
+
+def _column_letter(n):
+    letras = ''
+    while n > 0:
+        n, resto = divmod(n - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _column_number(letras):
+    n = 0
+    for ch in letras:
+        n = n * 26 + ord(ch.upper()) - 64
+    return n
+
+
+def _parse_a1(range_name):
+    """'A2:G5' -> (linha_ini, linha_fim, col_ini, col_fim), 1-based; None quando aberto"""
+    partes = range_name.split('!')[-1].split(':')
+    limites = []
+    for parte in partes:
+        letras = ''.join(ch for ch in parte if ch.isalpha())
+        digitos = ''.join(ch for ch in parte if ch.isdigit())
+        limites.append((int(digitos) if digitos else None, _column_number(letras) if letras else None))
+    (linha_ini, col_ini), (linha_fim, col_fim) = limites[0], limites[-1]
+    return linha_ini, linha_fim, col_ini, col_fim
+
+
+class FakeWorksheet:
+    """Planilha em memória com a mesma interface usada do gspread.Worksheet"""
+
+    def __init__(self, rows=None):
+        self.rows = [list(r) for r in rows] if rows else []
+        self.calls = []
+
+    @classmethod
+    def from_json_file(cls, path):
+        """Carrega um arquivo no formato orient='split' (ex.: project_data.json)"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        rows = [data['columns']]
+        for row in data['data']:
+            rows.append([json.dumps(v) if isinstance(v, dict) else ('' if v is None else v) for v in row])
+        return cls(rows)
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    def get_all_values(self):
+        self.calls.append('get_all_values')
+        return [list(r) for r in self.rows]
+
+    def get_all_records(self):
+        self.calls.append('get_all_records')
+        if not self.rows:
+            return []
+        header = self.rows[0]
+        return [dict(zip(header, list(r) + [''] * (len(header) - len(r)))) for r in self.rows[1:]]
+
+    def _get_range(self, range_name):
+        linha_ini, linha_fim, col_ini, col_fim = _parse_a1(range_name)
+        linhas = self.rows[(linha_ini or 1) - 1:linha_fim]
+        return [['' if v is None else str(v) for v in r[(col_ini or 1) - 1:col_fim]] for r in linhas]
+
+    def batch_get(self, ranges, **kwargs):
+        self.calls.append('batch_get')
+        return [self._get_range(r) for r in ranges]
+
+    def clear(self):
+        self.calls.append('clear')
+        self.rows = []
+
+    def _write(self, range_name, values):
+        linha_ini, _, col_ini, _ = _parse_a1(range_name or 'A1')
+        inicio, col = (linha_ini or 1) - 1, (col_ini or 1) - 1
+        while len(self.rows) < inicio + len(values):
+            self.rows.append([])
+        for i, row in enumerate(values):
+            atual = self.rows[inicio + i]
+            atual.extend([''] * (col + len(row) - len(atual)))
+            atual[col:col + len(row)] = list(row)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self.calls.append('update')
+        self._write(range_name, values)
+        return {'updatedRows': len(values)}
+
+    def batch_update(self, data, **kwargs):
+        self.calls.append('batch_update')
+        for item in data:
+            self._write(item['range'], item['values'])
+        return {'totalUpdatedRows': sum(len(item['values']) for item in data)}
+
+    def append_rows(self, values, **kwargs):
+        self.calls.append('append_rows')
+        self.rows.extend(list(r) for r in values)
+
+    def delete_rows(self, start_index, end_index=None):
+        self.calls.append('delete_rows')
+        del self.rows[start_index - 1:(end_index or start_index)]
+
+
+class SheetsConnection:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pid = None
+        self._creds = None
+        self._client = None
+        self._worksheet = None
+        self._connected_at = 0.0
+        self._spreadsheet_key = GOOGLE_SHEET_KEY
+        self._fake_worksheet = None
+
+    def set_fake_worksheet(self, worksheet):
+        with self._lock:
+            self._fake_worksheet = worksheet
+
+    def get_worksheet(self):
+        return metrics.instrument_worksheet(self._get_worksheet())
+
+    def _get_worksheet(self):
+        with self._lock:
+            if self._fake_worksheet is not None:
+                return self._fake_worksheet
+            if USE_FAKE_SHEET:
+                self._fake_worksheet = FakeWorksheet()
+                return self._fake_worksheet
+            if self._pid != os.getpid():
+                # Processo novo (fork do Gunicorn): não reaproveita a sessão HTTP do pai
+                self._client, self._worksheet = None, None
+            if self._worksheet is None or self._token_expired():
+                self._connect()
+            return self._worksheet
+
+    def invalidate(self):
+        """Descarta o cliente atual; a próxima chamada reconecta (a chave da planilha é mantida)"""
+        with self._lock:
+            self._client, self._worksheet = None, None
+
+    def _token_expired(self):
+        return time.monotonic() - self._connected_at > TOKEN_MAX_AGE_SECONDS
+
+    def _connect(self):
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        if self._creds is None:
+            if CREDS_JSON_STRING is None:
+                raise RuntimeError("A variável de ambiente 'GOOGLE_CREDENTIALS_JSON' não foi encontrada.")
+            self._creds = ServiceAccountCredentials.from_json_keyfile_dict(json.loads(CREDS_JSON_STRING), SCOPE)
+        with metrics.observe_sheets_call('authorize'):
+            self._client = gspread.authorize(self._creds)
+        if self._spreadsheet_key:
+            with metrics.observe_sheets_call('open_by_key'):
+                spreadsheet = self._client.open_by_key(self._spreadsheet_key)
+        else:
+            with metrics.observe_sheets_call('open'):
+                spreadsheet = self._client.open(GOOGLE_SHEET_NAME)
+            self._spreadsheet_key = spreadsheet.id
+        self._worksheet = spreadsheet.sheet1
+        self._connected_at = time.monotonic()
+        self._pid = os.getpid()
+
+
+_connection = SheetsConnection()
+
+
+def get_worksheet():
+    return _connection.get_worksheet()
+
+
+def invalidate():
+    _connection.invalidate()
+
+
+def set_fake_worksheet(worksheet):
+    _connection.set_fake_worksheet(worksheet)
+
+
+class SheetChangedError(Exception):
+    """As linhas a excluir não estão mais na posição lida no início da gravação"""
+
+
+def write_delta(worksheet, header, linhas, alteradas, inseridas, excluidas, get_all_rows):
+    """Grava na planilha apenas as linhas que mudaram.
+
+    linhas: {chave: valores da linha} das frentes alteradas/inseridas.
+    alteradas: {chave atual: chave na planilha}; inseridas/excluidas: conjuntos de chaves.
+    get_all_rows: chamado só quando a planilha precisa ser reescrita (vazia ou com
+    outro cabeçalho). Retorna {'linhas': gravadas, 'excluidas': ..., 'celulas': gravadas}.
+    """
+    ultima_coluna = _column_letter(len(header))
+    cabecalho, chaves_planilha = worksheet.batch_get(['1:1', 'A:B'])
+    if not cabecalho or cabecalho[0][:len(header)] != header:
+        valores = [header] + get_all_rows()
+        worksheet.clear()
+        worksheet.update(valores, 'A1')
+        return {'linhas': len(valores) - 1, 'excluidas': 0, 'celulas': sum(len(r) for r in valores[1:])}
+
+    posicoes = {}
+    for numero, row in enumerate(chaves_planilha[1:], start=2):
+        posicoes.setdefault((row[0] if row else '', row[1] if len(row) > 1 else ''), numero)
+
+    def posicao(chave):
+        return posicoes.get((str(chave[0]), str(chave[1])))
+
+    atualizacoes, novas = [], []
+    for chave, chave_planilha in alteradas.items():
+        numero = posicao(chave_planilha)
+        if numero is None:
+            novas.append(linhas[chave])
+        else:
+            atualizacoes.append({'range': f"A{numero}:{ultima_coluna}{numero}", 'values': [linhas[chave]]})
+    for chave in inseridas:
+        numero = posicao(chave)
+        if numero is None:
+            novas.append(linhas[chave])
+        else:
+            atualizacoes.append({'range': f"A{numero}:{ultima_coluna}{numero}", 'values': [linhas[chave]]})
+
+    if atualizacoes:
+        worksheet.batch_update(atualizacoes)
+
+    # Exclui de baixo para cima, agrupando linhas consecutivas, para não deslocar as demais
+    numeros = sorted({posicao(c) for c in excluidas} - {None}, reverse=True)
+    if numeros:
+        # Excluir pela posição lida no início apagaria outra frente se alguém (ex.: direto na
+        # planilha) tivesse inserido ou removido linhas nesse meio tempo: confere as chaves antes
+        esperadas = [list(chaves_planilha[n - 1][:2]) for n in numeros]
+        atuais = [(r[0][:2] if r else []) for r in worksheet.batch_get([f"A{n}:B{n}" for n in numeros])]
+        if atuais != esperadas:
+            raise SheetChangedError("A planilha foi alterada durante a gravação; nenhuma linha foi excluída. "
+                                    "Recarregue a página e tente novamente.")
+    blocos = []
+    for numero in numeros:
+        if blocos and blocos[-1][0] == numero + 1:
+            blocos[-1][0] = numero
+        else:
+            blocos.append([numero, numero])
+    for inicio, fim in blocos:
+        worksheet.delete_rows(inicio, fim)
+
+    if novas:
+        worksheet.append_rows(novas)
+
+    gravadas = [item['values'][0] for item in atualizacoes] + novas
+    return {'linhas': len(gravadas), 'excluidas': len(numeros), 'celulas': sum(len(r) for r in gravadas)}
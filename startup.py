@@ -0,0 +1,87 @@
+# -----------------------------------------------------------------------------
+# Arquivo: startup.py (Tempo de Inicialização)
+# -----------------------------------------------------------------------------
+# Mede quanto cada etapa da inicialização do app custa: importações, montagem
+# do layout e registro dos callbacks. Ao final, app.py imprime uma linha com
+# o total e, com STARTUP_REPORT=1, o relatório completo:
+#   - tempo de cada etapa e quantos módulos ela importou
+#   - tempo próprio de importação por pacote (ex.: pandas, dash, gspread),
+#     sem contar os pacotes que ele importou, como em python -X importtime
+#
+# Com "gunicorn --preload" (Procfile) tudo isso roda uma única vez, no
+# processo principal, antes de criar os workers; sem ele, em cada worker.
+import builtins
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+STARTUP_REPORT = os.environ.get('STARTUP_REPORT', '').lower() in ('1', 'true', 'yes')
+
+# Pacotes exibidos no relatório, do mais lento ao mais rápido
+REPORT_TOP_PACKAGES = 15
+
+_inicio = time.perf_counter()
+_etapas = []      # (nome, segundos, módulos importados)
+_pacotes = {}     # pacote -> segundos próprios de importação
+_pilha = []       # tempo dos filhos de cada importação em andamento
+_import_original = None
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level == 0 and name in sys.modules:
+        return _import_original(name, globals, locals, fromlist, level)
+    inicio = time.perf_counter()
+    _pilha.append(0.0)
+    try:
+        return _import_original(name, globals, locals, fromlist, level)
+    finally:
+        total = time.perf_counter() - inicio
+        filhos = _pilha.pop()
+        if _pilha:
+            _pilha[-1] += total
+        pacote = name if level == 0 else (globals or {}).get('__package__') or name
+        pacote = pacote.split('.')[0]
+        _pacotes[pacote] = _pacotes.get(pacote, 0.0) + total - filhos
+
+
+def install():
+    """Passa a medir as importações por pacote (apenas com STARTUP_REPORT=1)"""
+    global _import_original
+    if STARTUP_REPORT and _import_original is None:
+        _import_original = builtins.__import__
+        builtins.__import__ = _timed_import
+
+
+def uninstall():
+    global _import_original
+    if _import_original is not None:
+        builtins.__import__ = _import_original
+        _import_original = None
+
+
+@contextmanager
+def phase(nome):
+    """Cronometra uma etapa da inicialização"""
+    modulos = len(sys.modules)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _etapas.append((nome, time.perf_counter() - inicio, len(sys.modules) - modulos))
+
+
+def report():
+    """Imprime o tempo de inicialização (detalhado com STARTUP_REPORT=1) e para de medir as importações"""
+    uninstall()
+    total = time.perf_counter() - _inicio
+    print(f"Inicialização concluída em {total * 1000:.0f} ms (pid {os.getpid()}).")
+    if not STARTUP_REPORT:
+        return
+    print("\n--- Tempo de inicialização por etapa ---")
+    for nome, segundos, modulos in _etapas:
+        print(f"  {nome:<30} {segundos * 1000:>8.1f} ms  {modulos:>5} módulo(s)")
+    print("--- Importação por pacote (tempo próprio) ---")
+    for pacote, segundos in sorted(_pacotes.items(), key=lambda item: -item[1])[:REPORT_TOP_PACKAGES]:
+        print(f"  {pacote:<30} {segundos * 1000:>8.1f} ms")
+    print("----------------------------------------\n")
@@ -0,0 +1,266 @@
+# -----------------------------------------------------------------------------
+# Arquivo: storage.py (Backends de Armazenamento)
+# -----------------------------------------------------------------------------
+# Interface comum para carregar e gravar o portfólio. O backend é escolhido
+# pela variável de ambiente STORAGE_BACKEND:
+#   - 'sheets'  (padrão): Google Sheets, uma linha por frente
+#   - 'sqlite'  : banco local com tabelas indexadas por (obra, frente, semana)
+#   - 'parquet' : snapshot em arquivos Parquet (requer pyarrow)
+# STORAGE_PATH define o arquivo/diretório dos backends locais.
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import sheets_client
+from dataset import Dataset
+from utils import FRENTE_KEYS, SHEET_COLUMNS, WEEKLY_COLUMNS, dicts_from_semanas, get_empty_semanas, recalculate_dataframe
+
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'sheets').lower()
+STORAGE_PATH = os.environ.get('STORAGE_PATH', None)
+
+FRENTE_COLUMNS = ['Obra', 'Frente', 'Total', 'Data Início', 'Data Fim']
+
+
+class StorageConnectionError(Exception):
+    """Não foi possível conectar à base de dados"""
+
+
+class StorageBackend:
+    descricao = ''
+
+    def load(self):
+        """Carrega o portfólio completo como Dataset"""
+        raise NotImplementedError
+
+    def load_subset(self, obras):
+        """Carrega apenas as frentes das obras informadas"""
+        dataset = self.load()
+        frentes = dataset.frentes[dataset.frentes['Obra'].isin(obras)]
+        semanas = dataset.semanas[dataset.semanas['Obra'].isin(obras)]
+        return Dataset(frentes.reset_index(drop=True), semanas.reset_index(drop=True))
+
+    def save_delta(self, dataset):
+        """Grava as alterações registradas no dataset.
+
+        Retorna {'linhas': gravadas, 'excluidas': ..., 'celulas': gravadas}.
+        """
+        raise NotImplementedError
+
+
+def _filter_keys(dataset, chaves):
+    filtro = pd.DataFrame(list(chaves), columns=FRENTE_KEYS)
+    return dataset.frentes.merge(filtro, on=FRENTE_KEYS), dataset.semanas.merge(filtro, on=FRENTE_KEYS)
+
+
+def _build_dataset(frentes, semanas):
+    frentes['Data Início'] = pd.to_datetime(frentes['Data Início'], errors='coerce')
+    frentes['Data Fim'] = pd.to_datetime(frentes['Data Fim'], errors='coerce')
+    return Dataset(recalculate_dataframe(frentes, semanas), semanas)
+
+
+class GoogleSheetsBackend(StorageBackend):
+    descricao = f"planilha '{sheets_client.GOOGLE_SHEET_NAME}'"
+
+    def _worksheet(self):
+        try:
+            return sheets_client.get_worksheet()
+        except Exception as e:
+            sheets_client.invalidate()
+            raise StorageConnectionError(f"Falha ao conectar com a base de dados (Google Sheets): {e}") from e
+
+    def load(self):
+        sheet = self._worksheet()
+        try:
+            # Lê todos os dados da planilha
+            records = sheet.get_all_records()
+        except Exception:
+            sheets_client.invalidate()
+            raise
+        df = pd.DataFrame(records) if records else pd.DataFrame(columns=SHEET_COLUMNS)
+        # Converte strings de dicionário (se vierem como string) para dict
+        for col in ['Realizado por Semana', 'Planejamento Semanal']:
+            if col not in df.columns:
+                df[col] = ''
+            df[col] = df[col].apply(lambda x: json.loads(x) if isinstance(x, str) and x.strip().startswith('{') else (x if isinstance(x, dict) else {}))
+        df['Data Início'] = pd.to_datetime(df['Data Início'], errors='coerce')
+        df['Data Fim'] = pd.to_datetime(df['Data Fim'], errors='coerce')
+        return Dataset.from_wide(df)
+
+    @staticmethod
+    def format_rows(dataset, chaves=None):
+        """Monta as linhas no formato da planilha; com 'chaves', apenas dessas frentes"""
+        frentes, semanas = _filter_keys(dataset, chaves) if chaves is not None else (dataset.frentes, dataset.semanas)
+        df_final = dicts_from_semanas(frentes, semanas)[SHEET_COLUMNS].copy()
+        df_final['Data Início'] = pd.to_datetime(df_final['Data Início']).dt.strftime('%Y-%m-%d').replace('NaT', '')
+        df_final['Data Fim'] = pd.to_datetime(df_final['Data Fim']).dt.strftime('%Y-%m-%d').replace('NaT', '')
+        # Converte dicionários para string JSON para salvar na planilha
+        df_final['Realizado por Semana'] = df_final['Realizado por Semana'].apply(json.dumps)
+        df_final['Planejamento Semanal'] = df_final['Planejamento Semanal'].apply(json.dumps)
+        # Substitui todos os valores 'NaN' por None (nulo), que é compatível com JSON
+        return df_final.replace({np.nan: None})
+
+    def save_delta(self, dataset):
+        sheet = self._worksheet()
+        try:
+            df_final = self.format_rows(dataset, set(dataset.alteradas) | dataset.inseridas)
+            linhas = dict(zip(zip(df_final['Obra'], df_final['Frente']), df_final.values.tolist()))
+            return sheets_client.write_delta(sheet, SHEET_COLUMNS, linhas, dataset.alteradas, dataset.inseridas, dataset.excluidas,
+                                             lambda: self.format_rows(dataset).values.tolist())
+        except Exception:
+            sheets_client.invalidate()
+            raise
+
+
+class SQLiteBackend(StorageBackend):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS frentes (
+            obra TEXT NOT NULL,
+            frente TEXT NOT NULL,
+            total REAL,
+            data_inicio TEXT,
+            data_fim TEXT,
+            PRIMARY KEY (obra, frente)
+        );
+        CREATE TABLE IF NOT EXISTS semanas (
+            obra TEXT NOT NULL,
+            frente TEXT NOT NULL,
+            semana TEXT NOT NULL,
+            planejado REAL,
+            realizado REAL,
+            PRIMARY KEY (obra, frente, semana)
+        );
+        CREATE INDEX IF NOT EXISTS idx_semanas_semana ON semanas (semana);
+    """
+
+    def __init__(self, path=None):
+        self.path = path or 'dados_obras.db'
+        self.descricao = f"banco SQLite '{self.path}'"
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        # Uma conexão por thread; sqlite3 não compartilha conexões entre threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = sqlite3.connect(self.path)
+            except sqlite3.Error as e:
+                raise StorageConnectionError(f"Falha ao abrir o banco SQLite '{self.path}': {e}") from e
+            self._local.conn = conn
+        return conn
+
+    def _read(self, where='', params=()):
+        conn = self._connect()
+        frentes = pd.read_sql_query(f"SELECT obra, frente, total, data_inicio, data_fim FROM frentes {where} ORDER BY rowid", conn, params=params)
+        semanas = pd.read_sql_query(f"SELECT obra, frente, semana, planejado, realizado FROM semanas {where}", conn, params=params)
+        frentes.columns = FRENTE_COLUMNS
+        semanas.columns = WEEKLY_COLUMNS
+        semanas = semanas.astype({'Planejado': 'float64', 'Realizado': 'float64'}) if not semanas.empty else get_empty_semanas()
+        return _build_dataset(frentes, semanas)
+
+    def load(self):
+        return self._read()
+
+    def load_subset(self, obras):
+        obras = list(obras)
+        if not obras:
+            return Dataset.empty()
+        marcadores = ', '.join('?' * len(obras))
+        return self._read(f"WHERE obra IN ({marcadores})", obras)
+
+    @staticmethod
+    def _frente_rows(frentes):
+        datas = {col: pd.to_datetime(frentes[col]).dt.strftime('%Y-%m-%d') for col in ['Data Início', 'Data Fim']}
+        return [(o, f, None if pd.isna(t) else float(t), None if pd.isna(i) else i, None if pd.isna(d) else d)
+                for o, f, t, i, d in zip(frentes['Obra'], frentes['Frente'], frentes['Total'], datas['Data Início'], datas['Data Fim'])]
+
+    @staticmethod
+    def _semana_rows(semanas):
+        return [(o, f, w, None if pd.isna(p) else float(p), None if pd.isna(r) else float(r))
+                for o, f, w, p, r in zip(semanas['Obra'], semanas['Frente'], semanas['Semana'], semanas['Planejado'], semanas['Realizado'])]
+
+    def save_delta(self, dataset):
+        conn = self._connect()
+        if conn.execute("SELECT COUNT(*) FROM frentes").fetchone()[0] == 0:
+            # Banco vazio: grava o portfólio inteiro
+            return self._write(conn, set(), dataset.frentes, dataset.semanas, len(dataset.excluidas))
+        # Frentes alteradas são regravadas a partir da chave original (podem ter sido renomeadas)
+        remover = set(dataset.excluidas) | set(dataset.alteradas.values()) | set(dataset.alteradas) | dataset.inseridas
+        frentes, semanas = _filter_keys(dataset, set(dataset.alteradas) | dataset.inseridas)
+        return self._write(conn, remover, frentes, semanas, len(dataset.excluidas))
+
+    def _write(self, conn, remover, frentes, semanas, excluidas):
+        linhas_frentes, linhas_semanas = self._frente_rows(frentes), self._semana_rows(semanas)
+        with conn:
+            conn.executemany("DELETE FROM frentes WHERE obra = ? AND frente = ?", list(remover))
+            conn.executemany("DELETE FROM semanas WHERE obra = ? AND frente = ?", list(remover))
+            conn.executemany("INSERT INTO frentes VALUES (?, ?, ?, ?, ?)", linhas_frentes)
+            conn.executemany("INSERT INTO semanas VALUES (?, ?, ?, ?, ?)", linhas_semanas)
+        return {'linhas': len(linhas_frentes) + len(linhas_semanas), 'excluidas': excluidas,
+                'celulas': 5 * (len(linhas_frentes) + len(linhas_semanas))}
+
+
+class ParquetBackend(StorageBackend):
+    def __init__(self, path=None):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise StorageConnectionError("O backend 'parquet' requer o pacote 'pyarrow' (pip install pyarrow).") from e
+        self.path = path or 'dados_obras_parquet'
+        self.descricao = f"snapshot Parquet '{self.path}'"
+
+    def _file(self, nome):
+        return os.path.join(self.path, f"{nome}.parquet")
+
+    def _read(self, filters=None):
+        if not os.path.exists(self._file('frentes')):
+            return Dataset.empty()
+        frentes = pd.read_parquet(self._file('frentes'), filters=filters)
+        semanas = pd.read_parquet(self._file('semanas'), filters=filters) if os.path.exists(self._file('semanas')) else get_empty_semanas()
+        return _build_dataset(frentes[FRENTE_COLUMNS], semanas[WEEKLY_COLUMNS])
+
+    def load(self):
+        return self._read()
+
+    def load_subset(self, obras):
+        return self._read(filters=[('Obra', 'in', list(obras))])
+
+    def save_delta(self, dataset):
+        # Snapshot: o arquivo inteiro é regravado de forma atômica
+        os.makedirs(self.path, exist_ok=True)
+        tabelas = {'frentes': dataset.frentes[FRENTE_COLUMNS], 'semanas': dataset.semanas[WEEKLY_COLUMNS]}
+        for nome, tabela in tabelas.items():
+            tmp_path = f"{self._file(nome)}.{os.getpid()}.tmp"
+            tabela.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self._file(nome))
+        return {'linhas': len(tabelas['frentes']) + len(tabelas['semanas']), 'excluidas': len(dataset.excluidas),
+                'celulas': sum(t.size for t in tabelas.values())}
+
+
+BACKENDS = {'sheets': GoogleSheetsBackend, 'sqlite': SQLiteBackend, 'parquet': ParquetBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_storage_backend():
+    """Backend configurado em STORAGE_BACKEND (criado uma vez por processo)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if STORAGE_BACKEND not in BACKENDS:
+                    raise StorageConnectionError(f"STORAGE_BACKEND inválido: '{STORAGE_BACKEND}'. Use um de {sorted(BACKENDS)}.")
+                classe = BACKENDS[STORAGE_BACKEND]
+                _backend = classe() if classe is GoogleSheetsBackend else classe(STORAGE_PATH)
+    return _backend
+
+
+def set_storage_backend(backend):
+    global _backend
+    _backend = backend
@@ -0,0 +1,107 @@
+# -----------------------------------------------------------------------------
+# Arquivo: table_export.py (Exportação da Tabela de Frentes em Streaming)
+# -----------------------------------------------------------------------------
+# O botão "Exportar Excel" da tabela de detalhes é um link para EXPORT_PATH,
+# com o token do dataset (JSON), os filtros do dashboard e a ordem/filtro da
+# tabela na query string (o endereço é montado no navegador,
+# assets/clientside.js). O arquivo não vai mais em base64 dentro do JSON de um
+# callback, como acontecia com dcc.send_data_frame:
+#   - a planilha é escrita com o openpyxl em modo write_only, que grava cada
+#     linha num arquivo temporário assim que ela é acrescentada; as linhas são
+#     formatadas em blocos de EXPORT_CHUNK_ROWS, então a memória do worker não
+#     cresce com o tamanho da exportação
+#   - o .xlsx pronto (também num arquivo temporário) é enviado em partes de
+#     EXPORT_CHUNK_BYTES por uma resposta com gerador, e apagado ao final
+import json
+import os
+import tempfile
+
+EXPORT_PATH = os.environ.get('EXPORT_PATH', '/exportar/frentes.xlsx')
+
+# Linhas formatadas e escritas por vez, e bytes enviados por parte da resposta
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 1000))
+EXPORT_CHUNK_BYTES = int(os.environ.get('EXPORT_CHUNK_BYTES', 64 * 1024))
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def write_xlsx(linhas, destino, formatar=None, tamanho=None):
+    """Grava as linhas numa planilha 'Frentes' em 'destino' (caminho ou arquivo binário), bloco a bloco.
+
+    'formatar' é aplicada a cada bloco antes da escrita (ex.: datas como dd/mm/aaaa).
+    """
+    from openpyxl import Workbook
+
+    tamanho = tamanho or EXPORT_CHUNK_ROWS
+    formatar = formatar or (lambda bloco: bloco)
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet('Frentes')
+    aba.append([str(c) for c in linhas.columns])
+    for inicio in range(0, len(linhas), tamanho):
+        bloco = formatar(linhas.iloc[inicio:inicio + tamanho])
+        # Células vazias em vez de NaN (o Excel não aceita NaN como número)
+        for linha in bloco.astype(object).where(bloco.notna(), None).itertuples(index=False, name=None):
+            aba.append(linha)
+    planilha.save(destino)
+
+
+def file_chunks(arquivo, tamanho=None):
+    """Partes de 'arquivo' (aberto, binário) desde o início; o arquivo é fechado ao final"""
+    tamanho = tamanho or EXPORT_CHUNK_BYTES
+    try:
+        arquivo.seek(0)
+        while True:
+            parte = arquivo.read(tamanho)
+            if not parte:
+                break
+            yield parte
+    finally:
+        arquivo.close()
+
+
+def _json_arg(texto, padrao, valido):
+    """Valor enviado como JSON na query string, ou None se inválido"""
+    try:
+        valor = json.loads(texto) if texto else padrao
+    except ValueError:
+        return None
+    return valor if valido(valor) else None
+
+
+def init_app(app):
+    """Registra a rota de exportação da tabela de detalhes no servidor Flask do app"""
+    import flask
+    from callbacks import SESSAO_EXPIRADA, details_table_rows, format_details_rows
+    from data_store import SessionExpiredError
+
+    @app.server.route(EXPORT_PATH)
+    def export_details_table():
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            return flask.Response("A exportação para Excel requer o pacote 'openpyxl' (pip install openpyxl).",
+                                  status=501, mimetype='text/plain')
+        args = flask.request.args
+        # O token de 'data-store' e o sort_by do DataTable vão como JSON
+        token = _json_arg(args.get('token'), None, lambda v: v is None or isinstance(v, dict))
+        sort_by = _json_arg(args.get('sort'), [], lambda v: isinstance(v, list) and all(isinstance(s, dict) for s in v))
+        if sort_by is None or (token is None and args.get('token') not in (None, '', 'null')):
+            return flask.Response("Parâmetros inválidos.", status=400, mimetype='text/plain')
+        try:
+            # Todas as páginas, com o filtro e a ordem atuais da tabela
+            linhas = details_table_rows(token, args.get('obra') or None, args.get('frente') or None,
+                                        sort_by, args.get('filtro', ''))
+        except SessionExpiredError:
+            return flask.Response(SESSAO_EXPIRADA, status=410, mimetype='text/plain')
+        arquivo = tempfile.TemporaryFile(prefix='dashboard-obras-export-')
+        try:
+            write_xlsx(linhas, arquivo, format_details_rows)
+        except Exception:
+            arquivo.close()
+            raise
+        tamanho = arquivo.seek(0, os.SEEK_END)
+        return flask.Response(file_chunks(arquivo), mimetype=XLSX_MIMETYPE, headers={
+            'Content-Disposition': 'attachment; filename="frentes.xlsx"',
+            'Content-Length': str(tamanho),
+            'Cache-Control': 'no-store',
+        })
@@ -0,0 +1,111 @@
+# -----------------------------------------------------------------------------
+# Arquivo: table_query.py (Paginação, Ordenação e Filtro da Tabela no Servidor)
+# -----------------------------------------------------------------------------
+# A tabela de detalhes usa page_action/sort_action/filter_action='custom': o
+# navegador envia apenas a página atual, o 'sort_by' e o 'filter_query'
+# digitado nos filtros das colunas, e o servidor devolve só as linhas da página.
+#
+# O filter_query do DataTable tem o formato
+#     {Obra} contains "Alpha" && {Total} >= 100 && {Data Início} datestartswith 2024
+# Cada condição vira uma máscara vetorizada do pandas. Colunas de data são
+# comparadas pelo texto exibido (dd/mm/aaaa) em 'contains'/'=' e pela data
+# em '<', '>' etc. (o valor digitado é lido com o dia primeiro).
+import re
+
+import pandas as pd
+
+DATE_FORMAT = '%d/%m/%Y'
+
+_CONDICAO = re.compile(r'^\s*\{(?P<coluna>[^}]+)\}\s+(?P<operador>\S+)\s*(?P<valor>.*?)\s*$')
+
+_OPERADORES = {
+    '=': 'eq', 'eq': 'eq', '!=': 'ne', 'ne': 'ne',
+    '<': 'lt', 'lt': 'lt', '<=': 'le', 'le': 'le',
+    '>': 'gt', 'gt': 'gt', '>=': 'ge', 'ge': 'ge',
+    'contains': 'contains', 'datestartswith': 'datestartswith',
+}
+
+
+def _parse_condition(condicao):
+    """(coluna, operador, valor, sem_caixa) de uma condição, ou None se não for reconhecida"""
+    encontrado = _CONDICAO.match(condicao)
+    if not encontrado:
+        return None
+    operador = encontrado['operador']
+    sem_caixa = False
+    # Prefixos 'i' (ignora maiúsculas) e 's' (diferencia) do DataTable: ieq, scontains...
+    if operador not in _OPERADORES and operador[:1] in ('i', 's') and operador[1:] in _OPERADORES:
+        sem_caixa, operador = operador[0] == 'i', operador[1:]
+    if operador not in _OPERADORES:
+        return None
+    valor = encontrado['valor']
+    if len(valor) >= 2 and valor[0] == valor[-1] and valor[0] in '"\'`':
+        valor = valor[1:-1]
+    return encontrado['coluna'], _OPERADORES[operador], valor, sem_caixa
+
+
+def _condition_mask(serie, operador, valor, sem_caixa):
+    data = pd.api.types.is_datetime64_any_dtype(serie)
+    if operador == 'datestartswith':
+        # Segue o formato ISO do DataTable: 2024, 2024-03, 2024-03-15
+        return (serie.dt.strftime('%Y-%m-%d') if data else serie.astype(str)).fillna('').str.startswith(valor)
+    numerica = pd.api.types.is_numeric_dtype(serie) and _is_number(valor)
+    if operador == 'contains' or (operador in ('eq', 'ne') and not numerica):
+        texto = serie.dt.strftime(DATE_FORMAT).fillna('') if data else serie.astype(str)
+        if sem_caixa:
+            texto, valor = texto.str.lower(), valor.lower()
+        if operador == 'contains':
+            return texto.str.contains(valor, regex=False)
+        return texto == valor if operador == 'eq' else texto != valor
+
+    if data:
+        alvo = pd.to_datetime(valor, dayfirst=True, errors='coerce')
+        valores = serie
+    else:
+        alvo = pd.to_numeric(valor, errors='coerce')
+        valores = pd.to_numeric(serie, errors='coerce')
+    if pd.isna(alvo):
+        return pd.Series(False, index=serie.index)
+    return getattr(valores, operador)(alvo).fillna(False).astype(bool)
+
+
+def _is_number(valor):
+    try:
+        float(valor)
+    except ValueError:
+        return False
+    return True
+
+
+def apply_filter_query(df, filter_query):
+    """Linhas de df que atendem a todas as condições do filter_query (condições inválidas são ignoradas)"""
+    if not filter_query:
+        return df
+    mascara = pd.Series(True, index=df.index)
+    for condicao in filter_query.split(' && '):
+        partes = _parse_condition(condicao)
+        if partes is None or partes[0] not in df.columns:
+            continue
+        coluna, operador, valor, sem_caixa = partes
+        mascara &= _condition_mask(df[coluna], operador, valor, sem_caixa)
+    return df[mascara]
+
+
+def apply_sort(df, sort_by):
+    """df ordenado pelas colunas do 'sort_by' do DataTable (valores vazios por último)"""
+    sort_by = [s for s in (sort_by or []) if s.get('column_id') in df.columns]
+    if not sort_by:
+        return df
+    return df.sort_values([s['column_id'] for s in sort_by], ascending=[s.get('direction') != 'desc' for s in sort_by],
+                          na_position='last', kind='stable')
+
+
+def page_count(total_linhas, page_size):
+    return max((total_linhas - 1) // page_size + 1, 1)
+
+
+def get_page(df, page_current, page_size):
+    """(página, índice da página) com o índice limitado à última página existente"""
+    page_current = min(max(page_current or 0, 0), page_count(len(df), page_size) - 1)
+    inicio = page_current * page_size
+    return df.iloc[inicio:inicio + page_size], page_current
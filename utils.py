@@ -4,10 +4,110 @@
 import pandas as pd
 import numpy as np
 
-def recalculate_dataframe(df):
+import schema
+
+FRENTE_KEYS = ['Obra', 'Frente']
+
+# Colunas do formato da planilha (uma linha por frente, semanas como dicionário)
+SHEET_COLUMNS = ['Obra', 'Frente', 'Total', 'Data Início', 'Data Fim', 'Realizado por Semana', 'Planejamento Semanal']
+
+# Tabela longa de fatos semanais: uma linha por (Obra, Frente, Semana ISO)
+WEEKLY_COLUMNS = ['Obra', 'Frente', 'Semana', 'Planejado', 'Realizado']
+
+# Colunas de dicionário (formato da planilha) -> coluna da tabela longa
+WEEKLY_DICT_COLUMNS = {'Planejado': 'Planejamento Semanal', 'Realizado': 'Realizado por Semana'}
+
+def get_empty_semanas():
+    return pd.DataFrame({
+        'Obra': pd.Series(dtype='object'),
+        'Frente': pd.Series(dtype='object'),
+        'Semana': pd.Series(dtype='object'),
+        'Planejado': pd.Series(dtype='float64'),
+        'Realizado': pd.Series(dtype='float64'),
+    })
+
+def semanas_from_dicts(df):
+    """Converte as colunas de dicionário {semana: valor} em uma tabela longa tipada"""
+    partes = []
+    for coluna, coluna_dict in WEEKLY_DICT_COLUMNS.items():
+        if coluna_dict not in df.columns:
+            continue
+        registros = [(o, f, w, v) for o, f, d in zip(df['Obra'], df['Frente'], df[coluna_dict]) if isinstance(d, dict) for w, v in d.items()]
+        parte = pd.DataFrame(registros, columns=['Obra', 'Frente', 'Semana', coluna])
+        parte[coluna] = pd.to_numeric(parte[coluna], errors='coerce').astype('float64')
+        partes.append(parte)
+    if not partes:
+        return get_empty_semanas()
+    semanas = partes[0]
+    for parte in partes[1:]:
+        semanas = semanas.merge(parte, on=['Obra', 'Frente', 'Semana'], how='outer')
+    for coluna in WEEKLY_DICT_COLUMNS:
+        if coluna not in semanas.columns:
+            semanas[coluna] = np.nan
+    semanas = semanas.dropna(subset=list(WEEKLY_DICT_COLUMNS), how='all')
+    return schema.compact_semanas(semanas[WEEKLY_COLUMNS].reset_index(drop=True))
+
+def dicts_from_semanas(df, semanas):
+    """Caminho inverso de semanas_from_dicts: devolve df com as colunas de dicionário"""
+    df_wide = df.copy(deep=False)
+    for coluna, coluna_dict in WEEKLY_DICT_COLUMNS.items():
+        validos = semanas.dropna(subset=[coluna])
+        dicts = {}
+        for o, f, w, v in zip(validos['Obra'], validos['Frente'], validos['Semana'], validos[coluna]):
+            dicts.setdefault((o, f), {})[w] = float(v)
+        df_wide[coluna_dict] = [dicts.get(chave, {}) for chave in zip(df_wide['Obra'], df_wide['Frente'])]
+    return df_wide
+
+def get_weekly_values(semanas, obra, frente, coluna):
+    """Retorna {semana: valor} de uma frente, ignorando semanas sem valor"""
+    linhas = semanas[(semanas['Obra'] == obra) & (semanas['Frente'] == frente)].dropna(subset=[coluna])
+    return dict(zip(linhas['Semana'], linhas[coluna].astype(float)))
+
+def set_weekly_values(semanas, obra, frente, coluna, valores, substituir=False, apagar_nulos=False):
+    """Grava {semana: valor} de uma frente na tabela longa.
+
+    Com substituir=True os valores anteriores da coluna são descartados;
+    caso contrário apenas as semanas informadas (e não nulas) são alteradas.
+    Com apagar_nulos=True, as semanas informadas com valor nulo são apagadas.
+    """
+    # Só as linhas da frente mudam: a cópia da tabela recebe os valores nas posições delas, sem
+    # reconverter as chaves das demais; apenas semanas novas são acrescentadas ao fim
+    posicoes = np.flatnonzero(((semanas['Obra'] == obra) & (semanas['Frente'] == frente)).to_numpy())
+    novos = pd.Series(valores, dtype='float64')
+    if not substituir and not apagar_nulos:
+        novos = novos.dropna()
+    existentes = pd.Index(semanas['Semana'].iloc[posicoes].to_numpy(dtype=object)).get_indexer(novos.index)
+    alteradas = existentes >= 0
+
+    semanas = semanas.copy()
+    atual = semanas[coluna].to_numpy(dtype='float64', copy=True)
+    if substituir:
+        atual[posicoes] = np.nan
+    atual[posicoes[existentes[alteradas]]] = novos.to_numpy()[alteradas]
+    semanas[coluna] = atual
+
+    outra = next(c for c in WEEKLY_DICT_COLUMNS if c != coluna)
+    vazias = posicoes[np.isnan(atual[posicoes]) & np.isnan(semanas[outra].to_numpy(dtype='float64')[posicoes])]
+    if len(vazias):
+        semanas = semanas.drop(index=semanas.index[vazias]).reset_index(drop=True)
+    acrescentar = novos[~alteradas].dropna()
+    if acrescentar.empty:
+        return semanas[WEEKLY_COLUMNS]
+    linhas = pd.DataFrame({'Obra': obra, 'Frente': frente, 'Semana': acrescentar.index.to_numpy(dtype=object),
+                           coluna: acrescentar.to_numpy(), outra: np.nan})
+    return schema.concat([semanas, linhas])[WEEKLY_COLUMNS]
+
+def recalculate_dataframe(df, semanas=None, chaves=None):
+    """Recalcula os totais das frentes a partir da tabela longa de fatos semanais.
+
+    Sem 'semanas', usa as colunas de dicionário de df (formato da planilha).
+    Com 'chaves' [(Obra, Frente)], só o realizado dessas frentes é somado de
+    novo; as demais mantêm o 'Ano (Realizado)' que já tinham.
+    """
     if df.empty:
         return df
-    df_recalc = df.copy()
+    # Cópia rasa: as colunas abaixo são substituídas inteiras, nunca alteradas no lugar
+    df_recalc = df.copy(deep=False)
     if 'Data Início' in df_recalc.columns:
         df_recalc['Data Início'] = pd.to_datetime(df_recalc['Data Início'], errors='coerce')
     if 'Data Fim' in df_recalc.columns:
@@ -15,13 +115,23 @@ def recalculate_dataframe(df):
     if 'Total' in df_recalc.columns:
         df_recalc['Total'] = pd.to_numeric(df_recalc['Total'], errors='coerce').fillna(0)
     df_recalc['Ano (Previsto)'] = df_recalc['Total']
-    def somar_realizado_semanal(d):
-        if isinstance(d, dict):
-            return sum(pd.to_numeric(v, errors='coerce') or 0 for v in d.values())
-        return 0
-    if 'Realizado por Semana' in df_recalc.columns:
-        df_recalc['Ano (Realizado)'] = df_recalc['Realizado por Semana'].apply(somar_realizado_semanal)
+    if semanas is None:
+        semanas = semanas_from_dicts(df_recalc)
+    if chaves is not None and 'Ano (Realizado)' in df.columns:
+        # Edição de poucas frentes: soma só os fatos delas, sem agrupar a tabela inteira
+        alvo = pd.MultiIndex.from_tuples(list(chaves), names=FRENTE_KEYS)
+        linhas = pd.MultiIndex.from_frame(df_recalc[FRENTE_KEYS])
+        alteradas = linhas.isin(alvo)
+        fatos = semanas[semanas['Obra'].isin(alvo.unique(level='Obra')) & semanas['Frente'].isin(alvo.unique(level='Frente'))]
+        realizado = fatos.groupby(FRENTE_KEYS, sort=False, observed=True)['Realizado'].sum()
+        valores = pd.to_numeric(df_recalc['Ano (Realizado)'], errors='coerce').to_numpy(dtype='float64', copy=True)
+        valores[alteradas] = realizado.reindex(linhas[alteradas]).fillna(0).to_numpy()
+        df_recalc['Ano (Realizado)'] = valores
+    elif not semanas.empty:
+        realizado = semanas.groupby(FRENTE_KEYS, sort=False, observed=True)['Realizado'].sum()
+        chaves = pd.MultiIndex.from_frame(df_recalc[FRENTE_KEYS])
+        df_recalc['Ano (Realizado)'] = realizado.reindex(chaves).fillna(0).to_numpy()
     else:
         df_recalc['Ano (Realizado)'] = 0
     df_recalc['Total (%)'] = (df_recalc['Ano (Realizado)'] / df_recalc['Ano (Previsto)'].replace(0, np.nan) * 100).fillna(0).round(2)
-    return df_recalc
\ No newline at end of file
+    return df_recalc
@@ -0,0 +1,91 @@
+# -----------------------------------------------------------------------------
+# Arquivo: week_calendar.py (Calendário de Semanas ISO)
+# -----------------------------------------------------------------------------
+# Tabela pré-calculada semana ISO ('2024-W05') <-> segunda-feira da semana.
+# É montada uma única vez por processo; todas as conversões de semana do
+# dashboard passam por aqui em vez de chamar strftime/strptime valor a valor.
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+CALENDAR_START_YEAR = 1990
+CALENDAR_END_YEAR = 2100
+
+_lock = threading.Lock()
+_calendar = None
+
+
+def _get_calendar():
+    """Retorna (primeira segunda-feira, segundas-feiras, chaves, índice chave -> posição)"""
+    global _calendar
+    if _calendar is None:
+        with _lock:
+            if _calendar is None:
+                first_monday = pd.Timestamp(datetime.fromisocalendar(CALENDAR_START_YEAR, 1, 1))
+                end_monday = pd.Timestamp(datetime.fromisocalendar(CALENDAR_END_YEAR + 1, 1, 1))
+                mondays = pd.date_range(first_monday, end_monday, freq='7D', inclusive='left')
+                keys = pd.Index(mondays.strftime('%G-W%V'))
+                _calendar = (first_monday, mondays, keys.to_numpy(dtype=object), keys)
+    return _calendar
+
+
+def _positions_from_dates(dates):
+    first_monday, mondays, _, _ = _get_calendar()
+    dias = (pd.DatetimeIndex(dates).normalize() - first_monday).days.to_numpy(dtype='float64')
+    pos = np.floor(dias / 7)
+    pos[(pos < 0) | (pos >= len(mondays))] = np.nan
+    return pos
+
+
+def dates_to_weeks(dates):
+    """Converte um array de datas em chaves de semana ISO (None para NaT/fora do calendário)"""
+    _, _, keys, _ = _get_calendar()
+    pos = _positions_from_dates(dates)
+    validos = ~np.isnan(pos)
+    resultado = np.full(len(pos), None, dtype=object)
+    resultado[validos] = keys[pos[validos].astype(np.int64)]
+    return resultado
+
+
+def weeks_to_dates(week_keys):
+    """Converte um array de chaves 'AAAA-Wss' na segunda-feira de cada semana (NaT se inválida)"""
+    _, mondays, _, keys_index = _get_calendar()
+    if isinstance(getattr(week_keys, 'dtype', None), pd.CategoricalDtype):
+        # Chaves como category (schema.py): procura só as categorias e repete pelos códigos
+        week_keys = pd.Categorical(week_keys)
+        pos = np.append(keys_index.get_indexer(week_keys.categories), -1)[week_keys.codes]
+    else:
+        pos = keys_index.get_indexer(np.asarray(week_keys, dtype=object))
+    resultado = mondays.take(np.where(pos >= 0, pos, 0)).to_numpy().copy()
+    resultado[pos < 0] = np.datetime64('NaT')
+    return pd.DatetimeIndex(resultado)
+
+
+def week_key(date):
+    if pd.isna(date):
+        return None
+    return dates_to_weeks([pd.Timestamp(date)])[0]
+
+
+def week_start(key):
+    return weeks_to_dates([key])[0]
+
+
+def weeks_in_range(start_date, end_date):
+    """Lista ordenada das semanas ISO que tocam o intervalo [start_date, end_date]"""
+    if pd.isna(start_date) or pd.isna(end_date):
+        return []
+    _, _, keys, _ = _get_calendar()
+    inicio, fim = _positions_from_dates([start_date, end_date])
+    if np.isnan(inicio) or np.isnan(fim):
+        return []
+    if fim < inicio:
+        return [keys[int(inicio)]]
+    return keys[int(inicio):int(fim) + 1].tolist()
+
+
+def week_label(key):
+    ano, semana = key.split('-W')
+    return f"Semana {semana} ({ano})"